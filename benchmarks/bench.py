@@ -0,0 +1,349 @@
+"""Benchmarks for crony, across crontab size, interval length and detail level.
+
+Synthetic crontabs are generated with a fixed seed, so results are comparable between commits:
+
+    python benchmarks/bench.py --output before.json
+    git checkout <another commit>
+    python benchmarks/bench.py --output after.json --compare before.json
+
+Each case records the best wall time of a number of repeats, and the peak memory allocated
+(from tracemalloc, in a separate run, as tracing slows things down). Comparing exits non-zero
+if any case has slowed down by more than the threshold.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crony.analyser
+import crony.core
+from crony.schedule import Schedule
+
+_SIZES = [10, 1000, 10000, 100000]
+
+_WINDOWS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+    "decade": timedelta(days=3652),
+}
+
+_BEGIN = datetime(2020, 1, 1, 0, 0, 0)
+
+# Skip cases which would expand more occurrences than this - e.g. listing every occurrence of
+# 100k jobs over a decade would take hours, and tells us nothing the smaller cases don't.
+_DEFAULT_MAX_OCCURRENCES = 2000000
+
+
+def _generate_line(rng, i):
+    """Generate a crontab line, from a realistic mix of schedules
+
+    Args:
+        rng (random.Random): The random number generator
+        i (int): The line number
+
+    Returns:
+        str: The crontab line
+    """
+    kind = rng.choices(
+        ["minutely", "hourly", "sparse", "step", "list"], weights=[1, 4, 4, 3, 3]
+    )[0]
+
+    if kind == "minutely":
+        schedule = "* * * * *"
+    elif kind == "hourly":
+        schedule = f"{rng.randrange(60)} * * * *"
+    elif kind == "sparse":
+        schedule = f"{rng.randrange(60)} {rng.randrange(24)} {rng.randint(1, 28)} {rng.randint(1, 12)} *"
+    elif kind == "step":
+        schedule = (
+            f"*/{rng.choice([2, 5, 10, 15, 30])} */{rng.choice([1, 2, 3, 6])} * * *"
+        )
+    else:
+        schedule = "{} {} * * 1-5".format(
+            ",".join(str(m) for m in sorted(rng.sample(range(60), 2))),
+            ",".join(str(h) for h in sorted(rng.sample(range(24), 3))),
+        )
+
+    return f"{schedule} /usr/local/bin/job-{i} --{kind}"
+
+
+def generate_crontab(size, seed=0):
+    """Generate a synthetic crontab
+
+    Args:
+        size (int): The number of lines
+        seed (int): The random seed
+
+    Returns:
+        str: The crontab
+    """
+    rng = random.Random(seed)
+    return "\n".join(_generate_line(rng, i) for i in range(size))
+
+
+def _consume(jobs, detail_level):
+    """Do the work the detail level needs for each job, without any output
+
+    Args:
+        jobs (iterable): The crony.analyser.JobOccurrences
+        detail_level (crony.core.DetailLevel): The detail level
+    """
+    for job in jobs:
+        if detail_level == crony.core.DetailLevel.NONE:
+            job.occurs
+        elif detail_level == crony.core.DetailLevel.COUNT:
+            job.count
+        else:
+            for _ in job.occurrences.epochs():
+                pass
+
+
+def _measure(fn, repeats):
+    """Measure a function's best wall time, and its peak memory
+
+    Args:
+        fn (callable): The function to measure
+        repeats (int): The number of times to time it
+
+    Returns:
+        dict: The seconds and peak bytes
+    """
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": min(seconds), "peak_bytes": peak}
+
+
+def _occurrences(crontab, begin, end):
+    """Count the occurrences a full expansion would produce, which is cheap to work out
+
+    Args:
+        crontab (crontab.CronTab): The crontab
+        begin (datetime): The begin datetime
+        end (datetime): The end datetime
+
+    Returns:
+        int: The number of occurrences
+    """
+    return sum(
+        job.count
+        for job in crony.analyser.get_job_occurrences(
+            crontab=crontab, begin=begin, end=end
+        )
+    )
+
+
+def run_benchmarks(sizes, windows, detail_levels, repeats, max_occurrences):
+    """Run every combination of the benchmark dimensions
+
+    Args:
+        sizes (list): The crontab sizes
+        windows (list): The names of the windows
+        detail_levels (list): The crony.core.DetailLevels
+        repeats (int): The number of times to time each case
+        max_occurrences (int): Skip full detail cases which would expand more than this
+
+    Yields:
+        dict: The result of each case
+    """
+    from crontab import CronTab
+
+    for size in sizes:
+        tab = generate_crontab(size)
+        with tempfile.NamedTemporaryFile("w", suffix=".crontab", delete=False) as f:
+            f.write(tab)
+        # Output is discarded, so that it's formatting, not holding on to it, that's measured.
+        null = open(os.devnull, "w")
+        try:
+            yield {
+                "case": f"parse/{size}",
+                **_measure(lambda: CronTab(tab=tab), repeats),
+            }
+            crontab = CronTab(tab=tab)
+
+            for window, detail_level in itertools.product(windows, detail_levels):
+                begin, end = _BEGIN, _BEGIN + _WINDOWS[window]
+                name = f"{size}/{window}/{detail_level.name.lower()}"
+
+                if detail_level == crony.core.DetailLevel.FULL:
+                    occurrences = _occurrences(crontab, begin, end)
+                    if occurrences > max_occurrences:
+                        print(
+                            f"Skipping {name}, with {occurrences} occurrences",
+                            file=sys.stderr,
+                        )
+                        continue
+
+                # Compiled schedules are memoised, so each case clears them to start from cold.
+                def analyse():
+                    Schedule.compile.cache_clear()
+                    _consume(
+                        crony.analyser.get_job_occurrences(
+                            crontab=crontab, begin=begin, end=end
+                        ),
+                        detail_level,
+                    )
+
+                def run():
+                    Schedule.compile.cache_clear()
+                    crony.core.run(
+                        stream=null,
+                        file=f.name,
+                        begin=begin,
+                        end=end,
+                        detail_level=detail_level,
+                        include_disabled=False,
+                        exclude_header=False,
+                        only_command=False,
+                    )
+
+                yield {"case": f"analyse/{name}", **_measure(analyse, repeats)}
+                yield {"case": f"run/{name}", **_measure(run, repeats)}
+        finally:
+            null.close()
+            os.remove(f.name)
+
+
+def _git_commit():
+    """Get the current git commit, if there is one
+
+    Returns:
+        str: The commit hash, or None
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print how results compare to a baseline
+
+    Args:
+        results (dict): The results
+        baseline (dict): The baseline results
+        threshold (float): The ratio of seconds above which a case has regressed
+
+    Returns:
+        list: The names of the regressed cases
+    """
+    before = {r["case"]: r for r in baseline["results"]}
+    regressed = []
+
+    print(f"{'case':40} {'before':>10} {'after':>10} {'ratio':>7}")
+    for result in results["results"]:
+        previous = before.get(result["case"])
+        if not previous:
+            continue
+        ratio = result["seconds"] / max(previous["seconds"], 1e-9)
+        flag = ""
+        if ratio > threshold:
+            flag = " REGRESSED"
+            regressed.append(result["case"])
+        print(
+            f"{result['case']:40} {previous['seconds']:10.4f} {result['seconds']:10.4f} {ratio:7.2f}{flag}"
+        )
+
+    return regressed
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=_SIZES, help="the crontab sizes"
+    )
+    parser.add_argument(
+        "--windows",
+        nargs="+",
+        choices=list(_WINDOWS),
+        default=list(_WINDOWS),
+        help="the interval lengths",
+    )
+    parser.add_argument(
+        "--detail-levels",
+        nargs="+",
+        choices=[d.name.lower() for d in crony.core.DetailLevel],
+        default=[d.name.lower() for d in crony.core.DetailLevel],
+        help="the detail levels",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="the number of times to time each case"
+    )
+    parser.add_argument(
+        "--max-occurrences",
+        type=int,
+        default=_DEFAULT_MAX_OCCURRENCES,
+        help="skip full detail cases which would expand more occurrences than this",
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="compare to the JSON results in this file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="the slowdown ratio above which a compared case has regressed",
+    )
+    parsed = parser.parse_args(args)
+
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": [],
+    }
+    for result in run_benchmarks(
+        parsed.sizes,
+        parsed.windows,
+        [crony.core.DetailLevel[d.upper()] for d in parsed.detail_levels],
+        parsed.repeats,
+        parsed.max_occurrences,
+    ):
+        print(
+            f"{result['case']:40} {result['seconds']:10.4f}s {result['peak_bytes'] / 1024:12.1f}KB",
+            file=sys.stderr,
+        )
+        results["results"].append(result)
+
+    if parsed.output:
+        with open(parsed.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if parsed.compare:
+        with open(parsed.compare) as f:
+            regressed = compare(results, json.load(f), parsed.threshold)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,434 @@
 import sys
 import os
+import bisect
 import datetime
 import logging
+import itertools
+import heapq
+from array import array
+from collections import Counter, deque
+from enum import Enum
 
-from crontab import CronTab
+from crony.cache import CachedJob
+from crony.schedule import (
+    Schedule,
+    can_run_within,
+    expression_masks,
+    from_epoch,
+    to_epoch,
+    window_masks,
+)
 
 _logger = logging.getLogger(__name__)
 
 
+class Engine(Enum):
+    """The means by which a job's occurrences are expanded"""
+
+    # Compile the schedule into sets of field values and walk the calendar.
+    NATIVE = "native"
+    # Step through the schedule one occurrence at a time - the reference implementation.
+    CRONITER = "croniter"
+
+
+# The most occurrences held in memory at once across the expansions shared by several jobs,
+# 32MB worth. Beyond this, each job expands a shared schedule for itself.
+_MAX_SHARED_OCCURRENCES = 4 * 1024 * 1024
+
+# Periods spanning at least this many months are expanded a month at a time, in parallel across a
+# pool of processes - each occurrence is found from the one before, so a single expansion is serial.
+_MIN_SHARDED_MONTHS = 12
+
+# The most months expanded ahead of the one being iterated over, per process in the pool.
+_SHARDS_AHEAD = 2
+
+# How far to search for a job's next or previous occurrences. The Gregorian calendar repeats every
+# 400 years, so a schedule which doesn't run within them never will.
+_SEARCH_HORIZON = datetime.timedelta(days=146097)
+
+# The schedule key shared by the jobs which can't run in a period, which have no occurrences to
+# expand.
+_NEVER = ()
+
+
+class _Expansion:
+    """The expansion of a distinct schedule over a period of interest.
+
+    Jobs with the same schedule share an expansion read-only, so that the schedule is counted
+    and checked once, and expanded once - its occurrences are held on to until the last of its
+    jobs has iterated over them, within a budget shared by the query's expansions. A retained
+    expansion holds on to them for as long as it's kept, to be reused by later analyses.
+    """
+
+    __slots__ = (
+        "job",
+        "schedule",
+        "begin",
+        "end",
+        "jobs",
+        "budget",
+        "retain",
+        "pool",
+        "_count",
+        "_occurs",
+        "_epochs",
+    )
+
+    def __init__(
+        self,
+        job,
+        schedule,
+        begin,
+        end,
+        jobs=1,
+        budget=None,
+        retain=False,
+        pool=None,
+        count=None,
+    ):
+        """Initialiser
+
+        Args:
+            job (crontab.CronItem): A job with the schedule, to expand with croniter if needed
+            schedule (crony.schedule.Schedule): The compiled schedule, or None to use croniter
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+            jobs (int): The number of jobs sharing the expansion
+            budget (_Budget): The budget for holding occurrences, or None to never hold them
+            retain (bool): Hold on to the occurrences after every job has iterated over them
+            pool (Pool): The pool of processes to expand a long period across, a month at a
+                time, if any
+            count (int): The number of occurrences, if it's already known
+        """
+        self.job = job
+        self.schedule = schedule
+        self.begin = begin
+        self.end = end
+        self.jobs = jobs
+        self.budget = budget
+        self.retain = retain
+        self.pool = pool
+        self._count = count
+        self._occurs = None
+        self._epochs = None
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = _count_occurrences(
+                self.job, self.schedule, self.begin, self.end
+            )
+        return self._count
+
+    def occurs(self):
+        if self._count is not None:
+            return self._count > 0
+        if self._occurs is None:
+            self._occurs = occurs(self.job, self.schedule, self.begin, self.end)
+        return self._occurs
+
+    def epochs(self):
+        """Stream the occurrences, expanding them only once for all of the jobs sharing them
+
+        Returns:
+            iterator: The occurrences as seconds since the epoch
+        """
+        epochs = self._epochs
+        self.jobs -= 1
+
+        if self._count == 0:
+            return iter(())
+
+        if epochs is not None:
+            if self.jobs <= 0 and not self.retain:
+                # The last job to iterate over them - let them go once it's done.
+                self.release()
+            return iter(epochs)
+
+        occurrences = _expand(self.job, self.schedule, self.begin, self.end, self.pool)
+        if (
+            (self.jobs <= 0 and not self.retain)
+            or self.budget is None
+            or self.budget.remaining <= 0
+        ):
+            return occurrences
+
+        # Only hold on to the occurrences when they're within the budget, where they can be
+        # counted up front - otherwise, expand until the budget runs out and then carry on
+        # streaming what's left.
+        limit = self.budget.remaining
+        if self.schedule and self.count > limit:
+            return occurrences
+        epochs = array("q", itertools.islice(occurrences, limit + 1))
+        if len(epochs) > limit:
+            return itertools.chain(epochs, occurrences)
+
+        self._epochs = epochs
+        self._count = len(epochs)
+        self.budget.take(len(epochs))
+        return iter(epochs)
+
+    def stream(self):
+        """Stream the occurrences once, on behalf of all of the jobs sharing them, without
+        holding on to them
+
+        Returns:
+            iterator: The occurrences as seconds since the epoch
+        """
+        if self._count == 0:
+            return iter(())
+        if self._epochs is not None:
+            return iter(self._epochs)
+        return _expand(self.job, self.schedule, self.begin, self.end, self.pool)
+
+    def release(self):
+        """Let go of the occurrences held, if any, returning them to the budget"""
+        if self._epochs is not None:
+            self.budget.release(len(self._epochs))
+            self._epochs = None
+
+
+class _Budget:
+    """The number of occurrences the expansions shared by a query's jobs may still hold."""
+
+    __slots__ = ("remaining",)
+
+    def __init__(self, remaining):
+        self.remaining = remaining
+
+    def take(self, count):
+        self.remaining -= count
+
+    def release(self, count):
+        self.remaining += count
+
+
+class SlicedExpansion:
+    """The occurrences of a schedule in a period of interest, sliced from occurrences expanded
+    up front, over a longer period or many periods at once.
+
+    This stands in for _Expansion, shared by the jobs with the schedule.
+    """
+
+    __slots__ = ("schedule", "_occurrences", "_start", "_end")
+
+    def __init__(self, schedule, occurrences, start, end):
+        """Initialiser
+
+        Args:
+            schedule (crony.schedule.Schedule): The compiled schedule, or None if croniter is needed
+            occurrences (memoryview): The sorted occurrences, as seconds since the epoch
+            start (int): Where the occurrences in the period start
+            end (int): Where they end (exclusive)
+        """
+        self.schedule = schedule
+        self._occurrences = occurrences
+        self._start = start
+        self._end = end
+
+    @property
+    def count(self):
+        return self._end - self._start
+
+    def occurs(self):
+        return self._end > self._start
+
+    def epochs(self):
+        return iter(self._occurrences[self._start : self._end])
+
+    stream = epochs
+
+    def release(self):
+        pass
+
+
+class Retained:
+    """The expansions of a crontab's schedules, kept between analyses of the same period.
+
+    Re-analysing a crontab as it's edited then only expands the schedules which are new to it -
+    the counts and occurrences of the rest are reused, so the cost of each analysis is in
+    proportion to the edit rather than to the crontab.
+    """
+
+    def __init__(self):
+        self.begin = None
+        self.end = None
+        # Expansions by schedule key.
+        self.expansions = {}
+        self.budget = _Budget(_MAX_SHARED_OCCURRENCES)
+
+    def keep(self, begin, end, keys):
+        """Let go of the expansions which won't be reused
+
+        Args:
+            begin (datetime): The begin datetime (exclusive) of the next analysis
+            end (datetime): The end datetime (inclusive) of the next analysis
+            keys (iterable): The schedule keys of the next analysis
+
+        Returns:
+            dict: The expansions which can be reused, by schedule key
+        """
+        keys = set(keys) if (begin, end) == (self.begin, self.end) else set()
+        for key in [key for key in self.expansions if key not in keys]:
+            self.expansions.pop(key).release()
+        self.begin, self.end = (begin, end)
+        return self.expansions
+
+
+class Occurrences:
+    """A lazy, re-iterable stream of a job's occurrences in a period of interest.
+
+    Unless its schedule is shared with other jobs (see get_job_occurrences()), nothing is held on
+    to between iterations, so memory use doesn't grow with the length of the period. The length
+    and truthiness are worked out without expanding everything.
+    """
+
+    __slots__ = ("job", "engine", "begin", "end", "_expansion")
+
+    def __init__(self, job, engine, begin, end, expansion=None):
+        """Initialiser
+
+        Args:
+            job (crontab.CronItem): The job
+            engine (Engine): The engine to expand the job's schedule with
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+            expansion (_Expansion): The expansion of the job's schedule shared with other jobs,
+                if any
+        """
+        self.job = job
+        self.engine = engine
+        self.begin = begin
+        self.end = end
+        self._expansion = expansion or _Expansion(
+            job, compile_schedule(job, engine), begin, end
+        )
+
+    @property
+    def schedule(self):
+        """The job's compiled schedule
+
+        Returns:
+            crony.schedule.Schedule: The compiled schedule, or None if croniter is to be used
+        """
+        return self._expansion.schedule
+
+    def __iter__(self):
+        return map(from_epoch, self.epochs())
+
+    def __len__(self):
+        return self._expansion.count
+
+    def __bool__(self):
+        return self._expansion.occurs()
+
+    def epochs(self):
+        """Stream the occurrences compactly, without creating datetimes
+
+        Returns:
+            iterator: The occurrences as seconds since the epoch (see crony.schedule.to_epoch())
+        """
+        return self._expansion.epochs()
+
+    def stream(self):
+        """Stream the occurrences once for every job sharing the schedule, such as to analyse a
+        group of them found by group_by_schedule(), without them being held on to for the rest
+
+        Returns:
+            iterator: The occurrences as seconds since the epoch
+        """
+        return self._expansion.stream()
+
+    def between(self, begin, end):
+        """Get the occurrences in part of the period of interest, reusing the compiled schedule
+
+        Args:
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Returns:
+            Occurrences: The occurrences after begin, up to and including end
+        """
+        return Occurrences(
+            self.job,
+            self.engine,
+            begin,
+            end,
+            _Expansion(self.job, self.schedule, begin, end),
+        )
+
+    def to_array(self):
+        """Expand the occurrences into a packed buffer, 8 bytes per occurrence
+
+        Returns:
+            array.array: The occurrences as 64-bit seconds since the epoch
+        """
+        return array("q", self.epochs())
+
+    def to_numpy(self):
+        """Expand the occurrences into a NumPy array, if NumPy is installed
+
+        Returns:
+            numpy.ndarray: The occurrences, with a datetime64[m] dtype
+        """
+        try:
+            import numpy
+        except ImportError as e:  # pragma: no cover
+            raise ImportError(
+                "NumPy isn't installed, it can be installed with: pip install crony[numpy]"
+            ) from e
+
+        return (numpy.frombuffer(self.to_array(), dtype=numpy.int64) // 60).astype(
+            "datetime64[m]"
+        )
+
+
 class JobOccurrences:
     """The representation of a cronjob which has occurred in a period of interest."""
 
-    def __init__(self, job, occurrences):
+    __slots__ = ("job", "occurrences")
+
+    def __init__(self, job, begin, end, engine=Engine.NATIVE, expansion=None):
         """Initialiser
 
         Args:
             job (crontab.CronItem): The occurring job
-            occurrences (list): The occurrence datetimes
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+            engine (Engine): The engine to expand the job's schedule with
+            expansion (_Expansion): The expansion of the job's schedule shared with other jobs,
+                if any
         """
         self.job = job
-        self.occurrences = occurrences
+        self.occurrences = Occurrences(job, engine, begin, end, expansion)
+
+    @property
+    def schedule_key(self):
+        """What the job's occurrences are shared under, which is the same for every job with
+        the same schedule, as found by get_job_occurrences()
+
+        Returns:
+            object: A hashable key for the job's schedule
+        """
+        return self.occurrences._expansion
+
+    @property
+    def count(self):
+        """The number of occurrences, which doesn't require them to be expanded
+
+        Returns:
+            int: The number of occurrences
+        """
+        return len(self.occurrences)
+
+    @property
+    def occurs(self):
+        """Whether the job occurs at all, which stops looking at the first occurrence
+
+        Returns:
+            bool: Whether there are any occurrences
+        """
+        return bool(self.occurrences)
 
     @property
     def command(self):
@@ -51,40 +460,319 @@ class JobOccurrences:
         return self.job.render()
 
 
-def _get_occurrences(job, begin, end):
+def compile_schedule(job, engine):
+    """Compile a job's schedule for the native engine, where possible
+
+    Args:
+        job (crontab.CronItem|crony.cache.CachedJob): The job to compile
+        engine (Engine): The requested engine
+
+    Returns:
+        crony.schedule.Schedule: The compiled schedule, or None if croniter is to be used
+    """
+    if engine != Engine.NATIVE:
+        return None
+
+    # Jobs restored from the cache were compiled when they were stored.
+    if isinstance(job, CachedJob):
+        schedule = job.compiled
+    else:
+        schedule = Schedule.compile(_expression(job))
+
+    if not schedule:
+        # Fall back to croniter for anything the native engine can't represent.
+        _logger.debug(f"Falling back to croniter to expand {job.command}")
+    return schedule
+
+
+def _expression(job):
+    """Get a job's schedule as a five field cron expression
+
+    Args:
+        job (crontab.CronItem|crony.cache.CachedJob): The job
+
+    Returns:
+        str: The cron expression
+    """
+    if isinstance(job, CachedJob):
+        return job.expression
+    return job.slices.clean_render()
+
+
+def field_masks(job):
+    """Pack the values each field of a job's schedule can take, as cheaply as possible
+
+    Args:
+        job (crontab.CronItem|crony.cache.CachedJob): The job
+
+    Returns:
+        tuple: Packed as crony.schedule.Schedule.to_masks() packs them, though they may allow more
+        than the schedule does, or None if they couldn't be packed cheaply
+    """
+    if isinstance(job, CachedJob) and job.compiled:
+        return job.compiled.to_masks()
+    return expression_masks(_expression(job))
+
+
+def _schedule_key(job, schedule):
+    """Get a key identifying a job's schedule, which is the same for equivalent schedules
+
+    Args:
+        job (crontab.CronItem|crony.cache.CachedJob): The job
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+
+    Returns:
+        tuple: The key
+    """
+    # Compiled schedules are normalised, e.g. '*/30' and '0,30' compile to the same masks.
+    if schedule:
+        return schedule.to_masks()
+    return (_expression(job),)
+
+
+def _get_occurrences(job, schedule, begin, end):
     """Yield all occurrences between a begin and end datetime for a job
 
     Args:
         job (crontab.CronItem): The job to analyse
-        begin (datetime): The begin datetime
-        end (datetime): The end datetime
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
 
     Yields:
-        datetime: The datetimes when the job would run
+        int: The times when the job would run, as seconds since the epoch
     """
+    if schedule:
+        yield from schedule.epochs(begin, end)
+        return
+
     schedule = job.schedule(date_from=begin)
 
     while True:
         occurrence = schedule.get_next()
         if occurrence > end:
             break
-        yield occurrence
+        yield to_epoch(occurrence)
 
 
-def get_job_occurrences(
-    crontab=None, begin=None, end=None, include_disabled=True, **kwargs
-):
-    """Find crontab jobs scheduled within the given time range
+def _get_previous_occurrences(job, schedule, begin, end):
+    """Yield all occurrences between a begin and end datetime for a job, latest first
 
     Args:
-        crontab (crontab.CronTab): A parsed crontab
-        begin (datetime): The datetime to start analysing at (inclusive)
-        end (datetime): The datetime to end analysing at (inclusive)
-        include_disabled (bool): Also analyse enabled jobs?
+        job (crontab.CronItem): The job to analyse
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+
+    Yields:
+        int: The times when the job would run, as seconds since the epoch, in reverse order
+    """
+    if schedule:
+        yield from schedule.reversed_epochs(begin, end)
+        return
+
+    # croniter steps back from just after end, so that an occurrence exactly at it is included.
+    schedule = job.schedule(date_from=end + datetime.timedelta(seconds=1))
+
+    while True:
+        occurrence = schedule.get_prev()
+        if occurrence <= begin:
+            break
+        yield to_epoch(occurrence)
+
+
+def _month_shards(begin, end):
+    """Split a period into its calendar months
+
+    Each shard starts where the one before ends, so together they hold every occurrence in the
+    period exactly once.
+
+    Args:
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+
+    Returns:
+        list: Tuples of (begin datetime (exclusive), end datetime (inclusive)) for each month
+    """
+    shards = []
+    year, month = (begin.year, begin.month)
+    while True:
+        year, month = (year + month // 12, month % 12 + 1)
+        # Ending a second before the month does, as begin does before its minute.
+        boundary = datetime.datetime(year, month, 1) - datetime.timedelta(seconds=1)
+        if boundary >= end:
+            break
+        if boundary > begin:
+            shards.append((begin, boundary))
+            begin = boundary
+    shards.append((begin, end))
+    return shards
+
+
+def _expand_shard(expression, masks, begin, end):
+    """Expand a schedule over part of a period, in a worker process
+
+    Args:
+        expression (str): The schedule as a five field cron expression
+        masks (tuple): The compiled schedule's masks, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+
+    Returns:
+        array.array: The occurrences as 64-bit seconds since the epoch
+    """
+    if masks:
+        return array("q", Schedule.from_masks(masks).epochs(begin, end))
+    job = CachedJob("", "", True, expression, None)
+    return array("q", _get_occurrences(job, None, begin, end))
+
+
+class Pool:
+    """The pool of processes which long periods are expanded across, sized to the core count.
+
+    The processes are only started once a long period is expanded, and are shut down when the
+    pool is closed - as it is on leaving a with block.
+    """
+
+    def __init__(self, executor=None):
+        """Initialiser
+
+        Args:
+            executor (concurrent.futures.Executor): The executor to expand with, if not a pool of
+                processes started when first needed
+        """
+        self._executor = executor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def executor(self):
+        """The executor, starting the processes the first time
+
+        Returns:
+            concurrent.futures.Executor: The executor
+        """
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return self._executor
+
+    def close(self):
+        """Shut down the processes, if they were started"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def _sharded_occurrences(job, schedule, begin, end, executor, ahead):
+    """Yield all occurrences between a begin and end datetime for a job, a month at a time
+
+    The months are expanded in parallel, and stitched back together in order.
+
+    Args:
+        job (crontab.CronItem): The job to analyse
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+        executor (concurrent.futures.Executor): The executor to expand the months with
+        ahead (int): The most months to expand ahead of the one being iterated over
 
     Yields:
-        list: A list of Jobs, one for each job found to be scheduled in the
-        given time range
+        int: The times when the job would run, as seconds since the epoch
+    """
+    expression = _expression(job)
+    masks = schedule.to_masks() if schedule else None
+    shards = iter(_month_shards(begin, end))
+
+    # Only so many months are expanded ahead, so that memory use is bounded however long the
+    # period is.
+    pending = deque(
+        executor.submit(_expand_shard, expression, masks, *shard)
+        for shard in itertools.islice(shards, ahead)
+    )
+    while pending:
+        epochs = pending.popleft().result()
+        for shard in itertools.islice(shards, 1):
+            pending.append(executor.submit(_expand_shard, expression, masks, *shard))
+        yield from epochs
+
+
+def _expand(job, schedule, begin, end, pool=None):
+    """Yield all occurrences between a begin and end datetime for a job, in parallel if long
+
+    Args:
+        job (crontab.CronItem): The job to analyse
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+        pool (Pool): The pool of processes to expand a long period across, a month at a time,
+            if any
+
+    Returns:
+        iterator: The times when the job would run, as seconds since the epoch
+    """
+    months = (end.year - begin.year) * 12 + end.month - begin.month
+    processes = os.cpu_count() or 1
+    if pool is None or months < _MIN_SHARDED_MONTHS or processes < 2:
+        return _get_occurrences(job, schedule, begin, end)
+
+    _logger.debug(f"Expanding {job.command} across {processes} processes")
+    return _sharded_occurrences(
+        job, schedule, begin, end, pool.executor, processes * _SHARDS_AHEAD
+    )
+
+
+def _count_occurrences(job, schedule, begin, end):
+    """Count all occurrences between a begin and end datetime for a job
+
+    Args:
+        job (crontab.CronItem): The job to analyse
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+
+    Returns:
+        int: The number of times the job would run
+    """
+    if schedule:
+        return schedule.count(begin, end)
+
+    # croniter can only count by stepping, but we needn't hold on to what it steps over.
+    return sum(1 for _ in _get_occurrences(job, schedule, begin, end))
+
+
+def occurs(job, schedule, begin, end):
+    """Check whether a job occurs between a begin and end datetime
+
+    Args:
+        job (crontab.CronItem): The job to analyse
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+
+    Returns:
+        bool: Whether the job would run at least once
+    """
+    if schedule:
+        return schedule.first(begin, end) is not None
+
+    # croniter expands lazily, so this stops at the first occurrence.
+    return next(_get_occurrences(job, schedule, begin, end), None) is not None
+
+
+def exclusive_begin(begin):
+    """Get the exclusive begin datetime occurrences are expanded after, for a begin datetime
+
+    Args:
+        begin (datetime): The datetime to start analysing at (inclusive)
+
+    Returns:
+        datetime: The datetime to expand occurrences after
     """
     # 'Hacky' treatment to ensure that the passed minute is included in the schedule
     # if it were to match a crontab - python-crontab seems to not include it!
@@ -94,8 +782,19 @@ def get_job_occurrences(
     begin = datetime.datetime(
         begin.year, begin.month, begin.day, begin.hour, begin.minute, 0, 0
     )
-    begin -= datetime.timedelta(seconds=1)
+    return begin - datetime.timedelta(seconds=1)
+
 
+def analysed_jobs(crontab, include_disabled):
+    """Yield the jobs of a crontab which are to be analysed
+
+    Args:
+        crontab (crontab.CronTab): A parsed crontab
+        include_disabled (bool): Also analyse enabled jobs?
+
+    Yields:
+        crontab.CronItem|crony.cache.CachedJob: The jobs
+    """
     for job in crontab:
         if not job.is_valid():  # pragma: no cover
             # Looking at how crontab.CronTab is written, invalid lines are
@@ -109,4 +808,385 @@ def get_job_occurrences(
             _logger.debug(f"Skipping {job.command} as it is disabled")
             continue
 
-        yield JobOccurrences(job, list(_get_occurrences(job, begin, end)))
+        yield job
+
+
+def get_job_occurrences(
+    crontab=None,
+    begin=None,
+    end=None,
+    include_disabled=True,
+    engine=Engine.NATIVE,
+    retained=None,
+    pool=None,
+    **kwargs,
+):
+    """Find crontab jobs scheduled within the given time range
+
+    Args:
+        crontab (crontab.CronTab): A parsed crontab
+        begin (datetime): The datetime to start analysing at (inclusive)
+        end (datetime): The datetime to end analysing at (inclusive)
+        include_disabled (bool): Also analyse enabled jobs?
+        engine (Engine): The engine to expand schedules with
+        retained (Retained): Expansions kept from a previous analysis, to reuse and add to
+        pool (Pool): The pool of processes to expand long periods across, a month at a time, if
+            any
+
+    Yields:
+        JobOccurrences: One for each job in the crontab, whose occurrences in the
+        given time range are streamed as they're iterated over
+    """
+    begin = exclusive_begin(begin)
+
+    # The values each field takes within the period, which rule out the schedules that can't run
+    # in it before anything is compiled or expanded.
+    window = window_masks(begin, end)
+
+    jobs = []
+    for job in analysed_jobs(crontab, include_disabled):
+        # Jobs which can't run in the period needn't even be compiled, which is most of the cost
+        # of those which can't.
+        masks = field_masks(job)
+        if masks and not can_run_within(masks, window):
+            jobs.append((job, None, _NEVER))
+            continue
+
+        schedule = compile_schedule(job, engine)
+        jobs.append((job, schedule, _schedule_key(job, schedule)))
+
+    # Group the jobs by schedule, so that each distinct schedule is expanded once and shared
+    # between its jobs.
+    counts = Counter(key for _, _, key in jobs)
+    _logger.debug(f"Analysing {len(jobs)} jobs with {len(counts)} distinct schedules")
+
+    if retained is None:
+        budget = _Budget(_MAX_SHARED_OCCURRENCES)
+        expansions = {}
+    else:
+        budget = retained.budget
+        expansions = retained.keep(begin, end, counts)
+        _logger.debug(f"Reusing {len(expansions)} schedules' expansions")
+        for key, expansion in expansions.items():
+            expansion.jobs = counts[key]
+
+    for job, schedule, key in jobs:
+        expansion = expansions.get(key)
+        if expansion is None:
+            expansion = expansions[key] = _Expansion(
+                job,
+                schedule,
+                begin,
+                end,
+                counts[key],
+                budget,
+                retained is not None,
+                pool,
+                count=0 if key == _NEVER else None,
+            )
+        yield JobOccurrences(job, begin, end, engine, expansion)
+
+
+def _merge_windows(windows):
+    """Sort periods, and merge those which overlap or meet
+
+    Args:
+        windows (iterable): Tuples of (begin datetime (exclusive), end datetime (inclusive))
+
+    Returns:
+        list: The merged periods, as tuples of (begin (exclusive), end (inclusive)), in order
+    """
+    merged = []
+    for begin, end in sorted(windows):
+        if end <= begin:
+            continue
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+    return merged
+
+
+def get_window_occurrences(
+    crontab=None,
+    windows=None,
+    include_disabled=True,
+    engine=Engine.NATIVE,
+    **kwargs,
+):
+    """Find crontab jobs scheduled within each of many time ranges, in a single sweep
+
+    Rather than analysing each window in turn, the windows are sorted and merged, and each
+    distinct schedule is compiled once and expanded once across the merged windows in order,
+    skipping the gaps between them - so the cost is close to that of the union of the windows,
+    however many there are. Each window then finds its share of the occurrences by binary search.
+
+    Unlike get_job_occurrences(), the occurrences are held in memory, so this suits many short
+    windows, e.g. outages, rather than long ones.
+
+    Args:
+        crontab (crontab.CronTab): A parsed crontab
+        windows (list): Tuples of (the datetime to start analysing at (inclusive), the datetime to
+            end analysing at (inclusive)), in any order
+        include_disabled (bool): Also analyse enabled jobs?
+        engine (Engine): The engine to expand schedules with
+
+    Returns:
+        list: For each window, in the order given, a list of the JobOccurrences in it, as
+        get_job_occurrences() yields them
+    """
+    windows = [(exclusive_begin(begin), end) for begin, end in windows]
+    spans = _merge_windows(windows)
+    span_masks = [window_masks(begin, end) for begin, end in spans]
+
+    jobs = []
+    expansions = {_NEVER: (None, memoryview(array("q")))}
+    for job in analysed_jobs(crontab, include_disabled):
+        # Only the merged windows the job may run in are expanded.
+        masks = field_masks(job)
+        feasible = [not masks or can_run_within(masks, m) for m in span_masks]
+        if not any(feasible):
+            jobs.append((job, _NEVER))
+            continue
+
+        schedule = compile_schedule(job, engine)
+        key = _schedule_key(job, schedule)
+        if key not in expansions:
+            occurrences = array("q")
+            for (begin, end), may_run in zip(spans, feasible):
+                if may_run:
+                    occurrences.extend(_get_occurrences(job, schedule, begin, end))
+            expansions[key] = (schedule, memoryview(occurrences))
+        jobs.append((job, key))
+
+    _logger.debug(
+        f"Analysed {len(jobs)} jobs with {len(expansions) - 1} distinct schedules across "
+        f"{len(windows)} windows, merged into {len(spans)}"
+    )
+
+    windowed = []
+    for begin, end in windows:
+        # Jobs sharing a schedule share its slice of the occurrences, and so its expansion.
+        slices = {}
+        window_jobs = []
+        for job, key in jobs:
+            expansion = slices.get(key)
+            if expansion is None:
+                schedule, occurrences = expansions[key]
+                start = bisect.bisect_right(occurrences, to_epoch(begin))
+                stop = bisect.bisect_right(occurrences, to_epoch(end), start)
+                expansion = slices[key] = SlicedExpansion(
+                    schedule, occurrences, start, stop
+                )
+            window_jobs.append(JobOccurrences(job, begin, end, engine, expansion))
+        windowed.append(window_jobs)
+    return windowed
+
+
+def _shift(dt, delta):
+    """Shift a datetime, stopping at the least or greatest datetime
+
+    Args:
+        dt (datetime): The datetime
+        delta (timedelta): How far to shift it
+
+    Returns:
+        datetime: The shifted datetime
+    """
+    try:
+        return dt + delta
+    except OverflowError:
+        return (
+            datetime.datetime.max
+            if delta > datetime.timedelta(0)
+            else datetime.datetime.min
+        )
+
+
+def _search(job, schedule, begin, end, backwards):
+    """Stream a job's occurrences between a begin and end datetime, in either direction
+
+    Args:
+        job (crontab.CronItem): The job to analyse
+        schedule (crony.schedule.Schedule): The job's compiled schedule, or None to use croniter
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+        backwards (bool): Stream them latest first
+
+    Yields:
+        int: The occurrences as seconds since the epoch
+    """
+    search = _get_previous_occurrences if backwards else _get_occurrences
+    try:
+        yield from search(job, schedule, begin, end)
+    except ValueError:
+        # croniter gives up on a schedule which never runs, e.g. '0 0 30 2 *', rather than
+        # finding nothing.
+        _logger.debug(f"croniter found no more occurrences of {job.command}")
+
+
+def _find_occurrences(
+    crontab, begin, end, count, include_disabled, engine, across_jobs, backwards
+):
+    """Find the first occurrences of each job, or across every job, in either direction
+
+    Each distinct schedule is searched once for its jobs, and only until enough occurrences are
+    found. Across every job, the schedules' searches are merged lazily with a heap, so each is only
+    searched as far as the last occurrence needed from it.
+
+    Args:
+        crontab (crontab.CronTab): A parsed crontab
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+        count (int): The number of occurrences to find
+        include_disabled (bool): Also analyse enabled jobs?
+        engine (Engine): The engine to expand schedules with
+        across_jobs (bool): Find them across every job, rather than for each job
+        backwards (bool): Search back from end, rather than on from begin
+
+    Returns:
+        list: The JobOccurrences for each job in the crontab, whose occurrences are those found,
+        in order
+    """
+    jobs = []
+    # The jobs' indices, and a job and compiled schedule to search with, by schedule key.
+    groups = {}
+    for job in analysed_jobs(crontab, include_disabled):
+        schedule = compile_schedule(job, engine)
+        key = _schedule_key(job, schedule)
+        groups.setdefault(key, ([], job, schedule))[0].append(len(jobs))
+        jobs.append((job, schedule))
+    groups = list(groups.values())
+    _logger.debug(
+        f"Searching for {count} occurrences of {len(jobs)} jobs with {len(groups)} distinct "
+        f"schedules"
+    )
+
+    epochs = [array("q") for _ in groups]
+    members = [indices for indices, _, _ in groups]
+    if count > 0 and not across_jobs:
+        for i, (_, job, schedule) in enumerate(groups):
+            epochs[i].extend(
+                itertools.islice(_search(job, schedule, begin, end, backwards), count)
+            )
+    elif count > 0:
+        # Jobs sharing a schedule are split up, as the last time found may only be some of theirs.
+        epochs = [array("q") for _ in jobs]
+        members = [[i] for i in range(len(jobs))]
+        merged = heapq.merge(
+            *(
+                zip(_search(job, schedule, begin, end, backwards), itertools.repeat(i))
+                for i, (_, job, schedule) in enumerate(groups)
+            ),
+            reverse=backwards,
+        )
+        remaining = count
+        for epoch, same in itertools.groupby(merged, key=lambda o: o[0]):
+            # Jobs occurring at the same time are taken in crontab order.
+            occurring = sorted(i for _, group in same for i in groups[group][0])
+            for i in occurring[:remaining]:
+                epochs[i].append(epoch)
+            remaining -= len(occurring)
+            if remaining <= 0:
+                break
+
+    if backwards:
+        for found in epochs:
+            found.reverse()
+
+    occurrences = [None] * len(jobs)
+    for found, group in zip(epochs, members):
+        expansion = SlicedExpansion(jobs[group[0]][1], memoryview(found), 0, len(found))
+        for i in group:
+            occurrences[i] = JobOccurrences(jobs[i][0], begin, end, engine, expansion)
+    return occurrences
+
+
+def get_next_occurrences(
+    crontab=None,
+    begin=None,
+    count=1,
+    include_disabled=True,
+    engine=Engine.NATIVE,
+    across_jobs=False,
+    **kwargs,
+):
+    """Find the next occurrences of crontab jobs from a datetime, without a period to end at
+
+    Args:
+        crontab (crontab.CronTab): A parsed crontab
+        begin (datetime): The datetime to start searching at (inclusive)
+        count (int): The number of occurrences to find
+        include_disabled (bool): Also analyse enabled jobs?
+        engine (Engine): The engine to expand schedules with
+        across_jobs (bool): Find the next count occurrences across every job, rather than of each
+
+    Returns:
+        list: The JobOccurrences for each job in the crontab, whose occurrences are those found,
+        in order
+    """
+    begin = exclusive_begin(begin)
+    return _find_occurrences(
+        crontab,
+        begin,
+        _shift(begin, _SEARCH_HORIZON),
+        count,
+        include_disabled,
+        engine,
+        across_jobs,
+        backwards=False,
+    )
+
+
+def get_previous_occurrences(
+    crontab=None,
+    end=None,
+    count=1,
+    include_disabled=True,
+    engine=Engine.NATIVE,
+    across_jobs=False,
+    **kwargs,
+):
+    """Find the previous occurrences of crontab jobs up to a datetime, searching back from it
+
+    Args:
+        crontab (crontab.CronTab): A parsed crontab
+        end (datetime): The datetime to search back from (inclusive)
+        count (int): The number of occurrences to find
+        include_disabled (bool): Also analyse enabled jobs?
+        engine (Engine): The engine to expand schedules with
+        across_jobs (bool): Find the last count occurrences across every job, rather than of each
+
+    Returns:
+        list: The JobOccurrences for each job in the crontab, whose occurrences are those found,
+        in order
+    """
+    return _find_occurrences(
+        crontab,
+        _shift(end, -_SEARCH_HORIZON),
+        end,
+        count,
+        include_disabled,
+        engine,
+        across_jobs,
+        backwards=True,
+    )
+
+
+def group_by_schedule(jobs):
+    """Group jobs by the schedule they share, as found by get_job_occurrences()
+
+    Jobs in the same group have identical occurrences, so anything worked out from the
+    occurrences of one of them holds for all of them.
+
+    Args:
+        jobs (iterable): The JobOccurrences
+
+    Returns:
+        list: A list of the JobOccurrences for each schedule, in the order the schedules first
+        appear in
+    """
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.schedule_key, []).append(job)
+    return list(groups.values())
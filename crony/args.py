@@ -1,13 +1,15 @@
 import sys
 import os
 import logging
+import re
 from datetime import datetime
 import argparse
+import functools
 
-import dateparser
-
+import crony.analyser
 import crony.core
 import crony.manifest
+import crony.output
 from crony.levelledoption import LevelledOption
 
 _logger = logging.getLogger(__name__)
@@ -29,14 +31,47 @@ _DETAIL_LEVELS = LevelledOption(
 )
 
 
+# Numeric timestamps, as dateparser accepts them - in seconds, optionally followed by the
+# milliseconds and microseconds.
+_TIMESTAMP_REGEX = re.compile(r"^(\d{10})(\d{3})?(\d{3})?$")
+
+
+def _parse_datetime_strictly(s):
+    """Parse a datetime in one of the formats which don't need dateparser
+
+    These are the preferred DEFAULT_DATE_FORMAT and numeric timestamps, which are by far
+    the most common formats passed, so this saves importing dateparser, which is slow.
+
+    Args:
+        s (str): A datetime str to parse
+
+    Returns:
+        datetime: The parsed datetime, or None if s isn't in either format
+    """
+    try:
+        return datetime.strptime(s, crony.core.DEFAULT_DATE_FORMAT)
+    except ValueError:
+        pass
+
+    match = _TIMESTAMP_REGEX.match(s)
+    if match:
+        seconds, milliseconds, microseconds = match.groups()
+        return datetime.fromtimestamp(int(seconds)).replace(
+            microsecond=int(milliseconds or 0) * 1000 + int(microseconds or 0)
+        )
+
+    return None
+
+
 def _valid_datetime(s):
     """Convert an argparse arg to a datetime.
 
     From https://stackoverflow.com/questions/25470844/specify-format-for-input-arguments-argparse-python
 
     The preferred, most reliable format to use is DEFAULT_DATE_FORMAT and this the one
-    which is checked first. However, other formats (relative & absolute) are permitted
-    by dateparser.parse().
+    which is checked first, along with numeric timestamps - neither of which need dateparser.
+    However, other formats (relative & absolute) are permitted by dateparser.parse(), which
+    is only imported when it's needed, as it's slow to load.
 
     In the case that the dateparser package dies, the following is honestly good enough
     for us!
@@ -51,7 +86,13 @@ def _valid_datetime(s):
     Returns:
         datetime: The parsed datetime
     """
+    dt = _parse_datetime_strictly(s)
+    if dt:
+        return dt
+
     try:
+        import dateparser
+
         # It took some digging to work out what's actually meant when passing
         # the date_formats parameter. The docs make it sound like *only* the
         # formats in date_formats are permitted, but it's actually a known format which
@@ -98,8 +139,116 @@ def _valid_datetime(s):
         raise argparse.ArgumentTypeError(message)
 
 
+def _valid_duration(s):
+    """Convert an argparse arg to a duration
+
+    Args:
+        s (str): The arg, e.g. '15m'
+
+    Raises:
+        argparse.ArgumentTypeError: Raised on an invalid duration
+
+    Returns:
+        int: The duration in seconds
+    """
+    from crony import overlaps
+
+    try:
+        return overlaps.parse_duration(s)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _valid_regex(s):
+    """Convert an argparse arg to a regular expression
+
+    Args:
+        s (str): The arg
+
+    Raises:
+        argparse.ArgumentTypeError: Raised on an invalid regular expression
+
+    Returns:
+        re.Pattern: The compiled regular expression
+    """
+    try:
+        return re.compile(s)
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"Invalid regular expression: '{s}': {e}.")
+
+
+def _valid_host(s):
+    """Convert an argparse arg to an address crony serve may listen on
+
+    Args:
+        s (str): The arg
+
+    Raises:
+        argparse.ArgumentTypeError: Raised on an address which isn't a loopback one
+
+    Returns:
+        str: The address
+    """
+    # asyncio is slow to import, so only do so for the daemon.
+    import crony.serve
+
+    if not crony.serve.is_loopback(s):
+        raise argparse.ArgumentTypeError(
+            f"'{s}' isn't a loopback address - queries aren't authenticated, so may only come from this host."
+        )
+    return s
+
+
+def _valid_windows(s):
+    """Convert an argparse arg to the windows listed in the file it names
+
+    Each line of the file is a window, as 'begin -> end' (as crony's header shows it) or
+    'begin,end', with each datetime in any of the formats _valid_datetime() accepts. Blank lines
+    and comments starting with '#' are skipped.
+
+    Args:
+        s (str): The path of the file
+
+    Raises:
+        argparse.ArgumentTypeError: Raised on a missing file, or an invalid window
+
+    Returns:
+        list: Tuples of (begin datetime, end datetime)
+    """
+    try:
+        with open(s) as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        raise argparse.ArgumentTypeError(f"Unable to read the windows in '{s}': {e}")
+
+    windows = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        begin, separator, end = line.partition("->" if "->" in line else ",")
+        if not separator:
+            raise argparse.ArgumentTypeError(
+                f"Invalid window on line {number} of '{s}': '{line}'."
+            )
+        windows.append((_valid_datetime(begin.strip()), _valid_datetime(end.strip())))
+    return windows
+
+
+class _RepeatableDatetime(argparse.Action):
+    """Stores the last datetime passed, also collecting each one, so that -b/-e can be repeated"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+        setattr(
+            namespace,
+            f"{self.dest}s",
+            getattr(namespace, f"{self.dest}s", []) + [values],
+        )
+
+
 def _add_begin_end_argument(parser, begin_end, begin_end_short):
-    help_ = "the datetime to {begin_end} at, defaults to the current datetime. The preferred format is (YYYY-MM-DD HH:MM:SS), however - other relative and absolute formats are permitted".format(
+    help_ = "the datetime to {begin_end} at, defaults to the current datetime. The preferred format is (YYYY-MM-DD HH:MM:SS), however - other relative and absolute formats are permitted. Repeat -b and -e in pairs to report on many windows".format(
         begin_end=begin_end
     )
 
@@ -108,6 +257,7 @@ def _add_begin_end_argument(parser, begin_end, begin_end_short):
         f"--{begin_end}",
         default=_NOW,
         type=_valid_datetime,
+        action=_RepeatableDatetime,
         metavar="\b",
         help=help_.format(type=type),
     )
@@ -134,18 +284,32 @@ def _reinterpret_args(args):
     return args
 
 
-def parse(args=None):
-    """Parse program args
+class _QueryParser(argparse.ArgumentParser):
+    """An argument parser which raises ValueError on invalid args, rather than exiting"""
+
+    def print_help(self, file=None):
+        raise ValueError(self.format_help())
+
+    def exit(self, status=0, message=None):
+        raise ValueError(message or "")
+
+    def error(self, message):
+        raise ValueError(message)
+
+
+def _build_parser(parser_class=argparse.ArgumentParser):
+    """Build the parser of crony's options
 
     Args:
-        args (list, optional): When defaulted, uses the arguments entered at the terminal, else uses
-                               those passed.
+        parser_class (type): The argparse.ArgumentParser (sub)class to build
+
     Returns:
-        dict: The parsed arguments
+        argparse.ArgumentParser: The parser
     """
-    args = _reinterpret_args(args)
+    # Each mode's module is only imported when the args are parsed, not when crony starts.
+    from crony import histogram
 
-    parser = argparse.ArgumentParser(description=crony.manifest.description)
+    parser = parser_class(description=crony.manifest.description)
 
     # Version output:
     parser.add_argument(
@@ -162,17 +326,81 @@ def parse(args=None):
     _add_begin_end_argument(parser, "begin", "b")
     _add_begin_end_argument(parser, "end", "e")
 
-    # Crontab reference - only allow 0 or 1 to remove any ambiguity:
+    parser.add_argument(
+        "--windows",
+        type=_valid_windows,
+        metavar="\b",
+        help="the path to a file of windows to report on in turn, one per line as 'begin -> end' or 'begin,end' - the crontab is parsed once, and its schedules expanded once across all of them",
+    )
+
+    parser.add_argument(
+        "--at",
+        action="append",
+        type=_valid_datetime,
+        metavar="\b",
+        help="report on the jobs which run at this datetime's minute instead, looked up from an index of their schedules rather than expanded - may be repeated",
+    )
+
+    # Runs to search for, rather than a datetime range:
+    runs_group = parser.add_mutually_exclusive_group()
+
+    runs_group.add_argument(
+        "--next",
+        type=int,
+        metavar="\b",
+        help="report on the next N runs of each job from --begin instead, stopping as soon as they're found - with --timeline, the next N runs across every job",
+    )
+
+    runs_group.add_argument(
+        "--previous",
+        type=int,
+        metavar="\b",
+        help="report on the last N runs of each job up to --end instead, searching back from it - with --timeline, the last N runs across every job",
+    )
+
+    # Crontab reference - only allow files or a user to remove any ambiguity:
     crontab_group = parser.add_mutually_exclusive_group()
 
     crontab_group.add_argument(
-        "-f", "--file", metavar="\b", help="the path to a crontab to be analysed"
+        "-f",
+        "--file",
+        dest="files",
+        action="append",
+        metavar="\b",
+        help="the path to a crontab to be analysed, or a glob or directory of them - may be repeated",
     )
 
     crontab_group.add_argument(
         "-u", "--user", metavar="\b", help="the user whose crontab is to be analysed"
     )
 
+    crontab_group.add_argument(
+        "--system",
+        nargs="?",
+        const="/",
+        metavar="ROOT",
+        help="report on every crontab on the host together: /etc/crontab, /etc/cron.d and the user spool, under ROOT if given",
+    )
+
+    crontab_group.add_argument(
+        "--index",
+        metavar="\b",
+        help="the path of an index built by 'crony index build' to answer from, rather than expanding the crontab's schedules",
+    )
+
+    parser.add_argument(
+        "--watch",
+        "-w",
+        action="store_true",
+        help="watch the crontab file, and report again each time it changes, only re-analysing the jobs which have changed",
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="cache parsed crontabs on disk (under $XDG_CACHE_HOME), so that an unchanged crontab isn't parsed again",
+    )
+
     # Disabled options:
     parser.add_argument(
         "--include-disabled",
@@ -200,12 +428,337 @@ def parse(args=None):
         parser, "output with the level of detail set to: {level}"
     )
 
+    parser.add_argument(
+        "--timeline",
+        "-t",
+        action="store_true",
+        help="output every occurrence of every job in chronological order, rather than grouped by job",
+    )
+
+    parser.add_argument(
+        "--histogram",
+        choices=[b.name.lower() for b in histogram.Bucket],
+        help="output the busiest minutes, hours or days by the number of jobs starting, and the jobs starting in them",
+    )
+
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        metavar="\b",
+        help="the number of the busiest buckets to output with --histogram, or the longest periods with --quiet, defaults to 10",
+    )
+
+    parser.add_argument(
+        "--overlaps",
+        action="store_true",
+        help="output the jobs whose runs overlap and the maximum concurrency, using the duration hinted at in each job's comment (e.g. '# duration=15m'), or --durations",
+    )
+
+    parser.add_argument(
+        "--durations",
+        metavar="\b",
+        help="the path to a file of job durations for --overlaps, with a duration then a command on each line, e.g. '15m /usr/local/bin/backup.sh'",
+    )
+
+    parser.add_argument(
+        "--default-duration",
+        type=_valid_duration,
+        metavar="\b",
+        help="the duration of jobs without one for --overlaps, which are otherwise left out",
+    )
+
+    parser.add_argument(
+        "--concurrency-limit",
+        type=int,
+        metavar="\b",
+        help="also output the periods when more jobs than this are running with --overlaps",
+    )
+
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="output the longest periods without any job starting, e.g. to schedule maintenance in",
+    )
+
+    parser.add_argument(
+        "--min-quiet",
+        type=_valid_duration,
+        metavar="\b",
+        help="the least a period lasts for to be output with --quiet, e.g. 30m",
+    )
+
+    parser.add_argument(
+        "--quiet-jobs",
+        type=_valid_regex,
+        metavar="\b",
+        help="only count the jobs whose lines match this regular expression as activity with --quiet",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=[f.value for f in crony.output.Format],
+        default=crony.output.Format.TEXT.value,
+        help="the output format, jsonl, csv and binary are intended for other programs to read",
+    )
+
+    # Analysis options:
+    parser.add_argument(
+        "--engine",
+        choices=[e.value for e in crony.analyser.Engine],
+        default=crony.analyser.Engine.NATIVE.value,
+        help="the engine used to expand job schedules, croniter is slower but is the reference implementation",
+    )
+
+    # Profiling options:
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="report the time spent in each phase, the slowest jobs to expand and the peak memory to stderr",
+    )
+
+    parser.add_argument(
+        "--profile-json",
+        metavar="\b",
+        help="write the profiling report as JSON to this path instead, implies --profile",
+    )
+
+    parser.add_argument(
+        "--profile-stats",
+        metavar="\b",
+        help="also dump cProfile stats to this path, for use with pstats, implies --profile",
+    )
+
+    return parser
+
+
+@functools.lru_cache(maxsize=None)
+def _query_parser():
+    """Get the parser of the options queries to crony serve are made with, building it once
+
+    Returns:
+        _QueryParser: The parser
+    """
+    return _build_parser(_QueryParser)
+
+
+def _interpret(parsed, parser):
+    """Do the parsing of parsed args which argparse can't do itself
+
+    Args:
+        parsed (dict): The parsed args, which are updated
+        parser (argparse.ArgumentParser): The parser, to report invalid args with
+    """
+    # Windows are listed in a file, or passed as repeated -b/-e pairs, or both.
+    begins, ends = (parsed.pop("begins", []), parsed.pop("ends", []))
+    if parsed["windows"] or len(begins) > 1 or len(ends) > 1:
+        if len(begins) != len(ends):
+            parser.error(
+                "-b/--begin and -e/--end must be passed in pairs for many windows"
+            )
+        parsed["windows"] = (parsed["windows"] or []) + list(zip(begins, ends))
+    if parsed["at"] and parsed["windows"]:
+        parser.error("--at can't be used with many windows")
+    if parsed["at"] and (parsed["histogram"] or parsed["overlaps"] or parsed["quiet"]):
+        parser.error("--at can't be used with --histogram, --overlaps or --quiet")
+    for runs in ("next", "previous"):
+        if parsed[runs] is None:
+            continue
+        if parsed[runs] < 1:
+            parser.error(f"--{runs} must be at least 1")
+        if parsed["windows"] or parsed["at"]:
+            parser.error(f"--{runs} can't be used with many windows or --at")
+        if parsed["histogram"] or parsed["overlaps"] or parsed["quiet"]:
+            parser.error(
+                f"--{runs} can't be used with --histogram, --overlaps or --quiet"
+            )
+
+    parsed["log_level"] = _LOG_LEVELS.parse(parsed)
+    parsed["detail_level"] = crony.core.DetailLevel[_DETAIL_LEVELS.parse(parsed)]
+    if parsed["next"] or parsed["previous"]:
+        # The runs found are the point, so they're always output.
+        parsed["detail_level"] = crony.core.DetailLevel.FULL
+    elif len(parsed["at"] or []) > 1:
+        # So is which of the times each job runs at.
+        parsed["detail_level"] = crony.core.DetailLevel.FULL
+    parsed["engine"] = crony.analyser.Engine(parsed["engine"])
+    parsed["format"] = crony.output.Format(parsed["format"])
+    if parsed["histogram"]:
+        from crony import histogram
+
+        parsed["histogram"] = histogram.Bucket[parsed["histogram"].upper()]
+    parsed["profile"] = bool(
+        parsed["profile"] or parsed["profile_json"] or parsed["profile_stats"]
+    )
+
+
+def _parse_serve(args):
+    """Parse the args of crony serve
+
+    Args:
+        args (list): The args following 'serve'
+
+    Returns:
+        dict: The parsed arguments
+    """
+    parser = argparse.ArgumentParser(
+        prog="crony serve",
+        description="Answer queries over a Unix domain socket or a localhost HTTP port, keeping parsed crontabs in memory.",
+    )
+
+    _LOG_LEVELS.add_to_parser(parser, "log at the {level} level")
+
+    listen_group = parser.add_mutually_exclusive_group()
+
+    listen_group.add_argument(
+        "--socket",
+        metavar="\b",
+        help="the path of the Unix domain socket to listen on, defaults to crony.sock in $XDG_RUNTIME_DIR",
+    )
+
+    listen_group.add_argument(
+        "--port",
+        type=int,
+        metavar="\b",
+        help="the TCP port to listen on instead, on localhost",
+    )
+
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        type=_valid_host,
+        metavar="\b",
+        help="the loopback address to listen on with --port, defaults to 127.0.0.1",
+    )
+
+    parsed = vars(parser.parse_args(args=args))
+    parsed["log_level"] = _LOG_LEVELS.parse(parsed)
+    parsed["serve"] = True
+
+    return parsed
+
+
+def _parse_index(args):
+    """Parse the args of crony index
+
+    Args:
+        args (list): The args following 'index'
+
+    Returns:
+        dict: The parsed arguments
+    """
+    from crony.index import DEFAULT_HORIZON
+
+    parser = argparse.ArgumentParser(
+        prog="crony index",
+        description="Index a crontab's occurrences over a horizon, for queries passing --index to answer from.",
+    )
+    subparsers = parser.add_subparsers(dest="index_command", required=True)
+    build = subparsers.add_parser(
+        "build",
+        help="expand every job once over the horizon, into an index file",
+    )
+
+    _LOG_LEVELS.add_to_parser(build, "log at the {level} level")
+
+    build.add_argument(
+        "-b",
+        "--begin",
+        default=_NOW,
+        type=_valid_datetime,
+        metavar="\b",
+        help="the datetime the horizon begins at, defaults to the current datetime",
+    )
+
+    build.add_argument(
+        "-e",
+        "--end",
+        type=_valid_datetime,
+        metavar="\b",
+        help=f"the datetime the horizon ends at, defaults to {DEFAULT_HORIZON.days} days after it begins",
+    )
+
+    crontab_group = build.add_mutually_exclusive_group()
+
+    crontab_group.add_argument(
+        "-f", "--file", metavar="\b", help="the path to the crontab to index"
+    )
+
+    crontab_group.add_argument(
+        "-u", "--user", metavar="\b", help="the user whose crontab is to be indexed"
+    )
+
+    build.add_argument(
+        "-o",
+        "--output",
+        metavar="\b",
+        help="the path to write the index to, defaults to the crontab's path with .index appended",
+    )
+
+    parsed = vars(parser.parse_args(args=args))
+    parsed["log_level"] = _LOG_LEVELS.parse(parsed)
+    parsed["end"] = parsed["end"] or parsed["begin"] + DEFAULT_HORIZON
+    parsed["tab"] = None
+    if not (parsed["file"] or parsed["user"]) and not sys.stdin.isatty():
+        parsed["tab"] = sys.stdin.read()
+
+    if not parsed["output"]:
+        if not parsed["file"]:
+            build.error("--output is needed unless indexing a crontab file")
+        parsed["output"] = f"{parsed['file']}.index"
+
+    return parsed
+
+
+def parse(args=None):
+    """Parse program args
+
+    Args:
+        args (list, optional): When defaulted, uses the arguments entered at the terminal, else uses
+                               those passed.
+    Returns:
+        dict: The parsed arguments
+    """
+    args = _reinterpret_args(args)
+
+    argv = sys.argv[1:] if args is None else args
+    if argv and argv[0] == "serve":
+        return _parse_serve(argv[1:])
+    if argv and argv[0] == "index":
+        return _parse_index(argv[1:])
+
     # Get argparse to do its parsing:
+    parser = _build_parser()
     parsed = vars(parser.parse_args(args=args))
 
     # Then do some parsing of our own:
-    parsed["log_level"] = _LOG_LEVELS.parse(parsed)
-    parsed["detail_level"] = crony.core.DetailLevel[_DETAIL_LEVELS.parse(parsed)]
+    _interpret(parsed, parser)
     parsed["tab"] = None if sys.stdin.isatty() else sys.stdin.read()
 
     return parsed
+
+
+def parse_query(args, tab=None):
+    """Parse the args of a query made to crony serve
+
+    These are crony's own options, but an invalid one raises rather than exiting, and the begin
+    and end datetimes default to the time of the query, rather than when crony started.
+
+    Args:
+        args (list): The args
+        tab (str): The crontab sent with the query, in place of stdin
+
+    Raises:
+        ValueError: If the args are invalid
+
+    Returns:
+        dict: The parsed arguments
+    """
+    now = datetime.now()
+    namespace = argparse.Namespace(begin=now, end=now)
+    parsed = vars(_query_parser().parse_args(args=args, namespace=namespace))
+
+    _interpret(parsed, _query_parser())
+    parsed["tab"] = tab
+
+    return parsed
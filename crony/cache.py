@@ -0,0 +1,329 @@
+import logging
+import marshal
+import os
+import threading
+from collections import OrderedDict
+
+import crony.manifest
+from crony.schedule import Schedule
+
+_logger = logging.getLogger(__name__)
+
+# Bump whenever the snapshot layout changes, so that old snapshots are ignored.
+_FORMAT_VERSION = 2
+
+# The most the cache directory may hold before the least recently used snapshots are evicted.
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+_SNAPSHOT_SUFFIX = ".snapshot"
+
+# The most crontabs passed as content, rather than as files, which are kept in memory at once.
+MAX_RESIDENT_TABS = 256
+
+
+class CachedJob:
+    """A job restored from a snapshot, standing in for the crontab.CronItem it was parsed as.
+
+    Only the parts of crontab.CronItem which crony uses are provided.
+    """
+
+    __slots__ = ("command", "comment", "expression", "compiled", "_line", "_enabled")
+
+    def __init__(self, command, line, enabled, expression, compiled, comment=""):
+        """Initialiser
+
+        Args:
+            command (str): The command text
+            line (str): The rendered cron job line
+            enabled (bool): Whether the job is enabled
+            expression (str): The job's schedule as a five field cron expression
+            compiled (crony.schedule.Schedule): The compiled schedule, or None if croniter is needed
+            comment (str): The job's trailing comment
+        """
+        self.command = command
+        self.comment = comment
+        self.expression = expression
+        self.compiled = compiled
+        self._line = line
+        self._enabled = enabled
+
+    def is_valid(self):
+        # Invalid lines are never snapshotted.
+        return True
+
+    def is_enabled(self):
+        return self._enabled
+
+    def render(self):
+        return self._line
+
+    def schedule(self, date_from=None):
+        """Get a croniter schedule, as crontab.CronItem.schedule() does
+
+        Args:
+            date_from (datetime): The datetime to step from
+
+        Returns:
+            croniter.croniter: The schedule
+        """
+        from datetime import datetime
+
+        from croniter import croniter
+
+        return croniter(self.expression, date_from, ret_type=datetime)
+
+
+def _cache_dir():
+    """Get the directory snapshots are kept in, following the XDG base directory spec
+
+    Returns:
+        str: The cache directory
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, crony.manifest.pkgname)
+
+
+def _sha256(content):
+    """Hash content, only importing hashlib once there's something to hash
+
+    Args:
+        content (bytes): The content
+
+    Returns:
+        hashlib._Hash: The SHA-256 hash
+    """
+    import hashlib
+
+    return hashlib.sha256(content)
+
+
+def _snapshot_path(content):
+    """Get the path of the snapshot for some crontab content
+
+    Args:
+        content (bytes): The crontab content
+
+    Returns:
+        str: The snapshot path
+    """
+    # Snapshots from other versions of crony may have been compiled differently.
+    key = _sha256(crony.manifest.version.encode() + b"\0" + content)
+    return os.path.join(_cache_dir(), key.hexdigest() + _SNAPSHOT_SUFFIX)
+
+
+def load(content):
+    """Load the snapshot of a crontab, if one has been stored
+
+    Args:
+        content (bytes): The crontab content
+
+    Returns:
+        list: The CachedJobs in the crontab, or None if there's no usable snapshot
+    """
+    path = _snapshot_path(content)
+
+    try:
+        with open(path, "rb") as f:
+            version, jobs = marshal.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        _logger.warning(f"Ignoring the unreadable snapshot {path}", exc_info=True)
+        return None
+
+    if version != _FORMAT_VERSION:
+        return None
+
+    # Mark the snapshot as recently used, for eviction.
+    try:
+        os.utime(path)
+    except OSError:  # pragma: no cover
+        pass
+
+    _logger.debug(f"Loaded the snapshot {path}")
+    return from_records(jobs)
+
+
+def to_records(crontab):
+    """Convert a parsed crontab's jobs into plain records, which marshal and pickle cheaply
+
+    Args:
+        crontab (crontab.CronTab): The parsed crontab
+
+    Returns:
+        list: The records, one per valid job
+    """
+    records = []
+    for job in crontab:
+        if not job.is_valid():  # pragma: no cover
+            continue
+        expression = job.slices.clean_render()
+        compiled = Schedule.compile(expression)
+        records.append(
+            (
+                job.command,
+                job.render(),
+                job.is_enabled(),
+                expression,
+                compiled.to_masks() if compiled else None,
+                job.comment,
+            )
+        )
+    return records
+
+
+def from_records(records):
+    """Convert records made by to_records() back into jobs
+
+    Args:
+        records (list): The records
+
+    Returns:
+        list: The CachedJobs
+    """
+    return [
+        CachedJob(
+            command,
+            line,
+            enabled,
+            expression,
+            Schedule.from_masks(masks) if masks else None,
+            comment,
+        )
+        for command, line, enabled, expression, masks, comment in records
+    ]
+
+
+def store(content, crontab, max_bytes=MAX_CACHE_BYTES):
+    """Store a snapshot of a parsed crontab, evicting the least recently used if needed
+
+    Failing to store a snapshot isn't fatal, as it only means the crontab is parsed next time.
+
+    Args:
+        content (bytes): The crontab content
+        crontab (crontab.CronTab): The crontab parsed from the content
+        max_bytes (int): The most the cache directory may hold
+    """
+    jobs = to_records(crontab)
+
+    path = _snapshot_path(content)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then move into place, so concurrent runs never see a partial snapshot.
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            marshal.dump((_FORMAT_VERSION, jobs), f)
+        os.replace(temp_path, path)
+    except OSError:
+        _logger.warning(f"Unable to store the snapshot {path}", exc_info=True)
+        return
+
+    _logger.debug(f"Stored the snapshot {path}")
+    _evict(max_bytes)
+
+
+def _evict(max_bytes):
+    """Evict the least recently used snapshots until the cache fits in max_bytes
+
+    Args:
+        max_bytes (int): The most the cache directory may hold
+    """
+    directory = _cache_dir()
+    snapshots = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(_SNAPSHOT_SUFFIX):
+            stat = entry.stat()
+            snapshots.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in snapshots)
+    for _, size, path in sorted(snapshots):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            _logger.debug(f"Evicted the snapshot {path}")
+        except OSError:  # pragma: no cover
+            pass
+        total -= size
+
+
+class Resident:
+    """Parsed crontabs kept in memory by a long-running process, such as crony serve.
+
+    A file is only parsed again when it changes - its stat is checked on every lookup, and when
+    that differs, its content is hashed, so that a touched but unchanged file isn't parsed again.
+    Crontabs passed as content are kept by their hash, evicting the least recently used.
+    Lookups may be made from many threads at once.
+    """
+
+    def __init__(self, max_tabs=MAX_RESIDENT_TABS):
+        """Initialiser
+
+        Args:
+            max_tabs (int): The most crontabs passed as content to keep
+        """
+        self.max_tabs = max_tabs
+        # Tuples of (stat key, content digest, jobs) by path.
+        self._files = {}
+        # Jobs by content digest, least recently used first.
+        self._tabs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def file(self, path, parse):
+        """Get a crontab file's jobs, parsing it if it's new or has changed
+
+        Args:
+            path (str): The path of the crontab
+            parse (callable): Parses the crontab at a path into to_records() records
+
+        Returns:
+            list: The CachedJobs in the crontab
+        """
+        stat = os.stat(path)
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            resident = self._files.get(path)
+        if resident and resident[0] == key:
+            return resident[2]
+
+        with open(path, "rb") as f:
+            digest = _sha256(f.read()).digest()
+        if resident and resident[1] == digest:
+            _logger.debug(f"{path} was touched, but its content is unchanged")
+            jobs = resident[2]
+        else:
+            _logger.info(f"Parsing {path}, as it's {'changed' if resident else 'new'}")
+            jobs = from_records(parse(path))
+
+        with self._lock:
+            self._files[path] = (key, digest, jobs)
+        return jobs
+
+    def tab(self, content, parse):
+        """Get a crontab's jobs from its content, parsing it if it hasn't been seen recently
+
+        Args:
+            content (bytes): The crontab content
+            parse (callable): Parses the content into to_records() records
+
+        Returns:
+            list: The CachedJobs in the crontab
+        """
+        digest = _sha256(content).digest()
+
+        with self._lock:
+            jobs = self._tabs.get(digest)
+            if jobs is not None:
+                self._tabs.move_to_end(digest)
+                return jobs
+
+        jobs = from_records(parse(content))
+
+        with self._lock:
+            self._tabs[digest] = jobs
+            while len(self._tabs) > self.max_tabs:
+                self._tabs.popitem(last=False)
+        return jobs
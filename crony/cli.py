@@ -1,6 +1,7 @@
 import sys
 import os
 import logging
+import time
 from datetime import datetime
 
 import crony.core
@@ -25,13 +26,41 @@ def main(args=None):
     try:
         _init_logging()
 
+        started = time.perf_counter()
         parsed_args = crony.args.parse(args)
+        parsed = time.perf_counter()
 
         # Configure the log level to that passed
         logging.getLogger().setLevel(parsed_args["log_level"])
 
-        # Run the main program
-        crony.core.run(**parsed_args)
+        if parsed_args.get("serve"):
+            # asyncio is slow to import, so only do so for the daemon.
+            from crony import serve
+
+            serve.serve(**parsed_args)
+            return
+
+        if parsed_args.get("index_command") == "build":
+            from crony import index
+
+            index.build(**parsed_args)
+            return
+
+        # Run the main program, profiling it if asked to
+        if not parsed_args["profile"]:
+            crony.core.run(**parsed_args)
+            return
+
+        from crony import profiling
+
+        profiler = profiling.Profiler(stats_path=parsed_args["profile_stats"])
+        profiler.record("args", parsed - started)
+        profiler.start()
+        try:
+            crony.core.run(profiler=profiler, **parsed_args)
+        finally:
+            profiler.stop()
+            profiler.write(json_path=parsed_args["profile_json"])
 
     except KeyboardInterrupt:  # pragma: no cover
         sys.exit(0)
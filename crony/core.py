@@ -1,36 +1,198 @@
 import sys
 import os
 import logging
-from datetime import datetime, timedelta
-import math
-from enum import Enum
-
-from crontab import CronTab
+import heapq
+import io
+import itertools
 
 import crony.analyser
+import crony.cache
+import crony.output
+import crony.schedule
+import crony.sources
 
 _logger = logging.getLogger(__name__)
 
-DEFAULT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+# What's output is up to crony.output, though these are how crony is told what to output.
+DEFAULT_DATE_FORMAT = crony.output.DEFAULT_DATE_FORMAT
+DetailLevel = crony.output.DetailLevel
+
+
+def _process_map(fn, *iterables, count=None):
+    """Map a function over iterables across a pool of processes sized to the core count
+
+    Args:
+        fn (callable): The function, which must be picklable
+        iterables (list): The iterables to map over, as for map()
+        count (int): The number of items, to size the pool with
+
+    Yields:
+        any: The results, in order, however they complete
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = min(count or 1, os.cpu_count() or 1)
+    _logger.debug(f"Mapping {fn.__name__} over {count} items with {workers} processes")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(fn, *iterables)
+
+
+def _parse_system_crontab(path, user):
+    """Parse one of a host's crontabs, in a worker process
+
+    Args:
+        path (str): The path of the crontab
+        user (str): The user the crontab belongs to, or None for a system crontab
+
+    Returns:
+        list: The crontab's jobs, as crony.cache.to_records() records
+    """
+    from crontab import CronTab
+
+    if user is None:
+        system = CronTab(user=False, tabfile=path)
+    else:
+        # Move the user's jobs into a system crontab, so that each is rendered as a system
+        # crontab line and so attributed to its user.
+        system = CronTab(user=False)
+        for job in CronTab(tabfile=path):
+            job.user = user
+            system.append(job)
+            job.cron = system
+
+    # The jobs of every crontab are reported on together, so each is rendered as its line alone,
+    # without the variables its crontab sets before it.
+    for job in system:
+        job.env.clear()
+    return crony.cache.to_records(system)
+
+
+def _parse_file(path):
+    """Parse a crontab file
+
+    Args:
+        path (str): The path of the crontab
+
+    Returns:
+        list: The crontab's jobs, as crony.cache.to_records() records
+    """
+    from crontab import CronTab
+
+    return crony.cache.to_records(CronTab(tabfile=path))
+
+
+def _parse_tab(content):
+    """Parse a crontab's content
+
+    Args:
+        content (bytes): The crontab content
+
+    Returns:
+        list: The crontab's jobs, as crony.cache.to_records() records
+    """
+    from crontab import CronTab
+
+    return crony.cache.to_records(CronTab(tab=content.decode()))
 
 
-class DetailLevel(Enum):
-    NONE = 0
-    COUNT = 1
-    FULL = 2
+def _parse_system(root, resident=None):
+    """Parse every crontab cron would run on a host into a single list of jobs
 
+    Args:
+        root (str): The root of the file system to discover crontabs under
+        resident (crony.cache.Resident): Parsed crontabs kept in memory, if any
+
+    Returns:
+        tuple: A tuple of (human readable crontab source, list of crony.cache.CachedJob)
+    """
+    crontabs = crony.sources.discover(root)
+    paths = [path for path, _ in crontabs]
+    users = [user for _, user in crontabs]
+
+    if resident:
+        # Only the crontabs which have changed are parsed, so there's little to spread out.
+        jobs = [
+            job
+            for path, user in crontabs
+            for job in resident.file(
+                path, lambda path, user=user: _parse_system_crontab(path, user)
+            )
+        ]
+        return (f"system:{root}", jobs)
 
-def _parse_crontab(file=None, user=None, tab=None, **kwargs):
+    if len(crontabs) > 1:
+        records = _process_map(_parse_system_crontab, paths, users, count=len(crontabs))
+    else:
+        records = map(_parse_system_crontab, paths, users)
+
+    jobs = [job for r in records for job in crony.cache.from_records(r)]
+    return (f"system:{root}", jobs)
+
+
+def parse_crontab(
+    file=None,
+    user=None,
+    tab=None,
+    cache=False,
+    system=None,
+    resident=None,
+    index=None,
+    **kwargs,
+):
     """Parse crontab-related args
 
     Args:
         file (str): A file name containing a crontab
         user (str): A user name to fetch a crontab for
         tab (str): A string containing the crontab
+        cache (bool): Use the on-disk cache of parsed crontabs, for files and stdin
+        system (str): The root of a file system to report on every crontab under, together
+        resident (crony.cache.Resident): Parsed crontabs kept in memory, for files, stdin and
+            whole systems
+        index (str): The path of an index of a crontab's occurrences to answer from instead
 
     Returns:
-        tuple: A tuple of (human readable crontab source, crontab.CronTab)
+        tuple: A tuple of (human readable crontab source, crontab.CronTab), where the
+        crontab is instead a list of crony.cache.CachedJob when restored from the cache,
+        kept in memory, or when reporting on a whole system, and a crony.index.Index when
+        answering from an index
     """
+    if index:
+        # Indexes are only loaded to answer from them.
+        from crony.index import Index
+
+        index = Index(index)
+        return (index.source, index)
+
+    if system:
+        return _parse_system(system, resident)
+
+    if resident and file:
+        return (f"file:{file}", resident.file(file, _parse_file))
+    if resident and tab:
+        return ("-", resident.tab(tab.encode(), _parse_tab))
+
+    if cache and (file or tab):
+        if file:
+            source = f"file:{file}"
+            with open(file, "rb") as f:
+                content = f.read()
+        else:
+            source, content = ("-", tab.encode())
+
+        # A hit skips parsing entirely.
+        jobs = crony.cache.load(content)
+        if jobs is not None:
+            return (source, jobs)
+
+        (source, crontab) = parse_crontab(file=file, tab=tab)
+        crony.cache.store(content, crontab)
+        return (source, crontab)
+
+    # python-crontab is slow to import, so only do so when there's a crontab to parse.
+    from crontab import CronTab
+
     if file:
         return (f"file:{file}", CronTab(tabfile=file))
     elif user:  # pragma: no cover
@@ -42,65 +204,397 @@ def _parse_crontab(file=None, user=None, tab=None, **kwargs):
         return ("user:current", CronTab(user=True))
 
 
-def _stringize_datetime(dt):
-    """Convert a datetime to the default format used
+def _report_jobs(renderer, jobs, profiler, detail_level=None, **kwargs):
+    """Report on each job occurring in the period of interest, grouped by job
 
     Args:
-        dt (datetime): A datetime object to format
+        renderer (crony.output.Renderer): The renderer to output with
+        jobs (iterable): The crony.analyser.JobOccurrences to report on
+        profiler (crony.profiling.NullProfiler): The profiler to record expansion with
+        detail_level (DetailLevel): The level of detail to report with
+    """
+    detail_level = detail_level.value
 
-    Returns:
-        str: The formatted datetime
+    for job in jobs:
+        stats = profiler.job(job)
+
+        # We choose to only render jobs with at least one occurrence
+        #   Do no more work than the detail level needs - without counts or occurrences to
+        # output, it's enough to find the first occurrence.
+        with profiler.expanding(stats):
+            if detail_level >= DetailLevel.COUNT.value:
+                count = stats.occurrences = job.count
+                occurs = bool(count)
+            else:
+                count = None
+                occurs = job.occurs
+
+        if not occurs:
+            continue
+
+        renderer.job(job, count)
+
+        # The occurrences are streamed, so each is rendered as it's expanded and nothing
+        # is held on to, however long the interval is.
+        if detail_level >= DetailLevel.FULL.value:
+            renderer.occurrences(job, profiler.stream(stats, job.occurrences.epochs()))
+
+
+def _report_timeline(renderer, jobs, profiler, **kwargs):
+    """Report every occurrence of every job in chronological order
+
+    Each job's occurrence stream is lazily merged with a heap, so only one pending occurrence
+    per job is held at any time, rather than every occurrence.
+
+    Args:
+        renderer (crony.output.Renderer): The renderer to output with
+        jobs (iterable): The crony.analyser.JobOccurrences to report on
+        profiler (crony.profiling.NullProfiler): The profiler to record expansion with
     """
-    return dt.strftime(DEFAULT_DATE_FORMAT)
+    jobs = list(jobs)
 
+    # Tag each occurrence with its job's index, which also breaks ties in crontab order.
+    streams = [
+        zip(
+            profiler.stream(profiler.job(job), job.occurrences.epochs()),
+            itertools.repeat(i),
+        )
+        for i, job in enumerate(jobs)
+    ]
 
-def _build_header(source=None, begin=None, end=None, **kwargs):
-    """Build the header
+    renderer.timeline(jobs, heapq.merge(*streams))
+
+
+def _report_histogram(
+    renderer, jobs, profiler, histogram=None, top=10, begin=None, end=None, **kwargs
+):
+    """Report the busiest buckets of the period of interest, by the number of jobs starting
 
     Args:
-        source (str): The crontab source specifier
+        renderer (crony.output.Renderer): The renderer to output with
+        jobs (iterable): The crony.analyser.JobOccurrences to report on
+        profiler (crony.profiling.NullProfiler): The profiler to record expansion with
+        histogram (crony.histogram.Bucket): The width of each bucket
+        top (int): The number of the busiest buckets to report
         begin (datetime): The begin datetime
         end (datetime): The end datetime
     """
-    # We don't care about documenting subsecond deltas..
-    delta = abs(end - begin)
-    delta_ignoring_subseconds = timedelta(seconds=math.ceil(delta.total_seconds()))
-    return f"For {source}: {_stringize_datetime(begin)} -> {_stringize_datetime(end)} ({str(delta_ignoring_subseconds)})"
+    from crony.histogram import build
 
+    busiest = build(
+        jobs,
+        begin,
+        end,
+        bucket=histogram,
+        top=top,
+        stream=lambda job, epochs: profiler.stream(profiler.job(job), epochs),
+    )
+    renderer.histogram(histogram, busiest)
 
-def run(stream=sys.stdout, **kwargs):
-    """Run the program based on kwargs
+
+def _report_overlaps(
+    renderer,
+    jobs,
+    profiler,
+    durations=None,
+    default_duration=None,
+    concurrency_limit=None,
+    **kwargs,
+):
+    """Report the jobs whose runs overlap, and how many run at once
 
     Args:
+        renderer (crony.output.Renderer): The renderer to output with
+        jobs (iterable): The crony.analyser.JobOccurrences to report on
+        profiler (crony.profiling.NullProfiler): The profiler to record expansion with
+        durations (str): The path to a file of job durations by command
+        default_duration (int): The duration of jobs without one, in seconds
+        concurrency_limit (int): The concurrency limit, if any
+    """
+    from crony import overlaps
+
+    report = overlaps.find(
+        jobs,
+        durations=overlaps.load_durations(durations) if durations else None,
+        default_duration=default_duration,
+        limit=concurrency_limit,
+        stream=lambda job, epochs: profiler.stream(profiler.job(job), epochs),
+    )
+    renderer.overlaps(report)
+
+
+def _report_quiet(
+    renderer,
+    jobs,
+    profiler,
+    top=10,
+    min_quiet=None,
+    quiet_jobs=None,
+    begin=None,
+    end=None,
+    **kwargs,
+):
+    """Report the longest periods of interest without any job starting
+
+    Args:
+        renderer (crony.output.Renderer): The renderer to output with
+        jobs (iterable): The crony.analyser.JobOccurrences to report on
+        profiler (crony.profiling.NullProfiler): The profiler to record expansion with
+        top (int): The number of the longest quiet periods to report
+        min_quiet (int): The least a quiet period lasts for to be reported, in seconds
+        quiet_jobs (re.Pattern): Only count the starts of the jobs whose lines match this
+        begin (datetime): The begin datetime
+        end (datetime): The end datetime
+    """
+    from crony import quiet
+
+    gaps = quiet.find(
+        jobs,
+        begin,
+        end,
+        top=top,
+        min_length=min_quiet,
+        match=quiet_jobs,
+        stream=lambda job, epochs: profiler.stream(profiler.job(job), epochs),
+    )
+    renderer.quiet(gaps)
+
+
+def _run_source(stream, profiler, **kwargs):
+    """Report on a single crontab source
+
+    Args:
+        stream (file): The stream to output to
+        profiler (crony.profiling.NullProfiler): The profiler to record the run with
         kwargs (dict): Keyword args
     """
     # Parse args
-    (kwargs["source"], kwargs["crontab"]) = _parse_crontab(**kwargs)
+    with profiler.phase("parse"):
+        (kwargs["source"], kwargs["crontab"]) = parse_crontab(**kwargs)
+
+    _report_source(stream, profiler, **kwargs)
+
+
+def _report_source(stream, profiler, **kwargs):
+    """Report on a single parsed crontab source
 
-    # Here's a helper for printing
-    _print = lambda *args, **kwargs: print(*args, file=stream, **kwargs)
+    Args:
+        stream (file): The stream to output to
+        profiler (crony.profiling.NullProfiler): The profiler to record the run with
+        kwargs (dict): Keyword args, including the source and the parsed crontab
+    """
+    with profiler.phase("report"):
+        crontab = kwargs["crontab"]
+
+        if kwargs.get("at"):
+            # The jobs running at the times are looked up, rather than expanded.
+            from crony.lookup import Lookup
+
+            if kwargs.get("index"):
+                crontab = crontab.jobs
+            lookup = Lookup(**{**kwargs, "crontab": crontab})
+            jobs = lookup.get_job_occurrences(**kwargs)
+            at = kwargs["at"]
+            _report(
+                stream, jobs, profiler, **{**kwargs, "begin": min(at), "end": max(at)}
+            )
+            return
+
+        if kwargs.get("next") or kwargs.get("previous"):
+            # The runs are searched for from begin, or back from end, rather than expanded over
+            # a period.
+            if kwargs.get("index"):
+                crontab = crontab.jobs
+            _report_runs(stream, profiler, **{**kwargs, "crontab": crontab})
+            return
+
+        if not kwargs.get("windows"):
+            # Find jobs occurring in the provided datetime range
+            if kwargs.get("index"):
+                jobs = crontab.get_job_occurrences(**kwargs)
+            else:
+                jobs = crony.analyser.get_job_occurrences(**kwargs)
+            _report(stream, jobs, profiler, **kwargs)
+            return
+
+        # Each window is reported on as if on its own, but the crontab's schedules are
+        # expanded across all of them at once.
+        if kwargs.get("index"):
+            windowed = [
+                crontab.get_job_occurrences(**{**kwargs, "begin": begin, "end": end})
+                for begin, end in kwargs["windows"]
+            ]
+        else:
+            windowed = crony.analyser.get_window_occurrences(**kwargs)
+        for (begin, end), jobs in zip(kwargs["windows"], windowed):
+            _report(stream, jobs, profiler, **{**kwargs, "begin": begin, "end": end})
+
+
+def _report_runs(stream, profiler, next=None, previous=None, **kwargs):
+    """Report on the next or previous runs of each job, or across every job with --timeline
 
-    # Print the header if not excluded
+    Args:
+        stream (file): The stream to output to
+        profiler (crony.profiling.NullProfiler): The profiler to record the run with
+        next (int): The number of runs to find from begin
+        previous (int): The number of runs to find back from end
+        kwargs (dict): Keyword args, including the source and the parsed crontab
+    """
+    search = {
+        **kwargs,
+        "count": next or previous,
+        "across_jobs": bool(kwargs.get("timeline")),
+    }
+    if next:
+        jobs = crony.analyser.get_next_occurrences(**search)
+    else:
+        jobs = crony.analyser.get_previous_occurrences(**search)
+
+    # The header covers the runs found, from begin or up to end.
+    epochs = [epoch for job in jobs for epoch in job.occurrences.epochs()]
+    if next:
+        begin = kwargs["begin"]
+        end = crony.schedule.from_epoch(max(epochs)) if epochs else begin
+    else:
+        end = kwargs["end"]
+        begin = crony.schedule.from_epoch(min(epochs)) if epochs else end
+    _report(stream, jobs, profiler, **{**kwargs, "begin": begin, "end": end})
+
+
+def _report(stream, jobs, profiler, **kwargs):
+    """Report on the jobs occurring in a period of interest
+
+    Args:
+        stream (file): The stream to output to
+        jobs (iterable): The crony.analyser.JobOccurrences to report on
+        profiler (crony.profiling.NullProfiler): The profiler to record the run with
+        kwargs (dict): Keyword args, including the source and the period
+    """
+    renderer = crony.output.get_renderer(stream=stream, **kwargs)
+
+    # Render the header if not excluded
     if not kwargs["exclude_header"]:
-        _print(_build_header(**kwargs))
-        _print()
+        renderer.header(**kwargs)
 
-    # Get the detail level
-    detail_level = kwargs["detail_level"].value
+    if kwargs.get("quiet"):
+        _report_quiet(renderer, jobs, profiler, **kwargs)
+    elif kwargs.get("overlaps"):
+        _report_overlaps(renderer, jobs, profiler, **kwargs)
+    elif kwargs.get("histogram"):
+        _report_histogram(renderer, jobs, profiler, **kwargs)
+    elif kwargs.get("timeline"):
+        _report_timeline(renderer, jobs, profiler, **kwargs)
+    else:
+        _report_jobs(renderer, jobs, profiler, **kwargs)
 
-    # Find jobs occurring in the provided datetime range
-    for job in crony.analyser.get_job_occurrences(**kwargs):
-        # We choose to only render jobs with at least one occurrence
-        if not len(list(job.occurrences)):
-            continue
+    renderer.close()
 
-        # Print the command / whole line based on provided options
-        _print(job.command if kwargs["only_command"] else job.line)
 
-        # Also supply any other configured detail:
-        if detail_level >= DetailLevel.COUNT.value:
-            _print(f"\tOccurrences: {len(job.occurrences)}")
+def _render_file(file, encoding, kwargs):
+    """Report on a crontab file into memory, in a worker process
 
-        if detail_level >= DetailLevel.FULL.value:
-            for occurrence in job.occurrences:
-                _print("\t\t" + _stringize_datetime(occurrence))
+    Args:
+        file (str): The path of the crontab
+        encoding (str): The encoding of the stream the report will be written to
+        kwargs (dict): Keyword args
+
+    Returns:
+        bytes: The encoded report
+    """
+    from crony import profiling
+
+    buffer = io.BytesIO()
+    stream = io.TextIOWrapper(buffer, encoding=encoding, newline="")
+    _run_source(stream, profiling.NullProfiler(), **{**kwargs, "file": file})
+    stream.flush()
+    return buffer.getvalue()
+
+
+def _run_files(stream, files, profiler, **kwargs):
+    """Report on many crontab files, in the order given
+
+    Each file is parsed and analysed in parallel across a pool of processes, with the reports
+    written out in order as they complete. When profiling, they're run in this process instead,
+    so that the profile covers all of the work - as they are when the parsed crontabs are kept
+    in this process's memory.
+
+    Each report is held in memory until it's written out, which is fine for reports with a line
+    or so per job - but reports of every occurrence are streamed, one file at a time, so that
+    memory use doesn't grow with the length of the period.
+
+    Args:
+        stream (file): The stream to output to
+        files (list): The paths of the crontabs
+        profiler (crony.profiling.NullProfiler): The profiler to record the run with
+        kwargs (dict): Keyword args
+    """
+    from crony import profiling
+
+    streamed = kwargs.get("timeline") or kwargs.get("detail_level") == DetailLevel.FULL
+    if (
+        not isinstance(profiler, profiling.Profiler)
+        and not kwargs.get("resident")
+        and not streamed
+    ):
+        encoding = getattr(stream, "encoding", None) or "utf-8"
+        reports = _process_map(
+            _render_file,
+            files,
+            itertools.repeat(encoding),
+            # The files are already spread across the cores, so each is expanded in the one
+            # process.
+            itertools.repeat({**kwargs, "pool": None}),
+            count=len(files),
+        )
+        for report in reports:
+            # Write the encoded report straight through to the underlying binary stream,
+            # where there is one.
+            if hasattr(stream, "buffer"):
+                stream.flush()
+                stream.buffer.write(report)
+            else:
+                stream.write(report.decode(encoding))
+        return
+
+    for file in files:
+        _run_source(stream, profiler, **{**kwargs, "file": file})
+
+
+def run(stream=sys.stdout, profiler=None, files=None, parallel=True, **kwargs):
+    """Run the program based on kwargs
+
+    Args:
+        stream (file): The stream to output to
+        profiler (crony.profiling.Profiler): A profiler to record the run with, if wanted
+        files (list): Paths, globs or directories of crontab files to report on, in turn
+        parallel (bool): Expand long periods in parallel across a pool of processes
+        kwargs (dict): Keyword args
+    """
+    from crony import profiling
+
+    profiler = profiler or profiling.NullProfiler()
+
+    if kwargs.get("watch") and not files:
+        raise ValueError("--watch can only watch a crontab file, passed with --file")
+
+    # The processes are only started if a long period is expanded, and are shut down once the
+    # run is done, rather than left for the interpreter to clean up at exit.
+    with crony.analyser.Pool() as pool:
+        kwargs["pool"] = pool if parallel else None
+
+        if files:
+            files = crony.sources.expand(files)
+            if kwargs.get("watch"):
+                if len(files) > 1:
+                    raise ValueError("--watch can only watch a single crontab file")
+                # Watching needs more of the standard library, so only load it to watch.
+                from crony import watch
+
+                watch.watch(stream, profiler, files[0], _report_source, **kwargs)
+                return
+            if len(files) > 1:
+                _run_files(stream, files, profiler, **kwargs)
+                return
+            kwargs["file"] = files[0]
+
+        _run_source(stream, profiler, **kwargs)
@@ -0,0 +1,192 @@
+import heapq
+import itertools
+import logging
+from array import array
+from enum import Enum
+
+import crony.analyser
+import crony.optional
+from crony.schedule import from_epoch, to_epoch
+
+_logger = logging.getLogger(__name__)
+
+# The number of occurrences accumulated at a time.
+_CHUNK = 65536
+
+
+class Bucket(Enum):
+    """The width of a histogram bucket, in seconds"""
+
+    MINUTE = 60
+    HOUR = 3600
+    DAY = 86400
+
+
+class Histogram:
+    """The number of job starts in each bucket of a period of interest.
+
+    Occurrences are accumulated into the counts as they're streamed, a chunk at a time, and
+    never held on to - with NumPy, each chunk is bucketed in one go.
+    """
+
+    def __init__(self, begin, end, bucket=Bucket.HOUR, use_numpy=True):
+        """Initialiser
+
+        Args:
+            begin (datetime): The begin datetime
+            end (datetime): The end datetime (inclusive)
+            bucket (Bucket): The width of each bucket
+            use_numpy (bool): Use NumPy, where it's installed
+        """
+        self.bucket = bucket
+        self.width = bucket.value
+        # Buckets are aligned to whole minutes, hours or days.
+        self.start = to_epoch(begin) // self.width * self.width
+        size = max(to_epoch(end) - self.start, 0) // self.width + 1
+
+        self._numpy = crony.optional.numpy() if use_numpy else None
+        if self._numpy:
+            self.counts = self._numpy.zeros(size, dtype=self._numpy.int64)
+        else:
+            self.counts = array("q", bytes(8 * size))
+
+    def add(self, epochs, weight=1):
+        """Accumulate occurrences into the counts
+
+        Args:
+            epochs (iterable): The occurrences as seconds since the epoch, all within the period
+            weight (int): The number of jobs with these occurrences
+        """
+        epochs = iter(epochs)
+        np = self._numpy
+
+        while True:
+            chunk = array("q", itertools.islice(epochs, _CHUNK))
+            if not chunk:
+                break
+
+            if np:
+                indices = (
+                    np.frombuffer(chunk, dtype=np.int64) - self.start
+                ) // self.width
+                # Occurrences are in order, so only count across the buckets they span.
+                first = indices[0]
+                counts = np.bincount(indices - first)
+                self.counts[first : first + len(counts)] += counts * weight
+            else:
+                counts, start, width = self.counts, self.start, self.width
+                for epoch in chunk:
+                    counts[(epoch - start) // width] += weight
+
+    def bucket_range(self, i):
+        """Get the range a bucket covers
+
+        Args:
+            i (int): The bucket's index
+
+        Returns:
+            tuple: A tuple of (the bucket's start, its end - exclusive), as seconds since the epoch
+        """
+        start = self.start + i * self.width
+        return (start, start + self.width)
+
+    def top(self, n):
+        """Get the busiest buckets
+
+        Args:
+            n (int): The number of buckets to get
+
+        Returns:
+            list: Tuples of (bucket index, count) for the busiest non-empty buckets, busiest first,
+            and earliest first where they're as busy
+        """
+        if n <= 0:
+            return []
+
+        if self._numpy:
+            counts = self.counts
+            # Only the candidates need sorting, rather than every bucket.
+            if n < len(counts):
+                candidates = self._numpy.argpartition(-counts, n - 1)[:n]
+                threshold = counts[candidates].min()
+                candidates = self._numpy.flatnonzero(counts >= threshold)
+            else:
+                candidates = range(len(counts))
+            buckets = ((int(i), int(counts[i])) for i in candidates)
+        else:
+            buckets = enumerate(self.counts)
+
+        return [
+            (i, count)
+            for i, count in heapq.nsmallest(
+                n, buckets, key=lambda bucket: (-bucket[1], bucket[0])
+            )
+            if count
+        ]
+
+
+def _contributors(groups, histogram, i):
+    """Count the starts of each job in a bucket
+
+    These are counted afresh over the bucket alone, rather than remembered for every bucket, and
+    only once for each group of jobs sharing a schedule.
+
+    Args:
+        groups (list): The crony.analyser.JobOccurrences, grouped by schedule
+        histogram (Histogram): The histogram
+        i (int): The bucket's index
+
+    Returns:
+        list: Tuples of (job, count) for the jobs which start in the bucket, the most first
+    """
+    start, end = histogram.bucket_range(i)
+    # Occurrences are counted after begin, up to and including end.
+    begin, end = from_epoch(start - 1), from_epoch(end - 1)
+
+    contributors = []
+    for jobs in groups:
+        count = len(jobs[0].occurrences.between(begin, end))
+        if count:
+            contributors.extend((job, count) for job in jobs)
+
+    # Jobs starting as many times are kept in the order their schedules first appear in.
+    return sorted(contributors, key=lambda contributor: -contributor[1])
+
+
+def build(jobs, begin, end, bucket=Bucket.HOUR, top=10, stream=None):
+    """Build a histogram of job starts, and find the busiest buckets and their contributors
+
+    Jobs sharing a schedule are only expanded and accumulated once, weighted by their number.
+
+    Args:
+        jobs (iterable): The crony.analyser.JobOccurrences
+        begin (datetime): The begin datetime
+        end (datetime): The end datetime (inclusive)
+        bucket (Bucket): The width of each bucket
+        top (int): The number of the busiest buckets to find
+        stream (callable): Wraps a job's occurrence stream, e.g. to profile it
+
+    Returns:
+        list: Tuples of (bucket start as seconds since the epoch, starts in the bucket, list of
+        tuples of (crony.analyser.JobOccurrences, starts in the bucket)) for the busiest buckets
+    """
+    stream = stream or (lambda job, epochs: epochs)
+
+    groups = crony.analyser.group_by_schedule(jobs)
+    histogram = Histogram(begin, end, bucket)
+    for group in groups:
+        histogram.add(stream(group[0], group[0].occurrences.stream()), len(group))
+
+    busiest = histogram.top(top)
+    _logger.debug(
+        f"Found the {len(busiest)} busiest of {len(histogram.counts)} buckets"
+    )
+
+    return [
+        (
+            histogram.bucket_range(i)[0],
+            count,
+            _contributors(groups, histogram, i),
+        )
+        for i, count in busiest
+    ]
@@ -0,0 +1,289 @@
+"""Indexes of a crontab's occurrences over a horizon, built once and memory-mapped by queries."""
+
+import bisect
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import timedelta
+
+import crony.analyser
+import crony.cache
+import crony.core
+import crony.manifest
+import crony.output
+from crony.schedule import from_epoch, to_epoch
+
+_logger = logging.getLogger(__name__)
+
+_MAGIC = b"CRONYIDX"
+
+# Bump whenever the layout changes, so that old indexes are rejected rather than misread.
+_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("=8sIIqqQQ")
+
+# The horizon indexed when only its begin is given.
+DEFAULT_HORIZON = timedelta(days=366)
+
+
+def _stat_key(path):
+    """Get what changes in a crontab file's stat when it's changed
+
+    Args:
+        path (str): The path of the crontab
+
+    Returns:
+        list: The key
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def build(
+    output=None,
+    begin=None,
+    end=None,
+    file=None,
+    user=None,
+    tab=None,
+    stream=sys.stdout,
+    **kwargs,
+):
+    """Build an index of a crontab's occurrences over a horizon
+
+    Every job is indexed, enabled or not, so that queries may still include the disabled ones.
+
+    Args:
+        output (str): The path to write the index to
+        begin (datetime): The datetime the horizon begins at (inclusive)
+        end (datetime): The datetime the horizon ends at (inclusive)
+        file (str): A file name containing a crontab
+        user (str): A user name to fetch a crontab for
+        tab (str): A string containing the crontab
+        stream (file): The stream to summarise the index to
+
+    Returns:
+        Index: The index built
+    """
+    source, crontab = crony.core.parse_crontab(file=file, user=user, tab=tab)
+    records = crony.cache.to_records(crontab)
+    jobs = crony.cache.from_records(records)
+
+    # Each distinct schedule's occurrences are stored once, and shared by its jobs.
+    occurrences = array("q")
+    offsets = array("q", [0] * (2 * len(jobs)))
+    indices = {id(job): i for i, job in enumerate(jobs)}
+    analysed = crony.analyser.get_job_occurrences(
+        jobs, begin, end, include_disabled=True
+    )
+    for group in crony.analyser.group_by_schedule(analysed):
+        start = len(occurrences)
+        occurrences.extend(group[0].occurrences.stream())
+        for job in group:
+            i = indices[id(job.job)]
+            offsets[2 * i : 2 * i + 2] = array("q", [start, len(occurrences)])
+
+    metadata = marshal.dumps(
+        (
+            crony.manifest.version,
+            source,
+            os.path.abspath(file) if file else None,
+            _stat_key(file) if file else None,
+            records,
+        )
+    )
+    metadata += b"\0" * (-len(metadata) % 8)
+
+    header = _HEADER.pack(
+        _MAGIC,
+        _FORMAT_VERSION,
+        len(jobs),
+        to_epoch(crony.analyser.exclusive_begin(begin)),
+        to_epoch(end),
+        len(metadata),
+        len(occurrences),
+    )
+
+    # Write then move into place, so that queries never map a partial index.
+    temp_path = f"{output}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        f.write(metadata)
+        offsets.tofile(f)
+        occurrences.tofile(f)
+    os.replace(temp_path, output)
+
+    index = Index(output)
+    stream.write(
+        f"Indexed {len(jobs)} jobs with {len(occurrences)} occurrences for {source}: "
+        f"{crony.output.stringize_datetime(begin)} -> {crony.output.stringize_datetime(end)}, "
+        f"into {output}\n"
+    )
+    return index
+
+
+class Index:
+    """An index of a crontab's occurrences over a horizon, memory-mapped from a file."""
+
+    def __init__(self, path):
+        """Initialiser
+
+        Args:
+            path (str): The path of the index, built by build()
+
+        Raises:
+            ValueError: If the file isn't an index, or was built by another version of crony
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{path} isn't a crony index")
+        magic, version, count, begin, end, length, occurrences = _HEADER.unpack_from(
+            self._map
+        )
+        if magic != _MAGIC:
+            raise ValueError(f"{path} isn't a crony index")
+        offset = _HEADER.size + length
+        if version == _FORMAT_VERSION:
+            crony_version, self.source, crontab_path, stat_key, records = marshal.loads(
+                self._map[_HEADER.size : offset]
+            )
+        # Schedules may be compiled differently by other versions of crony.
+        if version != _FORMAT_VERSION or crony_version != crony.manifest.version:
+            raise ValueError(
+                f"{path} was built by another version of crony, build it again"
+            )
+
+        self.begin = begin
+        self.end = end
+        self.jobs = crony.cache.from_records(records)
+
+        view = memoryview(self._map)
+        self._offsets = view[offset : offset + 16 * count].cast("q")
+        offset += 16 * count
+        self._occurrences = view[offset : offset + 8 * occurrences].cast("q")
+
+        # Checking the stat rather than the content keeps opening an index cheap.
+        if crontab_path and os.path.exists(crontab_path):
+            if _stat_key(crontab_path) != stat_key:
+                _logger.warning(
+                    f"{crontab_path} has changed since {path} was built, build it again"
+                )
+
+    def covers(self, begin, end):
+        """Check whether a period is within the index's horizon
+
+        Args:
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Returns:
+            bool: Whether the index holds every occurrence in the period
+        """
+        return self.begin <= to_epoch(begin) and to_epoch(end) <= self.end
+
+    def _range(self, i, begin, end):
+        """Find where a job's occurrences in a period are
+
+        Args:
+            i (int): The job's index
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Returns:
+            tuple: A tuple of (where they start, where they end (exclusive))
+        """
+        start, stop = (self._offsets[2 * i], self._offsets[2 * i + 1])
+        start = bisect.bisect_right(self._occurrences, to_epoch(begin), start, stop)
+        stop = bisect.bisect_right(self._occurrences, to_epoch(end), start, stop)
+        return (start, stop)
+
+    def count(self, i, begin, end):
+        """Count a job's occurrences in a period within the horizon
+
+        Args:
+            i (int): The job's index
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Returns:
+            int: The number of occurrences
+        """
+        start, stop = self._range(i, begin, end)
+        return stop - start
+
+    def epochs(self, i, begin, end):
+        """Get a job's occurrences in a period within the horizon
+
+        Args:
+            i (int): The job's index
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Returns:
+            memoryview: The occurrences as seconds since the epoch, mapped from the index
+        """
+        start, stop = self._range(i, begin, end)
+        return self._occurrences[start:stop]
+
+    def get_job_occurrences(
+        self,
+        begin=None,
+        end=None,
+        include_disabled=True,
+        engine=crony.analyser.Engine.NATIVE,
+        **kwargs,
+    ):
+        """Find the indexed jobs scheduled within the given time range
+
+        A period beyond the horizon is expanded as crony.analyser.get_job_occurrences() does.
+
+        Args:
+            begin (datetime): The datetime to start analysing at (inclusive)
+            end (datetime): The datetime to end analysing at (inclusive)
+            include_disabled (bool): Also analyse enabled jobs?
+            engine (crony.analyser.Engine): The engine to expand schedules with, beyond the horizon
+
+        Returns:
+            iterable: The crony.analyser.JobOccurrences, as crony.analyser.get_job_occurrences()
+        """
+        if not self.covers(crony.analyser.exclusive_begin(begin), end):
+            _logger.info(
+                f"The period is beyond the horizon of {self.path}, so expanding it instead: "
+                f"{crony.output.stringize_datetime(from_epoch(self.begin + 1))} -> "
+                f"{crony.output.stringize_datetime(from_epoch(self.end))}"
+            )
+            return crony.analyser.get_job_occurrences(
+                **{
+                    **kwargs,
+                    "crontab": self.jobs,
+                    "begin": begin,
+                    "end": end,
+                    "include_disabled": include_disabled,
+                    "engine": engine,
+                }
+            )
+        return self._get_job_occurrences(begin, end, include_disabled, engine)
+
+    def _get_job_occurrences(self, begin, end, include_disabled, engine):
+        begin = crony.analyser.exclusive_begin(begin)
+
+        expansions = {}
+        for i, job in enumerate(self.jobs):
+            if not (job.is_enabled() or include_disabled):
+                continue
+
+            # Jobs sharing a schedule share its occurrences, and so its expansion.
+            offsets = (self._offsets[2 * i], self._offsets[2 * i + 1])
+            expansion = expansions.get(offsets)
+            if expansion is None:
+                expansion = expansions[offsets] = crony.analyser.SlicedExpansion(
+                    job.compiled, self._occurrences, *self._range(i, begin, end)
+                )
+            yield crony.analyser.JobOccurrences(job, begin, end, engine, expansion)
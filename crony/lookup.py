@@ -0,0 +1,266 @@
+"""Finding the jobs which run at given times, from an inverted index of their schedules' fields."""
+
+import logging
+from array import array
+from collections import defaultdict
+from datetime import timedelta
+
+import crony.analyser
+import crony.optional
+from crony.schedule import can_run_within, from_epoch, to_epoch, window_masks
+
+_logger = logging.getLogger(__name__)
+
+# The values each field can take, as indices into its bitsets.
+_FIELD_SIZES = (60, 24, 32, 13, 7)
+
+
+def _bitset(positions, size):
+    """Pack job positions into a bitset
+
+    Args:
+        positions (iterable): The positions of the jobs
+        size (int): The number of jobs
+
+    Returns:
+        int: The bitset, with bit i set for the job at position i
+    """
+    packed = bytearray((size + 7) // 8)
+    for i in positions:
+        packed[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(packed, "little")
+
+
+def _runs_at(job, masks, minute):
+    """Check whether a job which isn't indexed runs at a minute, with croniter
+
+    Args:
+        job (crontab.CronItem): The job
+        masks (tuple): The values the job's fields can take, from crony.schedule.expression_masks(),
+            or None if they aren't known
+        minute (datetime): The minute
+
+    Returns:
+        bool: Whether the job runs at the minute
+    """
+    begin = minute - timedelta(seconds=1)
+    # Plain fields rule out most minutes without croniter, though they may allow more than the
+    # schedule does, so croniter has the final say.
+    if masks and not can_run_within(masks, window_masks(begin, minute)):
+        return False
+    try:
+        return crony.analyser.occurs(job, None, begin, minute)
+    except ValueError:
+        # croniter gives up on schedules which never run, e.g. on the 31st of February.
+        return False
+
+
+def _positions(bits):
+    """Unpack a bitset into job positions
+
+    Args:
+        bits (int): The bitset
+
+    Returns:
+        list: The positions of the jobs, in order
+    """
+    positions = []
+    while bits:
+        lowest = bits & -bits
+        positions.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return positions
+
+
+class Lookup:
+    """An inverted index of a crontab's schedules, for finding the jobs which run at given times."""
+
+    def __init__(
+        self,
+        crontab=None,
+        include_disabled=True,
+        engine=crony.analyser.Engine.NATIVE,
+        use_numpy=True,
+        **kwargs,
+    ):
+        """Initialiser
+
+        Args:
+            crontab (crontab.CronTab): A parsed crontab
+            include_disabled (bool): Also look up enabled jobs?
+            engine (crony.analyser.Engine): The engine to check schedules which aren't indexed with
+            use_numpy (bool): Use NumPy for batches of times, where it's installed
+        """
+        self.engine = engine
+        self.jobs = list(crony.analyser.analysed_jobs(crontab, include_disabled))
+        self.schedules = [
+            crony.analyser.compile_schedule(job, engine) for job in self.jobs
+        ]
+
+        # Schedules the native engine can't represent, or which are to be expanded with croniter,
+        # are checked one by one instead - at the minutes their fields allow, where they're plain.
+        self._unindexed = [
+            (i, crony.analyser.field_masks(self.jobs[i]))
+            for i, s in enumerate(self.schedules)
+            if not s
+        ]
+
+        # Jobs which share a field's values share the work of setting their bits.
+        size = len(self.jobs)
+        self._bitsets = []
+        masks = [s.to_masks() for s in self.schedules if s]
+        indexed = [i for i, s in enumerate(self.schedules) if s]
+        for field, field_size in enumerate(_FIELD_SIZES):
+            by_mask = defaultdict(list)
+            for i, job_masks in zip(indexed, masks):
+                by_mask[job_masks[field]].append(i)
+            bitsets = [0] * field_size
+            for mask, positions in by_mask.items():
+                bits = _bitset(positions, size)
+                for value in range(field_size):
+                    if mask >> value & 1:
+                        bitsets[value] |= bits
+            self._bitsets.append(bitsets)
+        self._day_or = _bitset(
+            (i for i, job_masks in zip(indexed, masks) if job_masks[5]), size
+        )
+        _logger.debug(
+            f"Indexed {len(indexed)} jobs' fields, leaving {len(self._unindexed)} to check "
+            f"one by one"
+        )
+
+        self._numpy = crony.optional.numpy() if use_numpy else None
+        self._tables = None
+
+    def _numpy_tables(self):
+        """Get the bitsets as NumPy arrays of packed words, converting them the first time
+
+        Returns:
+            tuple: For each field, an array with a row of words for each value, then the day_or
+            bitset as a row of words
+        """
+        if self._tables is None:
+            np = self._numpy
+            length = 8 * ((len(self.jobs) + 63) // 64)
+
+            def words(bits):
+                return np.frombuffer(bits.to_bytes(length, "little"), dtype=np.uint64)
+
+            self._tables = (
+                *(np.stack([words(b) for b in bitsets]) for bitsets in self._bitsets),
+                words(self._day_or),
+            )
+        return self._tables
+
+    def _at_each(self, epochs):
+        """Find the jobs running at each of many minutes, a minute at a time
+
+        Args:
+            epochs (list): The minutes, as seconds since the epoch
+
+        Returns:
+            list: For each minute, the positions of the jobs running at it, in order
+        """
+        minutes, hours, days, months, weekdays = self._bitsets
+        matches = []
+        for epoch in epochs:
+            dt = from_epoch(epoch)
+            day, weekday = (days[dt.day], weekdays[(dt.weekday() + 1) % 7])
+            bits = minutes[dt.minute] & hours[dt.hour] & months[dt.month]
+            # Cron matches either day field when neither is '*', otherwise both.
+            bits &= (day & weekday) | (self._day_or & (day | weekday))
+            matches.append(_positions(bits))
+        return matches
+
+    def _at_once(self, epochs):
+        """Find the jobs running at each of many minutes, all at once with NumPy
+
+        Args:
+            epochs (list): The minutes, as seconds since the epoch
+
+        Returns:
+            list: For each minute, the positions of the jobs running at it, in order
+        """
+        np = self._numpy
+        minutes, hours, days, months, weekdays, day_or = self._numpy_tables()
+
+        epochs = np.asarray(epochs, dtype=np.int64)
+        dates = (epochs // 86400).astype("datetime64[D]")
+        month_starts = dates.astype("datetime64[M]")
+        # 1970-01-01 was a Thursday, which is 4 with Sunday as 0.
+        weekday = (epochs // 86400 + 4) % 7
+        day = (dates - month_starts.astype("datetime64[D]")).astype(np.int64) + 1
+        month = month_starts.astype(np.int64) % 12 + 1
+
+        rows = minutes[epochs // 60 % 60] & hours[epochs // 3600 % 24] & months[month]
+        day_rows, weekday_rows = (days[day], weekdays[weekday])
+        rows &= (day_rows & weekday_rows) | (day_or & (day_rows | weekday_rows))
+
+        bits = np.unpackbits(rows.view(np.uint8), axis=1, bitorder="little")
+        matches = [[] for _ in range(len(epochs))]
+        for t, i in zip(*np.nonzero(bits[:, : len(self.jobs)])):
+            matches[t].append(int(i))
+        return matches
+
+    def at(self, epochs):
+        """Find the jobs running at each of many minutes
+
+        Args:
+            epochs (list): The minutes, as seconds since the epoch
+
+        Returns:
+            list: For each minute, the positions in jobs of the jobs running at it, in order
+        """
+        if self._numpy and len(epochs) > 1:
+            matches = self._at_once(epochs)
+        else:
+            matches = self._at_each(epochs)
+
+        for i, masks in self._unindexed:
+            job = self.jobs[i]
+            for epoch, positions in zip(epochs, matches):
+                if _runs_at(job, masks, from_epoch(epoch)):
+                    positions.append(i)
+                    positions.sort()
+        return matches
+
+    def get_job_occurrences(self, at=None, **kwargs):
+        """Find the jobs running at any of the given times
+
+        Args:
+            at (list): The datetimes to look up, each of which stands for its minute
+
+        Returns:
+            list: The crony.analyser.JobOccurrences of the jobs running at any of the times, in
+            crontab order, whose occurrences are the times each runs at
+        """
+        epochs = sorted({to_epoch(dt) // 60 * 60 for dt in at or []})
+        if not epochs:
+            return []
+
+        occurrences = defaultdict(lambda: array("q"))
+        for epoch, positions in zip(epochs, self.at(epochs)):
+            for i in positions:
+                occurrences[i].append(epoch)
+        _logger.debug(
+            f"Found {len(occurrences)} jobs running at {len(epochs)} times, "
+            f"{sum(map(len, occurrences.values()))} runs in all"
+        )
+
+        begin = crony.analyser.exclusive_begin(from_epoch(epochs[0]))
+        end = from_epoch(epochs[-1])
+        return [
+            crony.analyser.JobOccurrences(
+                self.jobs[i],
+                begin,
+                end,
+                self.engine,
+                crony.analyser.SlicedExpansion(
+                    self.schedules[i],
+                    memoryview(occurrences[i]),
+                    0,
+                    len(occurrences[i]),
+                ),
+            )
+            for i in sorted(occurrences)
+        ]
@@ -0,0 +1,13 @@
+def numpy():
+    """Get NumPy, if it's installed
+
+    It's only imported when asked for, so that crony starts quickly whether or not it's needed.
+
+    Returns:
+        module: numpy, or None
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
@@ -0,0 +1,593 @@
+"""Renderers for crony's reports, which write through a buffer in bulk."""
+
+import sys
+import abc
+import csv
+import io
+import itertools
+import json
+import logging
+import math
+import struct
+from array import array
+from datetime import timedelta
+from enum import Enum
+
+from crony.schedule import from_epoch, to_epoch
+
+_logger = logging.getLogger(__name__)
+
+# The number of rows held before they're written out in one go.
+_BUFFERED_ROWS = 65536
+
+_BINARY_MAGIC = b"CRONY"
+_BINARY_VERSION = 2
+
+# The report each binary stream holds, by the option which selects it, in the order they're
+# chosen between.
+_BINARY_REPORTS = {"quiet": 4, "overlaps": 3, "histogram": 2, "timeline": 1}
+
+# The job index which ends a binary timeline.
+_BINARY_END_OF_TIMELINE = 0xFFFFFFFF
+
+DEFAULT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class DetailLevel(Enum):
+    NONE = 0
+    COUNT = 1
+    FULL = 2
+
+
+class Format(Enum):
+    TEXT = "text"
+    JSONL = "jsonl"
+    CSV = "csv"
+    BINARY = "binary"
+
+
+def stringize_datetime(dt):
+    """Convert a datetime to the default format used
+
+    Args:
+        dt (datetime|int): A datetime object, or seconds since the epoch, to format
+
+    Returns:
+        str: The formatted datetime
+    """
+    # Occurrences are passed around as seconds since the epoch, and only become datetimes here.
+    if isinstance(dt, int):
+        dt = from_epoch(dt)
+    return dt.strftime(DEFAULT_DATE_FORMAT)
+
+
+def _build_header(source=None, begin=None, end=None, **kwargs):
+    """Build the header
+
+    Args:
+        source (str): The crontab source specifier
+        begin (datetime): The begin datetime
+        end (datetime): The end datetime
+    """
+    # We don't care about documenting subsecond deltas..
+    delta = abs(end - begin)
+    delta_ignoring_subseconds = timedelta(seconds=math.ceil(delta.total_seconds()))
+    return f"For {source}: {stringize_datetime(begin)} -> {stringize_datetime(end)} ({str(delta_ignoring_subseconds)})"
+
+
+class EpochFormatter:
+    """Formats seconds since the epoch in DEFAULT_DATE_FORMAT, cheaply.
+
+    Occurrences arrive in order, so the date part is only formatted once per day, and the
+    time of day is formatted arithmetically, rather than creating a datetime for each.
+    """
+
+    __slots__ = ("_day", "_prefix")
+
+    def __init__(self):
+        self._day = None
+        self._prefix = None
+
+    def __call__(self, seconds):
+        day, time = divmod(seconds, 86400)
+        if day != self._day:
+            self._day = day
+            self._prefix = from_epoch(day * 86400).strftime("%Y-%m-%d ")
+
+        hours, time = divmod(time, 3600)
+        minutes, seconds = divmod(time, 60)
+        return f"{self._prefix}{hours:02}:{minutes:02}:{seconds:02}"
+
+
+class Renderer(abc.ABC):
+    """The base renderer, which buffers rows of text and writes them in bulk."""
+
+    def __init__(self, stream, only_command=False, **kwargs):
+        """Initialiser
+
+        Args:
+            stream (file): The stream to write to
+            only_command (bool): Label jobs with only their command, rather than their full line
+        """
+        self.stream = stream
+        self.only_command = only_command
+        self.format_epoch = EpochFormatter()
+        self._rows = []
+
+    def label(self, job):
+        """Get a job's label
+
+        Args:
+            job (crony.analyser.JobOccurrences): The job
+
+        Returns:
+            str: The label
+        """
+        return job.command if self.only_command else job.line
+
+    def write(self, row):
+        """Buffer a row, writing the buffer when it's full
+
+        Args:
+            row (str): The row, without a trailing newline
+        """
+        self._rows.append(row)
+        if len(self._rows) >= _BUFFERED_ROWS:
+            self.flush()
+
+    def flush(self):
+        """Write out the buffer"""
+        if self._rows:
+            self._rows.append("")
+            self.stream.write("\n".join(self._rows))
+            self._rows = []
+
+    def header(self, source=None, begin=None, end=None, **kwargs):
+        """Render the header
+
+        Args:
+            source (str): The crontab source specifier
+            begin (datetime): The begin datetime
+            end (datetime): The end datetime
+        """
+
+    @abc.abstractmethod
+    def job(self, job, count=None):
+        """Render a job which occurs in the period of interest
+
+        Args:
+            job (crony.analyser.JobOccurrences): The job
+            count (int): The number of occurrences, if they've been counted
+        """
+
+    @abc.abstractmethod
+    def occurrences(self, job, occurrences):
+        """Render a job's occurrences, after the job itself
+
+        Args:
+            job (crony.analyser.JobOccurrences): The job
+            occurrences (iterable): The occurrences, as seconds since the epoch
+        """
+
+    @abc.abstractmethod
+    def timeline(self, jobs, occurrences):
+        """Render every job's occurrences in chronological order
+
+        Args:
+            jobs (list): The crony.analyser.JobOccurrences
+            occurrences (iterable): Tuples of (occurrence, index of the job in jobs)
+        """
+
+    @abc.abstractmethod
+    def histogram(self, bucket, busiest):
+        """Render the busiest buckets of a histogram of job starts
+
+        Args:
+            bucket (crony.histogram.Bucket): The width of each bucket
+            busiest (list): Tuples of (bucket start, starts, list of tuples of (job, starts)), as
+                from crony.histogram.build()
+        """
+
+    @abc.abstractmethod
+    def overlaps(self, report):
+        """Render the overlaps between jobs' runs
+
+        Args:
+            report (crony.overlaps.Report): The overlaps
+        """
+
+    @abc.abstractmethod
+    def quiet(self, gaps):
+        """Render the longest periods without any job starting
+
+        Args:
+            gaps (list): Tuples of (from, to), as from crony.quiet.find()
+        """
+
+    def close(self):
+        """Finish rendering, writing out anything buffered"""
+        self.flush()
+
+
+class TextRenderer(Renderer):
+    """Renders the human readable text crony has always output."""
+
+    def header(self, **kwargs):
+        self.write(_build_header(**kwargs))
+        self.write("")
+
+    def job(self, job, count=None):
+        self.write(self.label(job))
+        if count is not None:
+            self.write(f"\tOccurrences: {count}")
+
+    def occurrences(self, job, occurrences):
+        for occurrence in occurrences:
+            self.write("\t\t" + self.format_epoch(occurrence))
+
+    def timeline(self, jobs, occurrences):
+        labels = [self.label(job) for job in jobs]
+        for occurrence, i in occurrences:
+            self.write(f"{self.format_epoch(occurrence)}\t{labels[i]}")
+
+    def histogram(self, bucket, busiest):
+        self.write(f"Busiest {bucket.name.lower()}s:")
+        for start, starts, jobs in busiest:
+            self.write(f"{self.format_epoch(start)}\t{starts}")
+            for job, job_starts in jobs:
+                self.write(f"\t{job_starts}\t{self.label(job)}")
+
+    def overlaps(self, report):
+        at = (
+            f", first at {self.format_epoch(report.max_concurrency_at)}"
+            if report.max_concurrency_at is not None
+            else ""
+        )
+        self.write(f"Maximum concurrency: {report.max_concurrency}{at}")
+
+        self.write("Overlapping jobs:")
+        for job, other, count, first in report.pairs:
+            self.write(f"\t{count} overlaps, first at {self.format_epoch(first)}")
+            if job is other:
+                self.write(f"\t\t{self.label(job)} (with itself)")
+            else:
+                self.write(f"\t\t{self.label(job)}")
+                self.write(f"\t\t{self.label(other)}")
+
+        if report.limit is not None:
+            self.write(f"Over the concurrency limit of {report.limit}:")
+            for from_, to, peak in report.over_limit:
+                self.write(
+                    f"\t{self.format_epoch(from_)} -> {self.format_epoch(to)} ({peak} at most)"
+                )
+
+    def quiet(self, gaps):
+        self.write("Longest quiet periods:")
+        for from_, to in gaps:
+            self.write(
+                f"\t{self.format_epoch(from_)} -> {self.format_epoch(to)} ({timedelta(seconds=to - from_)})"
+            )
+
+
+class JsonLinesRenderer(Renderer):
+    """Renders a JSON object per line: the header, each job, and each occurrence."""
+
+    def header(self, source=None, begin=None, end=None, **kwargs):
+        self.write(
+            json.dumps(
+                {
+                    "source": source,
+                    "begin": stringize_datetime(begin),
+                    "end": stringize_datetime(end),
+                }
+            )
+        )
+
+    def job(self, job, count=None):
+        record = {"job": self.label(job)}
+        if count is not None:
+            record["occurrences"] = count
+        self.write(json.dumps(record))
+
+    def occurrences(self, job, occurrences):
+        # The job's part of each row is the same, so only encode it once.
+        prefix = '{"job": ' + json.dumps(self.label(job)) + ', "time": "'
+        for occurrence in occurrences:
+            self.write(f'{prefix}{self.format_epoch(occurrence)}"}}')
+
+    def timeline(self, jobs, occurrences):
+        labels = [json.dumps(self.label(job)) for job in jobs]
+        for occurrence, i in occurrences:
+            self.write(
+                f'{{"time": "{self.format_epoch(occurrence)}", "job": {labels[i]}}}'
+            )
+
+    def histogram(self, bucket, busiest):
+        for start, starts, jobs in busiest:
+            self.write(
+                json.dumps(
+                    {
+                        "bucket": self.format_epoch(start),
+                        "starts": starts,
+                        "jobs": [
+                            {"job": self.label(job), "starts": job_starts}
+                            for job, job_starts in jobs
+                        ],
+                    }
+                )
+            )
+
+    def overlaps(self, report):
+        at = report.max_concurrency_at
+        self.write(
+            json.dumps(
+                {
+                    "max_concurrency": report.max_concurrency,
+                    "at": None if at is None else self.format_epoch(at),
+                }
+            )
+        )
+        for job, other, count, first in report.pairs:
+            self.write(
+                json.dumps(
+                    {
+                        "jobs": [self.label(job), self.label(other)],
+                        "overlaps": count,
+                        "first": self.format_epoch(first),
+                    }
+                )
+            )
+        for from_, to, peak in report.over_limit:
+            self.write(
+                json.dumps(
+                    {
+                        "from": self.format_epoch(from_),
+                        "to": self.format_epoch(to),
+                        "max_concurrency": peak,
+                    }
+                )
+            )
+
+    def quiet(self, gaps):
+        for from_, to in gaps:
+            self.write(
+                json.dumps(
+                    {
+                        "from": self.format_epoch(from_),
+                        "to": self.format_epoch(to),
+                        "seconds": to - from_,
+                    }
+                )
+            )
+
+
+class CsvRenderer(Renderer):
+    """Renders CSV, with a row per job, or per occurrence when they're output.
+
+    The header is a row of column names, as there's nowhere to put crony's usual header.
+    """
+
+    def __init__(
+        self,
+        stream,
+        detail_level=None,
+        timeline=False,
+        histogram=None,
+        overlaps=False,
+        quiet=False,
+        **kwargs,
+    ):
+        super().__init__(stream, **kwargs)
+        if quiet:
+            self._columns = ["from", "to", "seconds"]
+        elif overlaps:
+            self._columns = ["job", "other_job", "overlaps", "first"]
+        elif histogram:
+            self._columns = ["bucket", "starts", "job", "job_starts"]
+        elif timeline:
+            self._columns = ["time", "job"]
+        elif detail_level == DetailLevel.FULL:
+            self._columns = ["job", "time"]
+        elif detail_level == DetailLevel.COUNT:
+            self._columns = ["job", "occurrences"]
+        else:
+            self._columns = ["job"]
+
+    def _row(self, *values):
+        buffer = io.StringIO()
+        # The writer only quotes fields with line breaks in them when it ends rows with one, so
+        # the row is written with its line ending, and then stripped of it.
+        csv.writer(buffer).writerow(values)
+        return buffer.getvalue()[: -len("\r\n")]
+
+    def header(self, **kwargs):
+        self.write(",".join(self._columns))
+
+    def job(self, job, count=None):
+        # At full detail there's a row per occurrence instead.
+        if "time" in self._columns:
+            return
+        self.write(self._row(self.label(job), *([] if count is None else [count])))
+
+    def occurrences(self, job, occurrences):
+        label = self._row(self.label(job))
+        for occurrence in occurrences:
+            self.write(f"{label},{self.format_epoch(occurrence)}")
+
+    def timeline(self, jobs, occurrences):
+        labels = [self._row(self.label(job)) for job in jobs]
+        for occurrence, i in occurrences:
+            self.write(f"{self.format_epoch(occurrence)},{labels[i]}")
+
+    def histogram(self, bucket, busiest):
+        for start, starts, jobs in busiest:
+            for job, job_starts in jobs:
+                self.write(
+                    self._row(
+                        self.format_epoch(start), starts, self.label(job), job_starts
+                    )
+                )
+
+    def overlaps(self, report):
+        # Only the pairs fit the columns - the concurrency is left to the other formats.
+        for job, other, count, first in report.pairs:
+            self.write(
+                self._row(
+                    self.label(job), self.label(other), count, self.format_epoch(first)
+                )
+            )
+
+    def quiet(self, gaps):
+        for from_, to in gaps:
+            self.write(
+                self._row(self.format_epoch(from_), self.format_epoch(to), to - from_)
+            )
+
+
+class BinaryRenderer(Renderer):
+    """Renders the packed binary format described in the README."""
+
+    # The bytes held before they're written out in one go.
+    _BUFFERED_BYTES = 1024 * 1024
+
+    def __init__(
+        self,
+        stream,
+        detail_level=DetailLevel.NONE,
+        source=None,
+        begin=None,
+        end=None,
+        **kwargs,
+    ):
+        """Initialiser
+
+        Args:
+            stream (file): The stream to write to
+            detail_level (DetailLevel): The level of detail reported with
+            source (str): The crontab source specifier
+            begin (datetime): The begin datetime
+            end (datetime): The end datetime
+        """
+        # Write bytes to the underlying binary stream, where the stream is a text one.
+        super().__init__(getattr(stream, "buffer", stream), **kwargs)
+        self._text_stream = stream
+        self._buffer = bytearray(_BINARY_MAGIC + bytes([_BINARY_VERSION]))
+
+        # Every stream starts with what it's a report of, so it can be read without knowing
+        # the options it was run with, and reports following one another can be told apart.
+        self._report = next(
+            (
+                report
+                for option, report in _BINARY_REPORTS.items()
+                if kwargs.get(option)
+            ),
+            0,
+        )
+        source = (source or "").encode()
+        self._pack(
+            f"<BBI{len(source)}sqq",
+            self._report,
+            detail_level.value,
+            len(source),
+            source,
+            -1 if begin is None else to_epoch(begin),
+            -1 if end is None else to_epoch(end),
+        )
+
+    def _pack(self, fmt, *values):
+        self._buffer += struct.pack(fmt, *values)
+        if len(self._buffer) >= self._BUFFERED_BYTES:
+            self.flush()
+
+    def _pack_label(self, job):
+        label = self.label(job).encode()
+        self._pack(f"<I{len(label)}s", len(label), label)
+
+    def flush(self):
+        if self._buffer:
+            # Anything written as text before now must come first.
+            if self._text_stream is not self.stream:
+                self._text_stream.flush()
+            self.stream.write(self._buffer)
+            self._buffer = bytearray()
+
+    def job(self, job, count=None):
+        self._pack("<B", 1)
+        self._pack_label(job)
+        self._pack("<q", -1 if count is None else count)
+
+    def occurrences(self, job, occurrences):
+        # Pack the occurrences a chunk at a time, rather than one by one.
+        iterator = iter(occurrences)
+        while True:
+            chunk = array("q", itertools.islice(iterator, _BUFFERED_ROWS))
+            if not chunk:
+                break
+            if sys.byteorder != "little":  # pragma: no cover
+                chunk.byteswap()
+            self._buffer += chunk.tobytes()
+            if len(self._buffer) >= self._BUFFERED_BYTES:
+                self.flush()
+
+    def timeline(self, jobs, occurrences):
+        self._pack("<I", len(jobs))
+        for job in jobs:
+            self._pack_label(job)
+        for occurrence, i in occurrences:
+            self._pack("<qI", occurrence, i)
+        self._pack("<qI", -1, _BINARY_END_OF_TIMELINE)
+
+    def histogram(self, bucket, busiest):
+        self._pack("<I", len(busiest))
+        for start, starts, jobs in busiest:
+            self._pack("<qqI", start, starts, len(jobs))
+            for job, job_starts in jobs:
+                self._pack_label(job)
+                self._pack("<q", job_starts)
+
+    def overlaps(self, report):
+        at = report.max_concurrency_at
+        self._pack(
+            "<qqI", report.max_concurrency, -1 if at is None else at, len(report.pairs)
+        )
+        for job, other, count, first in report.pairs:
+            self._pack_label(job)
+            self._pack_label(other)
+            self._pack("<qq", count, first)
+        self._pack("<I", len(report.over_limit))
+        for from_, to, peak in report.over_limit:
+            self._pack("<qqq", from_, to, peak)
+
+    def quiet(self, gaps):
+        self._pack("<I", len(gaps))
+        for from_, to in gaps:
+            self._pack("<qq", from_, to)
+
+    def close(self):
+        # The jobs grouped by job end with a job flag of 0.
+        if not self._report:
+            self._pack("<B", 0)
+        self.flush()
+        self.stream.flush()
+
+
+_RENDERERS = {
+    Format.TEXT: TextRenderer,
+    Format.JSONL: JsonLinesRenderer,
+    Format.CSV: CsvRenderer,
+    Format.BINARY: BinaryRenderer,
+}
+
+
+def get_renderer(stream=sys.stdout, format=Format.TEXT, **kwargs):
+    """Get a renderer for an output format
+
+    Args:
+        stream (file): The stream to write to
+        format (Format): The output format
+        kwargs (dict): The run's keyword args
+
+    Returns:
+        Renderer: The renderer
+    """
+    return _RENDERERS[format](stream, **kwargs)
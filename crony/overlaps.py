@@ -0,0 +1,208 @@
+import heapq
+import itertools
+import logging
+import re
+
+_logger = logging.getLogger(__name__)
+
+_DURATION_REGEX = re.compile(r"(\d+)([smhd])")
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# A duration hint in a job's trailing comment, e.g. '# duration=15m' or '# nightly, duration: 1h30m'
+_HINT_REGEX = re.compile(r"\bduration\s*[=:]\s*(\S+)")
+
+
+def parse_duration(s):
+    """Parse a duration, e.g. '90s', '15m', '1h30m' or '1d'
+
+    Args:
+        s (str): The duration
+
+    Raises:
+        ValueError: If the duration isn't valid
+
+    Returns:
+        int: The duration in seconds
+    """
+    s = s.strip().lower()
+    parts = _DURATION_REGEX.findall(s)
+    if not parts or "".join(n + unit for n, unit in parts) != s:
+        raise ValueError(f"'{s}' isn't a duration, e.g. 90s, 15m, 1h30m or 1d")
+    return sum(int(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def duration_hint(comment):
+    """Get the duration hinted at in a job's trailing comment
+
+    Args:
+        comment (str): The comment
+
+    Returns:
+        int: The duration in seconds, or None if there's no (valid) hint
+    """
+    match = _HINT_REGEX.search(comment or "")
+    if not match:
+        return None
+    try:
+        return parse_duration(match.group(1).rstrip(",;"))
+    except ValueError:
+        _logger.warning(f"Ignoring the invalid duration hint '{comment}'")
+        return None
+
+
+def load_durations(path):
+    """Load a side file of durations by command
+
+    Each line is a duration followed by a command, e.g. '15m /usr/local/bin/backup.sh'. Blank
+    lines and lines starting with '#' are ignored.
+
+    Args:
+        path (str): The path of the side file
+
+    Raises:
+        ValueError: If a duration isn't valid
+
+    Returns:
+        dict: The durations in seconds, by command
+    """
+    durations = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            duration, _, command = line.partition(" ")
+            durations[command.strip()] = parse_duration(duration)
+    return durations
+
+
+class Report:
+    """The overlaps between jobs' runs in a period of interest, and their concurrency."""
+
+    __slots__ = (
+        "limit",
+        "max_concurrency",
+        "max_concurrency_at",
+        "pairs",
+        "over_limit",
+    )
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        # The most runs at once, and when that was first reached.
+        self.max_concurrency = 0
+        self.max_concurrency_at = None
+        # Tuples of (job, other job, number of overlaps, first overlap), most overlapping first.
+        self.pairs = []
+        # Tuples of (from, to, the most runs at once) for each period over the concurrency limit.
+        self.over_limit = []
+
+
+def _duration(job, durations, default_duration):
+    """Get how long a job runs for
+
+    A hint in the job's comment wins over the side file, which wins over the default.
+
+    Args:
+        job (crony.analyser.JobOccurrences): The job
+        durations (dict): The durations in seconds, by command
+        default_duration (int): The duration of jobs without one, in seconds
+
+    Returns:
+        int: The duration in seconds, or None if it's unknown
+    """
+    duration = duration_hint(job.job.comment)
+    if duration is None:
+        duration = durations.get(job.command, default_duration)
+    return duration
+
+
+def find(jobs, durations=None, default_duration=None, limit=None, stream=None):
+    """Find the jobs whose runs overlap, and the periods over a concurrency limit
+
+    This sweeps through every job's occurrences in chronological order, merged lazily, keeping
+    the runs in progress in a heap ordered by when they end. That's O(n log n) in the number of
+    occurrences, plus the overlaps found, rather than comparing every pair of runs.
+
+    Args:
+        jobs (iterable): The crony.analyser.JobOccurrences
+        durations (dict): The durations in seconds, by command
+        default_duration (int): The duration of jobs without one, in seconds, or None to leave
+            them out
+        limit (int): The concurrency limit, if any
+        stream (callable): Wraps a job's occurrence stream, e.g. to profile it
+
+    Returns:
+        Report: The report
+    """
+    durations = durations or {}
+    stream = stream or (lambda job, epochs: epochs)
+
+    timed = []
+    for job in jobs:
+        duration = _duration(job, durations, default_duration)
+        if duration is None:
+            _logger.debug(f"Leaving out {job.command}, as its duration isn't known")
+            continue
+        timed.append((job, duration))
+
+    report = Report(limit)
+    # The runs in progress, as (end, job index), and the overlaps as [count, first] by job pair.
+    running = []
+    overlaps = {}
+    over_limit_since = None
+    peak = 0
+
+    def finish_before(time):
+        # Let go of the runs which have ended by a time, closing any period over the limit.
+        nonlocal over_limit_since
+        while running and running[0][0] <= time:
+            end, _ = heapq.heappop(running)
+            if over_limit_since is not None and len(running) <= limit:
+                report.over_limit.append((over_limit_since, end, peak))
+                over_limit_since = None
+
+    starts = heapq.merge(
+        *(
+            zip(stream(job, job.occurrences.epochs()), itertools.repeat(i))
+            for i, (job, _) in enumerate(timed)
+        )
+    )
+    for start, i in starts:
+        finish_before(start)
+
+        for _, j in running:
+            pair = (j, i) if j <= i else (i, j)
+            overlap = overlaps.get(pair)
+            if overlap:
+                overlap[0] += 1
+            else:
+                overlaps[pair] = [1, start]
+
+        heapq.heappush(running, (start + timed[i][1], i))
+
+        if len(running) > report.max_concurrency:
+            report.max_concurrency = len(running)
+            report.max_concurrency_at = start
+        if limit is not None and len(running) > limit:
+            if over_limit_since is None:
+                if report.over_limit and report.over_limit[-1][1] == start:
+                    # A run ending just as another starts doesn't end the period.
+                    over_limit_since, _, peak = report.over_limit.pop()
+                else:
+                    over_limit_since, peak = start, 0
+            peak = max(peak, len(running))
+
+    finish_before(float("inf"))
+
+    report.pairs = [
+        (timed[i][0], timed[j][0], count, first)
+        for (i, j), (count, first) in sorted(
+            overlaps.items(), key=lambda overlap: (-overlap[1][0], overlap[0])
+        )
+    ]
+    _logger.debug(
+        f"Found {len(report.pairs)} overlapping pairs among {len(timed)} jobs, "
+        f"with at most {report.max_concurrency} running at once"
+    )
+    return report
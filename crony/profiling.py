@@ -0,0 +1,218 @@
+import sys
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+_logger = logging.getLogger(__name__)
+
+# The phases of a run, in the order they happen.
+PHASES = ["args", "parse", "expand", "output"]
+
+
+class _JobStats:
+    """The time spent expanding a single job, and how many occurrences it had."""
+
+    __slots__ = ("job", "seconds", "occurrences")
+
+    def __init__(self, job):
+        self.job = job
+        self.seconds = 0.0
+        self.occurrences = None
+
+
+# Discards what's recorded against it, when profiling isn't enabled.
+_NULL_STATS = _JobStats(None)
+
+
+class NullProfiler:
+    """A profiler which records nothing, used when profiling isn't enabled."""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def record(self, phase, seconds):
+        pass
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def job(self, job):
+        return _NULL_STATS
+
+    @contextmanager
+    def expanding(self, stats):
+        yield
+
+    def stream(self, stats, occurrences):
+        return occurrences
+
+
+class Profiler(NullProfiler):
+    """Records the wall time of each phase of a run, the time spent expanding each job, and the
+    peak memory allocated.
+
+    Expanding and outputting occurrences are interleaved, as occurrences are streamed, so the
+    output phase is the time spent reporting on jobs less the time spent expanding them.
+    """
+
+    def __init__(self, stats_path=None):
+        """Initialiser
+
+        Args:
+            stats_path (str): A path to dump cProfile stats to, if wanted
+        """
+        self.stats_path = stats_path
+        self.phases = {}
+        self.jobs = []
+        self.peak_memory = None
+        self._cprofile = None
+
+    def start(self):
+        """Start tracing memory allocations, and cProfile if wanted"""
+        # tracemalloc is only needed, and so only imported, when profiling.
+        import tracemalloc
+
+        tracemalloc.start()
+        if self.stats_path:
+            import cProfile
+
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        """Stop tracing, recording the peak memory and dumping any cProfile stats"""
+        import tracemalloc
+
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.stats_path)
+        if tracemalloc.is_tracing():
+            _, self.peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    def record(self, phase, seconds):
+        """Record time spent in a phase
+
+        Args:
+            phase (str): The phase
+            seconds (float): The wall time spent
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """Time a phase
+
+        Args:
+            name (str): The phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def job(self, job):
+        """Start recording a job's expansion
+
+        Args:
+            job (crony.analyser.JobOccurrences): The job
+
+        Returns:
+            _JobStats: The job's stats, to pass to expanding() and stream()
+        """
+        stats = _JobStats(job)
+        self.jobs.append(stats)
+        return stats
+
+    @contextmanager
+    def expanding(self, stats):
+        """Time some expansion of a job, e.g. counting its occurrences
+
+        Args:
+            stats (_JobStats): The job's stats
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats.seconds += time.perf_counter() - start
+
+    def stream(self, stats, occurrences):
+        """Time the expansion of a job's occurrences as they're streamed
+
+        Only the time spent producing each occurrence is counted, not what's done with it.
+
+        Args:
+            stats (_JobStats): The job's stats
+            occurrences (iterable): The job's occurrences
+
+        Yields:
+            any: Each occurrence
+        """
+        iterator = iter(occurrences)
+        count = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                occurrence = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                stats.seconds += time.perf_counter() - start
+            count += 1
+            yield occurrence
+        stats.occurrences = count
+
+    def report(self):
+        """Build the report
+
+        Returns:
+            dict: The report, with the slowest jobs first
+        """
+        expand = sum(j.seconds for j in self.jobs)
+        phases = {**self.phases, "expand": expand}
+        # Reporting on jobs includes expanding them.
+        phases["output"] = max(phases.pop("report", 0.0) - expand, 0.0)
+
+        return {
+            "phases": {p: phases[p] for p in PHASES if p in phases},
+            "peak_memory_bytes": self.peak_memory,
+            "jobs": [
+                {"job": j.job.line, "seconds": j.seconds, "occurrences": j.occurrences}
+                for j in sorted(self.jobs, key=lambda j: j.seconds, reverse=True)
+            ],
+        }
+
+    def write(self, stream=sys.stderr, json_path=None, top=10):
+        """Write the report, as text or JSON
+
+        Args:
+            stream (file): The stream to write the text report to
+            json_path (str): A path to write the JSON report to, instead of the text report
+            top (int): The number of the slowest jobs to include in the text report
+        """
+        report = self.report()
+
+        if json_path:
+            with open(json_path, "w") as f:
+                json.dump(report, f, indent=2)
+            return
+
+        _print = lambda *args, **kwargs: print(*args, file=stream, **kwargs)
+        _print("Phases:")
+        for phase, seconds in report["phases"].items():
+            _print(f"\t{phase:8} {seconds * 1000:10.3f}ms")
+        if report["peak_memory_bytes"] is not None:
+            _print(f"Peak memory: {report['peak_memory_bytes'] / 1024:.1f}KB")
+        _print(
+            f"Slowest jobs ({min(top, len(report['jobs']))} of {len(report['jobs'])}):"
+        )
+        for job in report["jobs"][:top]:
+            occurrences = "-" if job["occurrences"] is None else job["occurrences"]
+            _print(f"\t{job['seconds'] * 1000:10.3f}ms {occurrences:>10} {job['job']}")
@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import logging
+from array import array
+
+import crony.analyser
+import crony.optional
+from crony.schedule import to_epoch
+
+_logger = logging.getLogger(__name__)
+
+# The number of occurrences marked at a time.
+_CHUNK = 65536
+
+
+class Bitmap:
+    """Which minutes of a period of interest have a job starting in them, packed a bit a minute.
+
+    A year is only around 66KB, so the whole period is held at once, and the quiet periods are
+    the runs of clear bits - with NumPy, they're found without looking at each minute in Python.
+    """
+
+    def __init__(self, begin, end, use_numpy=True):
+        """Initialiser
+
+        Args:
+            begin (datetime): The begin datetime
+            end (datetime): The end datetime (inclusive)
+            use_numpy (bool): Use NumPy, where it's installed
+        """
+        self.begin = to_epoch(begin)
+        self.end = to_epoch(end)
+        # Occurrences are counted from the start of begin's minute, as they are elsewhere.
+        self.start = self.begin // 60 * 60
+        self.size = max(self.end - self.start, -60) // 60 + 1
+        self.bits = bytearray((self.size + 7) // 8)
+
+        self._numpy = crony.optional.numpy() if use_numpy else None
+
+    def add(self, epochs):
+        """Mark the minutes occurrences start in
+
+        Args:
+            epochs (iterable): The occurrences as seconds since the epoch, all within the period
+        """
+        epochs = iter(epochs)
+        np = self._numpy
+        # A view of the same bytes, so that both ways mark the one bitmap.
+        bits = np.frombuffer(self.bits, dtype=np.uint8) if np else self.bits
+
+        while True:
+            chunk = array("q", itertools.islice(epochs, _CHUNK))
+            if not chunk:
+                break
+
+            if np:
+                minutes = (np.frombuffer(chunk, dtype=np.int64) - self.start) // 60
+                np.bitwise_or.at(
+                    bits, minutes >> 3, np.left_shift(1, minutes & 7).astype(np.uint8)
+                )
+            else:
+                start = self.start
+                for epoch in chunk:
+                    minute = (epoch - start) // 60
+                    bits[minute >> 3] |= 1 << (minute & 7)
+
+    def _runs(self):
+        """Find the runs of quiet minutes
+
+        Returns:
+            tuple: A tuple of (the minutes each run starts at, the minutes each ends at -
+            exclusive), as sequences of indices into the bitmap
+        """
+        np = self._numpy
+        if np:
+            busy = np.unpackbits(
+                np.frombuffer(self.bits, dtype=np.uint8), bitorder="little"
+            )[: self.size].astype(bool)
+            # Each run of quiet minutes starts and ends where busy changes, with the period
+            # bounded by busy minutes.
+            changes = np.flatnonzero(np.diff(np.concatenate(([True], busy, [True]))))
+            return (changes[0::2], changes[1::2])
+
+        starts, ends = (array("q"), array("q"))
+        quiet_from = 0
+        for i, byte in enumerate(self.bits):
+            if not byte:
+                continue
+            for bit in range(8):
+                if byte >> bit & 1:
+                    minute = 8 * i + bit
+                    if minute > quiet_from:
+                        starts.append(quiet_from)
+                        ends.append(minute)
+                    quiet_from = minute + 1
+        if self.size > quiet_from:
+            starts.append(quiet_from)
+            ends.append(self.size)
+        return (starts, ends)
+
+    def gaps(self, n, min_length=0):
+        """Get the longest quiet periods
+
+        A quiet period runs from the first minute without a job starting, or begin, up to the
+        next minute with one, or end.
+
+        Args:
+            n (int): The number of quiet periods to get
+            min_length (int): The least a quiet period lasts for to be got, in seconds
+
+        Returns:
+            list: Tuples of (from, to) as seconds since the epoch, for the longest quiet periods,
+            longest first, and earliest first where they're as long
+        """
+        if n <= 0:
+            return []
+
+        np = self._numpy
+        starts, ends = self._runs()
+        if np:
+            froms = np.maximum(self.start + starts * 60, self.begin)
+            tos = np.minimum(self.start + ends * 60, self.end)
+            # Only the long enough periods need sorting, rather than every one.
+            keep = np.flatnonzero(tos - froms >= max(min_length, 1))
+            froms, tos = (froms[keep], tos[keep])
+            order = np.lexsort((froms, froms - tos))[:n]
+            return [(int(froms[i]), int(tos[i])) for i in order]
+
+        gaps = (
+            (max(self.start + s * 60, self.begin), min(self.start + e * 60, self.end))
+            for s, e in zip(starts, ends)
+        )
+        return heapq.nsmallest(
+            n,
+            (gap for gap in gaps if gap[1] - gap[0] >= max(min_length, 1)),
+            key=lambda gap: (gap[0] - gap[1], gap[0]),
+        )
+
+
+def find(jobs, begin, end, top=10, min_length=None, match=None, stream=None):
+    """Find the longest periods without any job starting
+
+    Jobs sharing a schedule are only expanded and marked once.
+
+    Args:
+        jobs (iterable): The crony.analyser.JobOccurrences
+        begin (datetime): The begin datetime
+        end (datetime): The end datetime (inclusive)
+        top (int): The number of the longest quiet periods to find
+        min_length (int): The least a quiet period lasts for to be found, in seconds
+        match (re.Pattern): Only count the starts of the jobs whose lines match this, if given
+        stream (callable): Wraps a job's occurrence stream, e.g. to profile it
+
+    Returns:
+        list: Tuples of (from, to) as seconds since the epoch, for the longest quiet periods
+    """
+    stream = stream or (lambda job, epochs: epochs)
+    if match:
+        jobs = (job for job in jobs if match.search(job.line))
+
+    bitmap = Bitmap(begin, end)
+    groups = crony.analyser.group_by_schedule(jobs)
+    for group in groups:
+        bitmap.add(stream(group[0], group[0].occurrences.stream()))
+
+    gaps = bitmap.gaps(top, min_length or 0)
+    _logger.debug(
+        f"Found the {len(gaps)} longest quiet periods among {len(groups)} schedules' starts "
+        f"over {bitmap.size} minutes"
+    )
+    return gaps
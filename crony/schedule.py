@@ -0,0 +1,620 @@
+import bisect
+import calendar
+import datetime
+import functools
+import logging
+
+_logger = logging.getLogger(__name__)
+
+_ONE_DAY = datetime.timedelta(days=1)
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+
+# The inclusive range of values each of the five cron fields can take, in field order.
+_FIELD_RANGES = (
+    range(0, 60),  # minute
+    range(0, 24),  # hour
+    range(1, 32),  # day of the month
+    range(1, 13),  # month
+    range(0, 7),  # day of the week (Sunday is 0)
+)
+
+
+def to_epoch(dt):
+    """Convert a datetime to seconds since the epoch
+
+    crony works in naive, wall clock datetimes throughout, so these are treated as UTC, which
+    keeps the conversion exact and free of DST ambiguity.
+
+    Args:
+        dt (datetime): The datetime, whose subseconds are ignored
+
+    Returns:
+        int: The seconds since the epoch
+    """
+    return (
+        (dt.toordinal() - _EPOCH_ORDINAL) * 86400
+        + dt.hour * 3600
+        + dt.minute * 60
+        + dt.second
+    )
+
+
+def from_epoch(seconds):
+    """Convert seconds since the epoch back to a (naive) datetime, the inverse of to_epoch()
+
+    Args:
+        seconds (int): The seconds since the epoch
+
+    Returns:
+        datetime: The datetime
+    """
+    return _EPOCH + datetime.timedelta(seconds=seconds)
+
+
+def _expand_field(values, field_range):
+    """Convert a single croniter-expanded field into a set of integers
+
+    Args:
+        values (list): The croniter expansion of the field
+        field_range (range): The values the field can take
+
+    Returns:
+        tuple: A tuple of (the set of values, whether the field was '*'), or None if the
+        field uses a feature (e.g. 'L') which can't be expressed as a plain set
+    """
+    if values == ["*"]:
+        return (frozenset(field_range), True)
+
+    if not all(isinstance(v, int) for v in values):
+        return None
+
+    return (frozenset(v for v in values if v in field_range), False)
+
+
+def window_masks(begin, end):
+    """Get the values each field takes within a period, packed as Schedule.to_masks() packs them
+
+    A schedule can only run within the period if each of its fields can take one of these values,
+    which is cheap to check before anything is expanded (see Schedule.can_run_within()).
+
+    Args:
+        begin (datetime): The begin datetime (exclusive)
+        end (datetime): The end datetime (inclusive)
+
+    Returns:
+        tuple: A bitmask for each field in order
+    """
+    # The first and last minutes in the period.
+    first = begin.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+    last = end.replace(second=0, microsecond=0)
+    if last < first:
+        return (0,) * len(_FIELD_RANGES)
+
+    def mask(values):
+        return sum(1 << v for v in set(values))
+
+    full = tuple(mask(r) for r in _FIELD_RANGES)
+    minutes = int((last - first).total_seconds()) // 60
+
+    minute_mask = (
+        full[0]
+        if minutes >= 59
+        else mask((first.minute + i) % 60 for i in range(minutes + 1))
+    )
+    hours = last.hour - first.hour + 24 * (last.toordinal() - first.toordinal())
+    hour_mask = (
+        full[1]
+        if hours >= 23
+        else mask((first.hour + i) % 24 for i in range(hours + 1))
+    )
+
+    # A year covers every day of the month, month and day of the week.
+    days = last.toordinal() - first.toordinal()
+    if days >= 365:
+        return (minute_mask, hour_mask, *full[2:])
+    dates = [first.date() + datetime.timedelta(days=i) for i in range(days + 1)]
+    return (
+        minute_mask,
+        hour_mask,
+        mask(d.day for d in dates),
+        mask(d.month for d in dates),
+        # Python numbers Monday as 0, cron numbers Sunday as 0.
+        mask((d.weekday() + 1) % 7 for d in dates),
+    )
+
+
+def _field_mask(field, field_range):
+    """Pack the values a cron field can take into a bitmask, for the plainest of fields
+
+    Args:
+        field (str): The field, e.g. '*/15' or '1-5,7'
+        field_range (range): The values the field can take
+
+    Returns:
+        int: The bitmask, or None if the field isn't plain numbers, ranges, steps and lists
+    """
+    lo, hi = (field_range.start, field_range.stop - 1)
+    # Sunday may also be 7.
+    weekdays = field_range == _FIELD_RANGES[4]
+    if weekdays:
+        hi = 7
+
+    mask = 0
+    for part in field.split(","):
+        values, _, step = part.partition("/")
+        first, dash, last = values.partition("-")
+        if values == "*":
+            first, last = (lo, hi)
+        elif first.isdigit() and (last.isdigit() if dash else not step):
+            first, last = (int(first), int(last) if dash else int(first))
+        else:
+            return None
+        # croniter has its own take on a range of a single value, e.g. '5-5', and on steps from a
+        # value, e.g. '5/10' - leave those to it, as well as anything else out of the ordinary.
+        if dash and first == last or not lo <= first <= last <= hi:
+            return None
+        if step and not (step.isdigit() and int(step)):
+            return None
+        for value in range(first, last + 1, int(step or 1)):
+            mask |= 1 << (0 if weekdays and value == 7 else value)
+    return mask
+
+
+@functools.lru_cache(maxsize=4096)
+def expression_masks(expression):
+    """Pack the values each field of a cron expression can take, without compiling it
+
+    This is much cheaper than compiling the expression, and may allow more than the expression
+    does (it's for ruling out schedules which can't run with can_run_within()), but never less.
+
+    Args:
+        expression (str): A five field cron expression, e.g. '0 3 * 12 *'
+
+    Returns:
+        tuple: Packed as Schedule.to_masks() packs them, or None if the expression isn't plain
+        enough to pack
+    """
+    fields = expression.split()
+    if len(fields) != len(_FIELD_RANGES):
+        return None
+
+    masks = tuple(_field_mask(f, r) for f, r in zip(fields, _FIELD_RANGES))
+    if None in masks:
+        return None
+
+    # Cron matches either day field when neither is '*', otherwise both - matching either
+    # allows the most, so it's assumed wherever croniter might differ.
+    return (*masks, fields[2] != "*" and fields[4] != "*")
+
+
+def can_run_within(masks, window):
+    """Check whether each field of a schedule can take a value within a period
+
+    A schedule which can't will never run in the period, though one which can may still not.
+
+    Args:
+        masks (tuple): The schedule, packed as Schedule.to_masks() packs them
+        window (tuple): The values each field takes within the period, from window_masks()
+
+    Returns:
+        bool: Whether the schedule may run in the period
+    """
+    minutes, hours, days, months, weekdays, day_or = masks
+    window_minutes, window_hours, window_days, window_months, window_weekdays = window
+
+    if not (
+        minutes & window_minutes and hours & window_hours and months & window_months
+    ):
+        return False
+
+    # The day is matched by the day of the month or of the week, as cron combines them.
+    day = days & window_days
+    weekday = weekdays & window_weekdays
+    return bool(day or weekday) if day_or else bool(day and weekday)
+
+
+class Schedule:
+    """A cron schedule compiled into the set of values each of its fields can take.
+
+    Rather than stepping through a schedule one occurrence at a time, as croniter does,
+    occurrences are generated by walking the calendar - whole months which can't match are
+    skipped, and the matching hour x minute combinations are emitted for each matching day.
+    """
+
+    def __init__(self, minutes, hours, days, months, weekdays, day_or=False):
+        """Initialiser
+
+        Args:
+            minutes (iterable): The minutes (0 - 59) the schedule can run at
+            hours (iterable): The hours (0 - 23) the schedule can run at
+            days (iterable): The days of the month (1 - 31) the schedule can run at
+            months (iterable): The months (1 - 12) the schedule can run at
+            weekdays (iterable): The days of the week (0 - 6, Sunday is 0) the schedule can run at
+            day_or (bool): Whether a day matches when *either* the day of the month or day of the
+                week matches, rather than both. Cron does this when neither field is '*'.
+        """
+        self.minutes = tuple(sorted(minutes))
+        self.hours = tuple(sorted(hours))
+        self.days = frozenset(days)
+        self.months = frozenset(months)
+        self.weekdays = frozenset(weekdays)
+        self.day_or = day_or
+
+        self._times_per_day = len(self.hours) * len(self.minutes)
+        self._times = None
+        self._masks = None
+
+        # Which days match within a month only depends on the month's length and the weekday
+        # it starts on, so there are at most 4 x 7 distinct answers - cache them as we go.
+        self._month_days_cache = {}
+
+    def to_masks(self):
+        """Pack the schedule into plain integers, e.g. for serialisation
+
+        Returns:
+            tuple: A tuple of (a bitmask for each field in order, day_or)
+        """
+        if self._masks is None:
+            self._masks = (
+                *(
+                    sum(1 << v for v in values)
+                    for values in (
+                        self.minutes,
+                        self.hours,
+                        self.days,
+                        self.months,
+                        self.weekdays,
+                    )
+                ),
+                self.day_or,
+            )
+        return self._masks
+
+    def can_run_within(self, window):
+        """Check whether each field can take a value within a period, without expanding anything
+
+        Args:
+            window (tuple): The values each field takes within the period, from window_masks()
+
+        Returns:
+            bool: Whether the schedule may run in the period
+        """
+        return can_run_within(self.to_masks(), window)
+
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def from_masks(cls, masks):
+        """Unpack a schedule packed by to_masks(), where the same schedule is only unpacked once
+
+        Args:
+            masks (tuple): The packed schedule
+
+        Returns:
+            Schedule: The schedule
+        """
+        *masks, day_or = masks
+        return cls(
+            *([v for v in r if mask >> v & 1] for mask, r in zip(masks, _FIELD_RANGES)),
+            day_or=day_or,
+        )
+
+    @classmethod
+    @functools.lru_cache(maxsize=4096)
+    def compile(cls, expression):
+        """Compile a cron expression, where the same expression is only ever compiled once
+
+        Args:
+            expression (str): A five field cron expression, e.g. '*/5 * * * *'
+
+        Returns:
+            Schedule: The compiled schedule, or None if the expression uses a feature which
+            can't be compiled (e.g. 'L' or '#'), in which case croniter must be used instead.
+        """
+        # croniter is slow to import, so only do so when there's a schedule to compile.
+        from croniter import croniter
+
+        try:
+            expanded, nth_weekday_of_month = croniter.expand(expression)
+        except Exception:
+            _logger.debug(f"Unable to expand '{expression}', it can't be compiled")
+            return None
+
+        if nth_weekday_of_month or len(expanded) != len(_FIELD_RANGES):
+            return None
+
+        fields = [_expand_field(v, r) for v, r in zip(expanded, _FIELD_RANGES)]
+        if None in fields:
+            return None
+
+        (
+            (minutes, _),
+            (hours, _),
+            (days, days_star),
+            (months, _),
+            (weekdays, dow_star),
+        ) = fields
+        return cls(
+            minutes,
+            hours,
+            days,
+            months,
+            weekdays,
+            day_or=not (days_star or dow_star),
+        )
+
+    @property
+    def times(self):
+        """The offsets from midnight of every time of day the schedule runs at, in order
+
+        Returns:
+            tuple: The offsets, in seconds
+        """
+        if self._times is None:
+            self._times = tuple(
+                h * 3600 + m * 60 for h in self.hours for m in self.minutes
+            )
+        return self._times
+
+    def _times_up_to(self, dt):
+        """Count the times of day the schedule runs at, up to and including a datetime's
+
+        Args:
+            dt (datetime): The datetime
+
+        Returns:
+            int: The number of times of day
+        """
+        earlier_hours = bisect.bisect_left(self.hours, dt.hour)
+        count = earlier_hours * len(self.minutes)
+        if earlier_hours < len(self.hours) and self.hours[earlier_hours] == dt.hour:
+            count += bisect.bisect_right(self.minutes, dt.minute)
+        return count
+
+    def _month_days(self, year, month):
+        """Get the days in a month which the schedule matches
+
+        Args:
+            year (int): The year
+            month (int): The month
+
+        Returns:
+            tuple: The matching days of the month, in order
+        """
+        first_weekday, length = calendar.monthrange(year, month)
+        key = (first_weekday, length)
+        days = self._month_days_cache.get(key)
+
+        if days is None:
+            # calendar numbers Monday as 0, cron numbers Sunday as 0.
+            first_weekday = (first_weekday + 1) % 7
+            combine = (lambda a, b: a or b) if self.day_or else (lambda a, b: a and b)
+            days = tuple(
+                d
+                for d in range(1, length + 1)
+                if combine(d in self.days, (first_weekday + d - 1) % 7 in self.weekdays)
+            )
+            self._month_days_cache[key] = days
+
+        return days
+
+    def _iter_days(self, first, last):
+        """Yield each matching day between two dates
+
+        Args:
+            first (date): The first date to consider (inclusive)
+            last (date): The last date to consider (inclusive)
+
+        Yields:
+            date: The matching dates, in order
+        """
+        year, month = first.year, first.month
+
+        while (year, month) <= (last.year, last.month):
+            if month in self.months:
+                for day in self._month_days(year, month):
+                    d = datetime.date(year, month, day)
+                    if d < first:
+                        continue
+                    if d > last:
+                        return
+                    yield d
+
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    def _iter_days_reversed(self, first, last):
+        """Yield each matching day between two dates, latest first
+
+        Args:
+            first (date): The first date to consider (inclusive)
+            last (date): The last date to consider (inclusive)
+
+        Yields:
+            date: The matching dates, in reverse order
+        """
+        year, month = last.year, last.month
+
+        while (year, month) >= (first.year, first.month):
+            if month in self.months:
+                for day in reversed(self._month_days(year, month)):
+                    d = datetime.date(year, month, day)
+                    if d > last:
+                        continue
+                    if d < first:
+                        return
+                    yield d
+
+            year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+
+    def _day_count(self, first, last):
+        """Count the matching days between two dates, without enumerating them
+
+        Args:
+            first (date): The first date to consider (inclusive)
+            last (date): The last date to consider (inclusive)
+
+        Returns:
+            int: The number of matching days
+        """
+        count = 0
+        year, month = first.year, first.month
+
+        while (year, month) <= (last.year, last.month):
+            if month in self.months:
+                days = self._month_days(year, month)
+                # Only the first and last months can be partially covered.
+                lo = first.day if (year, month) == (first.year, first.month) else 1
+                hi = last.day if (year, month) == (last.year, last.month) else 31
+                count += bisect.bisect_right(days, hi) - bisect.bisect_left(days, lo)
+
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        return count
+
+    def _matches(self, day):
+        """Check whether the schedule runs on a given day
+
+        Args:
+            day (date): The day
+
+        Returns:
+            bool: Whether the schedule runs on the day
+        """
+        return day.month in self.months and day.day in self._month_days(
+            day.year, day.month
+        )
+
+    def count(self, begin, end):
+        """Count the occurrences after a begin datetime, up to an end datetime
+
+        Matching days are counted a month at a time and multiplied by the number of times of
+        day the schedule runs at, with only the partial first and last days treated specially.
+        No occurrences are enumerated.
+
+        Args:
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Returns:
+            int: The number of occurrences
+        """
+        if end <= begin:
+            return 0
+
+        first, last = begin.date(), end.date()
+        # The number of times of day after begin on the first day, and up to end on the last.
+        after_begin = self._times_per_day - self._times_up_to(begin)
+        up_to_end = self._times_up_to(end)
+
+        if first == last:
+            # The same day - the times between both are those after begin, less those after end.
+            return (
+                after_begin - (self._times_per_day - up_to_end)
+                if self._matches(first)
+                else 0
+            )
+
+        count = 0
+        if self._matches(first):
+            count += after_begin
+        if self._matches(last):
+            count += up_to_end
+        if last - first > _ONE_DAY:
+            count += (
+                self._day_count(first + _ONE_DAY, last - _ONE_DAY) * self._times_per_day
+            )
+        return count
+
+    def first(self, begin, end):
+        """Find the first occurrence after a begin datetime, up to an end datetime
+
+        Unlike epochs(), this doesn't need every time of day the schedule runs at.
+
+        Args:
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Returns:
+            int: The first occurrence as seconds since the epoch, or None if there isn't one
+        """
+        first = begin.date()
+
+        for day in self._iter_days(first, end.date()):
+            # The index of the first time of day after begin.
+            i = self._times_up_to(begin) if day == first else 0
+            if i < self._times_per_day:
+                hour, minute = divmod(i, len(self.minutes))
+                occurrence = (
+                    (day.toordinal() - _EPOCH_ORDINAL) * 86400
+                    + self.hours[hour] * 3600
+                    + self.minutes[minute] * 60
+                )
+                return occurrence if occurrence <= to_epoch(end) else None
+
+        return None
+
+    def epochs(self, begin, end):
+        """Yield each occurrence after a begin datetime, up to an end datetime
+
+        This mirrors croniter.get_next(): occurrences exactly at begin are excluded.
+
+        Args:
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Yields:
+            int: The occurrences as seconds since the epoch (see to_epoch()), in order
+        """
+        first = begin.date()
+        last_epoch = to_epoch(end)
+
+        for day in self._iter_days(first, end.date()):
+            midnight = (day.toordinal() - _EPOCH_ORDINAL) * 86400
+            # Skip straight past the times of day which fall on or before begin.
+            times = (
+                self.times[self._times_up_to(begin) :] if day == first else self.times
+            )
+            for time in times:
+                occurrence = midnight + time
+                if occurrence > last_epoch:
+                    return
+                yield occurrence
+
+    def reversed_epochs(self, begin, end):
+        """Yield each occurrence up to an end datetime, after a begin datetime, latest first
+
+        This mirrors stepping back from end with croniter.get_prev(), though occurrences exactly
+        at end are included, as they are by epochs().
+
+        Args:
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Yields:
+            int: The occurrences as seconds since the epoch (see to_epoch()), in reverse order
+        """
+        last = end.date()
+        first_epoch = to_epoch(begin)
+
+        for day in self._iter_days_reversed(begin.date(), last):
+            midnight = (day.toordinal() - _EPOCH_ORDINAL) * 86400
+            # Skip straight past the times of day which fall after end.
+            times = self.times[: self._times_up_to(end)] if day == last else self.times
+            for time in reversed(times):
+                occurrence = midnight + time
+                if occurrence <= first_epoch:
+                    return
+                yield occurrence
+
+    def between(self, begin, end):
+        """Yield each occurrence after a begin datetime, up to an end datetime
+
+        Args:
+            begin (datetime): The begin datetime (exclusive)
+            end (datetime): The end datetime (inclusive)
+
+        Yields:
+            datetime: The occurrences, in order
+        """
+        return map(from_epoch, self.epochs(begin, end))
@@ -0,0 +1,294 @@
+"""crony serve - a daemon answering queries with parsed crontabs kept in memory."""
+
+import asyncio
+import io
+import ipaddress
+import logging
+import os
+import stat
+import tempfile
+from urllib.parse import parse_qsl, urlsplit
+
+import crony.args
+import crony.cache
+import crony.core
+import crony.output
+
+_logger = logging.getLogger(__name__)
+
+# How long a client may take to send its request, in seconds.
+_READ_TIMEOUT = 30
+
+# The most a request's headers and body may hold, in bytes.
+_MAX_HEADERS = 64 * 1024
+_MAX_BODY = 16 * 1024 * 1024
+
+_CONTENT_TYPES = {
+    crony.output.Format.TEXT: "text/plain; charset=utf-8",
+    crony.output.Format.JSONL: "application/x-ndjson",
+    crony.output.Format.CSV: "text/csv; charset=utf-8",
+    crony.output.Format.BINARY: "application/octet-stream",
+}
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class _HttpError(Exception):
+    """An error to respond to a request with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def default_socket_path():
+    """Get the default path of the Unix domain socket to listen on
+
+    Returns:
+        str: The path
+    """
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, "crony.sock")
+
+
+def is_loopback(host):
+    """Check whether an address only accepts connections from this host
+
+    Args:
+        host (str): The address, or 'localhost'
+
+    Returns:
+        bool: Whether it's a loopback address
+    """
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def to_args(query):
+    """Convert a query string into crony's command line args
+
+    Args:
+        query (str): The query string, e.g. 'file=/etc/crontab&dd'
+
+    Returns:
+        list: The args, e.g. ['--file=/etc/crontab', '--dd']
+    """
+    return [
+        f"--{name}={value}" if value else f"--{name}"
+        for name, value in parse_qsl(query, keep_blank_values=True)
+    ]
+
+
+def answer(resident, query, tab=None):
+    """Answer a query, as crony would have from the command line
+
+    Args:
+        resident (crony.cache.Resident): The parsed crontabs kept in memory
+        query (str): The query string
+        tab (str): The crontab sent with the query, if any
+
+    Raises:
+        ValueError: If the query's args are invalid
+        FileNotFoundError: If a crontab the query refers to doesn't exist
+
+    Returns:
+        tuple: A tuple of (the report's content type, the encoded report)
+    """
+    kwargs = crony.args.parse_query(to_args(query), tab=tab)
+    if kwargs["watch"]:
+        raise ValueError("--watch can't be used with queries, which are answered once")
+
+    buffer = io.BytesIO()
+    stream = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    # Queries are answered on the daemon's threads, which processes mustn't be forked from.
+    crony.core.run(stream=stream, resident=resident, parallel=False, **kwargs)
+    stream.flush()
+
+    return (_CONTENT_TYPES[kwargs["format"]], buffer.getvalue())
+
+
+class Server:
+    """Answers HTTP queries, made by many clients at once."""
+
+    def __init__(self, resident=None):
+        """Initialiser
+
+        Args:
+            resident (crony.cache.Resident): The parsed crontabs to keep in memory
+        """
+        self.resident = resident or crony.cache.Resident()
+
+    async def _read_request(self, reader):
+        """Read a request
+
+        Args:
+            reader (asyncio.StreamReader): The client's stream
+
+        Raises:
+            _HttpError: If the request isn't one which can be answered
+
+        Returns:
+            tuple: A tuple of (the query string, the body decoded, or None if there isn't one)
+        """
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise _HttpError(400, "The request line is malformed")
+        method, target, _ = request_line
+
+        headers = {}
+        size = 0
+        while True:
+            line = await reader.readline()
+            size += len(line)
+            if size > _MAX_HEADERS:
+                raise _HttpError(413, "The request's headers are too large")
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if method not in ("GET", "POST"):
+            raise _HttpError(405, f"{method} isn't supported, only GET and POST")
+        url = urlsplit(target)
+        if url.path != "/":
+            raise _HttpError(404, f"There's nothing at {url.path}, only /")
+
+        length = int(headers.get("content-length") or 0)
+        if length > _MAX_BODY:
+            raise _HttpError(413, "The crontab is too large")
+        body = await reader.readexactly(length) if length else None
+
+        return (url.query, body.decode() if body else None)
+
+    async def handle(self, reader, writer):
+        """Handle a client's connection, answering its request
+
+        The query is answered in a worker thread, so that other clients aren't held up.
+
+        Args:
+            reader (asyncio.StreamReader): The client's stream to read from
+            writer (asyncio.StreamWriter): The client's stream to write to
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            try:
+                query, tab = await asyncio.wait_for(
+                    self._read_request(reader), _READ_TIMEOUT
+                )
+                content_type, content = await loop.run_in_executor(
+                    None, answer, self.resident, query, tab
+                )
+                status = 200
+            except _HttpError as e:
+                status, content_type, content = (e.status, None, str(e))
+            except ValueError as e:
+                status, content_type, content = (400, None, str(e))
+            except FileNotFoundError as e:
+                status, content_type, content = (404, None, str(e))
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                _logger.debug("A client didn't send its whole request in time")
+                return
+            except Exception:
+                _logger.exception("Unable to answer a query:")
+                status, content_type, content = (
+                    500,
+                    None,
+                    "Unable to answer the query",
+                )
+
+            if content_type is None:
+                content_type = _CONTENT_TYPES[crony.output.Format.TEXT]
+                content = (content.rstrip("\n") + "\n").encode()
+
+            writer.write(
+                (
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(content)}\r\n"
+                    "Connection: close\r\n\r\n"
+                ).encode("latin-1")
+                + content
+            )
+            await writer.drain()
+        except ConnectionError:
+            _logger.debug("A client went away before it was answered")
+        finally:
+            writer.close()
+
+
+async def start(server, socket=None, host="127.0.0.1", port=None):
+    """Start listening for queries
+
+    Args:
+        server (Server): The server to answer queries with
+        socket (str): The path of the Unix domain socket to listen on
+        host (str): The address to listen on, with a port
+        port (int): The TCP port to listen on instead of a socket
+
+    Raises:
+        ValueError: If the address isn't a loopback one, or something other than a socket is at
+            the socket's path
+
+    Returns:
+        asyncio.AbstractServer: The listening server
+    """
+    # Queries aren't authenticated, and may read any crontab crony can, so they may only come
+    # from this host - and over a socket, from this user.
+    if port is not None:
+        if not is_loopback(host):
+            raise ValueError(f"{host} isn't a loopback address, e.g. 127.0.0.1")
+        listening = await asyncio.start_server(server.handle, host, port)
+        _logger.info(f"Listening on http://{host}:{port}")
+        return listening
+
+    # A socket left behind by a previous run would stop us listening, but anything else at the
+    # path is left well alone.
+    if os.path.lexists(socket):
+        if not stat.S_ISSOCK(os.lstat(socket).st_mode):
+            raise ValueError(
+                f"{socket} exists and isn't a socket, so won't be replaced"
+            )
+        os.remove(socket)
+    umask = os.umask(0o177)
+    try:
+        listening = await asyncio.start_unix_server(server.handle, socket)
+    finally:
+        os.umask(umask)
+    _logger.info(f"Listening on {socket}")
+    return listening
+
+
+def serve(socket=None, host="127.0.0.1", port=None, **kwargs):
+    """Answer queries until interrupted
+
+    Args:
+        socket (str): The path of the Unix domain socket to listen on, defaults to
+            default_socket_path()
+        host (str): The address to listen on, with a port
+        port (int): The TCP port to listen on instead of a socket
+    """
+    if port is None:
+        socket = socket or default_socket_path()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    listening = loop.run_until_complete(start(Server(), socket, host, port))
+    try:
+        loop.run_forever()
+    finally:
+        listening.close()
+        loop.run_until_complete(listening.wait_closed())
+        loop.close()
+        if port is None and os.path.exists(socket):
+            os.remove(socket)
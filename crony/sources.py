@@ -0,0 +1,101 @@
+import glob
+import logging
+import os
+
+_logger = logging.getLogger(__name__)
+
+
+def _directory_files(directory):
+    """Get the crontabs in a directory
+
+    As cron does for /etc/cron.d, hidden files are skipped, and subdirectories aren't descended into.
+
+    Args:
+        directory (str): The directory
+
+    Returns:
+        list: The paths of the crontabs, sorted
+    """
+    return sorted(
+        entry.path
+        for entry in os.scandir(directory)
+        if entry.is_file() and not entry.name.startswith(".")
+    )
+
+
+def expand(patterns):
+    """Expand crontab paths, globs and directories into the crontab files they refer to
+
+    The files are returned in the order their patterns were given, with the matches of each glob
+    and the contents of each directory sorted, so that they're always reported in the same order.
+
+    Args:
+        patterns (list): The paths, globs or directories
+
+    Raises:
+        FileNotFoundError: If a pattern matches nothing, or only empty directories
+
+    Returns:
+        list: The paths of the crontab files, without duplicates
+    """
+    files = {}
+
+    for pattern in patterns:
+        matches = (
+            sorted(glob.glob(pattern, recursive=True))
+            if glob.has_magic(pattern)
+            else [pattern]
+        )
+        if not matches or not all(os.path.exists(m) for m in matches):
+            raise FileNotFoundError(f"No crontabs found at '{pattern}'")
+
+        paths = [
+            path
+            for match in matches
+            for path in (_directory_files(match) if os.path.isdir(match) else [match])
+        ]
+        if not paths:
+            raise FileNotFoundError(f"No crontabs found in '{pattern}'")
+
+        for path in paths:
+            files.setdefault(path, None)
+
+    _logger.debug(f"Expanded {patterns} into {len(files)} crontab(s)")
+    return list(files)
+
+
+def discover(root="/"):
+    """Discover every crontab cron would run on a host
+
+    These are the system crontab (/etc/crontab), the crontabs in /etc/cron.d and each user's crontab
+    in the spool - /var/spool/cron/crontabs on Debian-likes, or /var/spool/cron on Red Hat-likes.
+
+    Args:
+        root (str): The root of the file system to discover crontabs under
+
+    Returns:
+        list: Tuples of (the crontab's path, the user it belongs to), where the user is None for
+        system crontabs, which have a user column instead
+    """
+    crontabs = []
+
+    system = os.path.join(root, "etc", "crontab")
+    if os.path.isfile(system):
+        crontabs.append((system, None))
+
+    cron_d = os.path.join(root, "etc", "cron.d")
+    if os.path.isdir(cron_d):
+        crontabs.extend((path, None) for path in _directory_files(cron_d))
+
+    for spool in [
+        os.path.join(root, "var", "spool", "cron", "crontabs"),
+        os.path.join(root, "var", "spool", "cron"),
+    ]:
+        if os.path.isdir(spool):
+            # User crontabs are named after their user.
+            crontabs.extend(
+                (path, os.path.basename(path)) for path in _directory_files(spool)
+            )
+
+    _logger.debug(f"Discovered {len(crontabs)} crontab(s) under {root}")
+    return crontabs
@@ -0,0 +1,325 @@
+import ctypes
+import hashlib
+import itertools
+import logging
+import os
+import select
+import struct
+import time
+
+import crony.analyser
+import crony.cache
+
+_logger = logging.getLogger(__name__)
+
+# How often to check a crontab for changes, in seconds, where inotify isn't available.
+_POLL_INTERVAL = 1.0
+
+# How long to wait for further changes after one, in seconds, as editors often save in steps.
+_SETTLE = 0.05
+
+# From <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_EVENT = struct.Struct("iIII")
+
+# Clears a terminal, and moves the cursor to its top left.
+_CLEAR = "\x1b[H\x1b[2J"
+
+
+class IncrementalParser:
+    """Parses a crontab as it's edited, only parsing the lines which have changed.
+
+    python-crontab gives a job the comment line directly above it, so each job is parsed along with
+    the lines since the job before it, and is parsed again when any of them change.
+
+    It also renders a job with the environment variables set since the job before, those which
+    differ from the jobs before it. So a job which sets any, other than the first, depends on all of
+    the crontab before it, and is taken from parsing the whole crontab when anything above changes.
+    Variables are usually set once, at the top, so this is rare.
+    """
+
+    def __init__(self):
+        # The records parsed from each line on its own, and the variables it sets.
+        self._lines = {}
+        # The jobs parsed from each job line, by (the lines since the job before it, the line), or
+        # by (the digest of the crontab before it, the line) if it depends on all of it.
+        self._jobs = {}
+        # The number of lines parsed by the last parse().
+        self.parsed = 0
+
+    @staticmethod
+    def _parse_line(line):
+        """Parse a line on its own
+
+        Args:
+            line (str): The line
+
+        Returns:
+            tuple: A tuple of (the records of its jobs, whether it sets an environment variable)
+        """
+        from crontab import CronTab
+
+        if not line.strip():
+            return ([], False)
+        records = crony.cache.to_records(CronTab(tab=line))
+        if records or "=" not in line:
+            return (records, False)
+        # Whether it sets a variable is up to python-crontab, so ask it, with a job to take it.
+        return ([], bool(CronTab(tab=f"{line}\n* * * * * :").crons[0].env))
+
+    def parse(self, content):
+        """Parse a crontab's content, reusing the jobs parsed from unchanged lines
+
+        Args:
+            content (str): The crontab content
+
+        Returns:
+            list: The crony.cache.CachedJob in the crontab
+        """
+        from crontab import CronTab
+
+        lines = {}
+        jobs = {}
+        parsed = []
+        context = []
+        # Whether the lines since the job before set any variables.
+        assigned = False
+        before = hashlib.sha256()
+        whole = None
+        self.parsed = 0
+
+        for line in content.split("\n"):
+            changed = False
+
+            parsed_line = lines.get(line, self._lines.get(line))
+            if parsed_line is None:
+                parsed_line = self._parse_line(line)
+                changed = True
+            lines[line] = parsed_line
+            records, assigns = parsed_line
+
+            if records:
+                key = (
+                    (before.digest(), line)
+                    if parsed and assigned
+                    else (tuple(context), line)
+                )
+                line_jobs = jobs.get(key, self._jobs.get(key))
+                if line_jobs is None:
+                    if parsed and assigned:
+                        if whole is None:
+                            whole = crony.cache.to_records(CronTab(tab=content))
+                        records = whole[len(parsed) : len(parsed) + 1]
+                    elif context:
+                        records = crony.cache.to_records(
+                            CronTab(tab="\n".join(context + [line]))
+                        )[-1:]
+                    line_jobs = crony.cache.from_records(records)
+                    changed = True
+                jobs[key] = line_jobs
+                parsed.extend(line_jobs)
+                context, assigned = ([], False)
+            else:
+                context.append(line)
+                assigned = assigned or assigns
+
+            before.update(line.encode() + b"\n")
+            self.parsed += changed
+
+        self._lines = lines
+        self._jobs = jobs
+        return parsed
+
+
+class _Inotify:
+    """Notifications of changes to the files in a directory, from Linux's inotify."""
+
+    def __init__(self, directory):
+        """Initialiser
+
+        Args:
+            directory (str): The directory to watch
+
+        Raises:
+            OSError: If inotify isn't available
+        """
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify isn't available")
+
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Unable to initialise inotify")
+
+        # Editors often replace a file rather than write to it, so watch its directory - the
+        # file's own watch would be lost along with it.
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"Unable to watch {directory}")
+
+    def read(self, timeout=None):
+        """Read the next notifications
+
+        Args:
+            timeout (float): The most to wait for them, in seconds, or None to wait indefinitely
+
+        Returns:
+            list: The names of the files changed, which is empty if none were in time
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        data = os.read(self.fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = _IN_EVENT.unpack_from(data, offset)
+            offset += _IN_EVENT.size
+            names.append(os.fsdecode(data[offset : offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _notify(inotify, name):
+    """Yield each time a file may have changed, as inotify notifies
+
+    Args:
+        inotify (_Inotify): The notifications of changes to the file's directory
+        name (str): The name of the file
+
+    Yields:
+        None: After each change
+    """
+    try:
+        while True:
+            if name not in inotify.read():
+                continue
+            # Let the rest of a save land before reporting on it.
+            while inotify.read(_SETTLE):
+                pass
+            yield
+    finally:
+        inotify.close()
+
+
+def _stat_key(path):
+    """Get what changes in a file's stat when it's written to or replaced
+
+    Args:
+        path (str): The path of the file
+
+    Returns:
+        tuple: The key, or None if the file doesn't exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def _poll(path, interval=_POLL_INTERVAL):
+    """Watch a file for changes, checking its stat periodically
+
+    Args:
+        path (str): The path of the file
+        interval (float): How often to check it, in seconds
+
+    Returns:
+        iterator: Yields None each time the file may have changed since now
+    """
+
+    def changes(last):
+        while True:
+            time.sleep(interval)
+            current = _stat_key(path)
+            if current != last:
+                last = current
+                yield
+
+    # Compared with now rather than the first check, so that no change is missed.
+    return changes(_stat_key(path))
+
+
+def _changes(path):
+    """Watch a file for changes, with inotify where it's available, or else by polling
+
+    Args:
+        path (str): The path of the file
+
+    Returns:
+        iterator: Yields None each time the file may have changed
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    try:
+        inotify = _Inotify(directory)
+    except OSError:
+        _logger.info(f"inotify isn't available, so polling {path} for changes")
+        return _poll(path)
+    return _notify(inotify, name)
+
+
+def watch(stream, profiler, file, report, changes=None, **kwargs):
+    """Report on a crontab file, and again each time it changes, until interrupted
+
+    Each time, only the lines which have changed are parsed, and only the schedules which are
+    new are expanded - the rest are reused from the previous report.
+
+    Args:
+        stream (file): The stream to output to
+        profiler (crony.profiling.NullProfiler): The profiler to record the run with
+        file (str): The path of the crontab
+        report (callable): Reports on a parsed crontab, given the stream, the profiler and keyword
+            args including the source and the parsed crontab
+        changes (iterable): Notifications that the crontab may have changed, defaults to watching
+            it with _changes()
+        kwargs (dict): Keyword args
+    """
+    parser = IncrementalParser()
+    retained = crony.analyser.Retained()
+    digest = None
+    reports = 0
+
+    # Watch before the first report, so that no change is missed.
+    changes = _changes(file) if changes is None else changes
+
+    for _ in itertools.chain([None], changes):
+        try:
+            with open(file, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            # It's most likely being replaced.
+            _logger.debug(f"{file} is missing, waiting for it to be replaced")
+            continue
+
+        # Only report again when the content has changed, not just been touched.
+        previous, digest = (digest, hashlib.sha256(content).digest())
+        if digest == previous:
+            continue
+
+        with profiler.phase("parse"):
+            jobs = parser.parse(content.decode())
+        _logger.info(f"Parsed {parser.parsed} changed lines of {file}")
+
+        if reports and stream.isatty():
+            stream.write(_CLEAR)
+        report(
+            stream,
+            profiler,
+            **{
+                **kwargs,
+                "source": f"file:{file}",
+                "crontab": jobs,
+                "retained": retained,
+            },
+        )
+        stream.flush()
+        reports += 1
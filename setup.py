@@ -46,6 +46,7 @@ setup(
     python_requires=">=3.6",
     install_requires=requires("install"),
     tests_require=requires("test"),
+    extras_require={"numpy": ["numpy>=1.17"]},
     entry_points={"console_scripts": ["crony = crony.cli:main"]},
     # Required for MANIFEST.in to also install e.g. README.md for use in the long_description.
     include_package_data=True,
@@ -1,7 +1,9 @@
 import sys
 import os
 from datetime import datetime, timedelta
+import importlib.util
 import unittest
+from unittest import mock
 
 from crontab import CronTab
 from parameterized import parameterized, param
@@ -66,21 +68,26 @@ class AnalyserTest(unittest.TestCase):
         include_disabled=False,
         expected_job_count=1,
     ):
-        jobs = get_job_occurrences(
-            [
-                f"{schedule} {command}",
-            ],
-            begin=to_datetime(begin),
-            end=to_datetime(end),
-            include_disabled=include_disabled,
-        )
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine):
+                jobs = get_job_occurrences(
+                    [
+                        f"{schedule} {command}",
+                    ],
+                    begin=to_datetime(begin),
+                    end=to_datetime(end),
+                    include_disabled=include_disabled,
+                    engine=engine,
+                )
 
-        self.assertEqual(expected_job_count, len(jobs))
+                self.assertEqual(expected_job_count, len(jobs))
 
-        if expected_job_count:
-            job = jobs[0]
-            self.assertEqual(command, job.command)
-            self.assertEqual(expected_occurrence_count, len(job.occurrences))
+                if expected_job_count:
+                    job = jobs[0]
+                    self.assertEqual(command, job.command)
+                    self.assertEqual(bool(expected_occurrence_count), job.occurs)
+                    self.assertEqual(expected_occurrence_count, job.count)
+                    self.assertEqual(expected_occurrence_count, len(job.occurrences))
 
     def test_multi_line(self):
         begin = to_datetime("2020-01-01 00:00:00")
@@ -114,3 +121,498 @@ class AnalyserTest(unittest.TestCase):
 
         # Badly named, this asserts on list length and per-item equality without looking at the order
         self.assertCountEqual(expected, job.occurrences)
+
+        # The occurrences are a stream, but one which can be iterated over more than once
+        self.assertListEqual(list(job.occurrences), list(job.occurrences))
+
+    def test_compact_occurrences(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = to_datetime("2020-01-01 00:30:00")
+
+        (job,) = get_job_occurrences(["*/10 * * * * it"], begin=begin, end=end)
+
+        array_ = job.occurrences.to_array()
+        self.assertEqual("q", array_.typecode)
+        self.assertListEqual(
+            [1577836800, 1577837400, 1577838000, 1577838600], list(array_)
+        )
+        self.assertListEqual(list(array_), list(job.occurrences.epochs()))
+
+    @unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy isn't installed")
+    def test_numpy_occurrences(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = to_datetime("2020-01-01 00:30:00")
+
+        (job,) = get_job_occurrences(["*/10 * * * * it"], begin=begin, end=end)
+
+        self.assertListEqual(
+            list(job.occurrences), job.occurrences.to_numpy().astype(datetime).tolist()
+        )
+
+    def test_shared_schedules(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = to_datetime("2020-01-02 00:00:00")
+        lines = [
+            "*/30 * * * * a",
+            "*/30 * * * * b",
+            "0 * * * * c",
+            "0,30 * * * * d",
+            "*/30 0-23 * * * e",
+        ]
+
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine):
+                jobs = get_job_occurrences(lines, begin=begin, end=end, engine=engine)
+                expected = [
+                    list(
+                        crony.analyser.JobOccurrences(
+                            job.job, job.occurrences.begin, end, engine
+                        ).occurrences
+                    )
+                    for job in jobs
+                ]
+
+                # The same schedules share an expansion, and when compiled, so do equivalent
+                # schedules written differently.
+                expansions = [job.schedule_key for job in jobs]
+                self.assertIs(expansions[0], expansions[1])
+                self.assertIsNot(expansions[0], expansions[2])
+                if engine == crony.analyser.Engine.NATIVE:
+                    self.assertIs(expansions[0], expansions[3])
+                    self.assertIs(expansions[0], expansions[4])
+
+                # And each job's occurrences are as if they were expanded for it alone, even
+                # when iterated over more than once.
+                for job, occurrences in zip(jobs, expected):
+                    self.assertListEqual(occurrences, list(job.occurrences))
+                    self.assertEqual(len(occurrences), job.count)
+                for job, occurrences in zip(jobs, expected):
+                    self.assertListEqual(occurrences, list(job.occurrences))
+
+    def test_occurrences_between(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = to_datetime("2020-01-02 00:00:00")
+
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine):
+                (job,) = get_job_occurrences(
+                    ["0 */6 * * * a"], begin=begin, end=end, engine=engine
+                )
+                self.assertListEqual(
+                    [
+                        to_datetime("2020-01-01 12:00:00"),
+                        to_datetime("2020-01-01 18:00:00"),
+                    ],
+                    list(
+                        job.occurrences.between(
+                            to_datetime("2020-01-01 06:00:00"),
+                            to_datetime("2020-01-01 18:00:00"),
+                        )
+                    ),
+                )
+
+    def test_jobs_which_cant_run_are_not_expanded(self):
+        begin = to_datetime("2020-06-10 10:00:00")
+        end = to_datetime("2020-06-10 12:00:00")
+        lines = ["0 3 * * * nightly", "*/5 * * * * often", "0 * 1 1 * new year"]
+
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine), mock.patch(
+                "crony.schedule.Schedule.compile",
+                wraps=crony.schedule.Schedule.compile,
+            ) as compile, mock.patch(
+                "crony.analyser._get_occurrences",
+                wraps=crony.analyser._get_occurrences,
+            ) as get_occurrences:
+                jobs = get_job_occurrences(lines, begin=begin, end=end, engine=engine)
+
+                self.assertListEqual([0, 25, 0], [job.count for job in jobs])
+                self.assertListEqual(
+                    [0, 25, 0], [len(list(job.occurrences)) for job in jobs]
+                )
+                # Only the schedule which may run is compiled, or expanded.
+                self.assertEqual(engine == crony.analyser.Engine.NATIVE, compile.called)
+                self.assertSetEqual(
+                    {"often"},
+                    {call.args[0].command for call in get_occurrences.call_args_list},
+                )
+
+    @parameterized.expand(
+        [
+            param("none", [], []),
+            param(
+                "apart",
+                [("10:00", "11:00"), ("12:00", "13:00")],
+                [("10:00", "11:00"), ("12:00", "13:00")],
+            ),
+            param(
+                "unsorted and overlapping",
+                [("12:00", "13:00"), ("10:00", "11:00"), ("10:30", "12:00")],
+                [("10:00", "13:00")],
+            ),
+            param(
+                "within another",
+                [("10:00", "13:00"), ("11:00", "12:00")],
+                [("10:00", "13:00")],
+            ),
+            param("empty", [("10:00", "10:00"), ("11:00", "10:00")], []),
+        ]
+    )
+    def test_merge_windows(self, _, windows, expected):
+        def to_windows(windows):
+            return [
+                (
+                    to_datetime(f"2020-01-01 {begin}:00"),
+                    to_datetime(f"2020-01-01 {end}:00"),
+                )
+                for begin, end in windows
+            ]
+
+        self.assertListEqual(
+            to_windows(expected), crony.analyser._merge_windows(to_windows(windows))
+        )
+
+    def test_window_occurrences(self):
+        lines = [
+            "*/20 * * * * often",
+            "0,20,40 * * * * often again",
+            "0 3 * * * nightly",
+            "0 0 1 1 * yearly",
+            "#*/10 * * * * disabled",
+        ]
+        windows = [
+            (to_datetime("2020-01-01 02:30:00"), to_datetime("2020-01-01 03:10:00")),
+            (to_datetime("2019-12-31 23:50:00"), to_datetime("2020-01-01 00:30:00")),
+            # Overlapping the first.
+            (to_datetime("2020-01-01 02:50:00"), to_datetime("2020-01-01 04:00:00")),
+            (to_datetime("2020-06-01 00:00:00"), to_datetime("2020-06-01 00:00:00")),
+        ]
+
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine):
+                with mock.patch(
+                    "crony.analyser._get_occurrences",
+                    wraps=crony.analyser._get_occurrences,
+                ) as get_occurrences:
+                    windowed = crony.analyser.get_window_occurrences(
+                        CronTab(tab="\n".join(lines)),
+                        windows,
+                        include_disabled=False,
+                        engine=engine,
+                    )
+
+                for (begin, end), jobs in zip(windows, windowed):
+                    expected = get_job_occurrences(
+                        lines,
+                        begin=begin,
+                        end=end,
+                        include_disabled=False,
+                        engine=engine,
+                    )
+                    self.assertListEqual(
+                        [(job.command, list(job.occurrences)) for job in expected],
+                        [(job.command, list(job.occurrences)) for job in jobs],
+                    )
+                    self.assertListEqual(
+                        [job.count for job in expected], [job.count for job in jobs]
+                    )
+
+                # Each schedule is expanded once, only across the merged windows it may run in.
+                often = [
+                    "2019-12-31 23:49:59",
+                    "2020-01-01 02:29:59",
+                    "2020-05-31 23:59:59",
+                ]
+                expanded = {
+                    "often": often,
+                    "nightly": ["2020-01-01 02:29:59"],
+                    "yearly": ["2019-12-31 23:49:59"],
+                }
+                if engine == crony.analyser.Engine.CRONITER:
+                    # Only compiled schedules are known to be the same.
+                    expanded["often again"] = often
+                self.assertDictEqual(
+                    expanded,
+                    {
+                        command: [
+                            str(call.args[2])
+                            for call in get_occurrences.call_args_list
+                            if call.args[0].command == command
+                        ]
+                        for command in expanded
+                    },
+                )
+                self.assertEqual(
+                    sum(map(len, expanded.values())), get_occurrences.call_count
+                )
+
+    @parameterized.expand(
+        [
+            param(
+                "next",
+                crony.analyser.get_next_occurrences,
+                "begin",
+                {
+                    "often": [
+                        "2020-01-01 03:00",
+                        "2020-01-01 03:20",
+                        "2020-01-01 03:40",
+                    ],
+                    "nightly": [
+                        "2020-01-01 03:00",
+                        "2020-01-02 03:00",
+                        "2020-01-03 03:00",
+                    ],
+                    "leap day": [
+                        "2020-02-29 00:00",
+                        "2024-02-29 00:00",
+                        "2028-02-29 00:00",
+                    ],
+                },
+            ),
+            param(
+                "previous",
+                crony.analyser.get_previous_occurrences,
+                "end",
+                {
+                    "often": [
+                        "2020-01-01 02:20",
+                        "2020-01-01 02:40",
+                        "2020-01-01 03:00",
+                    ],
+                    "nightly": [
+                        "2019-12-30 03:00",
+                        "2019-12-31 03:00",
+                        "2020-01-01 03:00",
+                    ],
+                    "leap day": [
+                        "2008-02-29 00:00",
+                        "2012-02-29 00:00",
+                        "2016-02-29 00:00",
+                    ],
+                },
+            ),
+        ]
+    )
+    def test_next_and_previous_occurrences(self, _, find, from_, expected):
+        lines = [
+            "*/20 * * * * often",
+            "0 3 * * * nightly",
+            "0,20,40 * * * * often again",
+            "0 0 29 2 * leap day",
+            "0 0 31 2 * never",
+            "#0 12 * * * disabled",
+        ]
+
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine):
+                jobs = find(
+                    CronTab(tab="\n".join(lines)),
+                    count=3,
+                    include_disabled=False,
+                    engine=engine,
+                    **{from_: to_datetime("2020-01-01 03:00:30")},
+                )
+
+                # Found in order, whichever way they're searched for, and a schedule which never
+                # runs is searched for no further than the horizon.
+                self.assertDictEqual(
+                    {**expected, "often again": expected["often"], "never": []},
+                    {
+                        job.command: [
+                            dt.strftime("%Y-%m-%d %H:%M") for dt in job.occurrences
+                        ]
+                        for job in jobs
+                    },
+                )
+
+    @parameterized.expand(
+        [
+            param("next", crony.analyser.get_next_occurrences, "begin", "03:20"),
+            param("previous", crony.analyser.get_previous_occurrences, "end", "02:40"),
+        ]
+    )
+    def test_occurrences_across_jobs(self, _, find, from_, after):
+        lines = [
+            "*/20 * * * * often",
+            "0 3 * * * nightly",
+            "0,20,40 * * * * often again",
+            "0 0 29 2 * leap day",
+        ]
+
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine):
+                jobs = find(
+                    CronTab(tab="\n".join(lines)),
+                    count=4,
+                    engine=engine,
+                    across_jobs=True,
+                    **{from_: to_datetime("2020-01-01 03:00:00")},
+                )
+
+                # Only the first of the jobs running after 03:00 is needed, in crontab order.
+                self.assertDictEqual(
+                    {
+                        "often": sorted(["03:00", after]),
+                        "nightly": ["03:00"],
+                        "often again": ["03:00"],
+                        "leap day": [],
+                    },
+                    {
+                        job.command: [dt.strftime("%H:%M") for dt in job.occurrences]
+                        for job in jobs
+                    },
+                )
+
+    def test_shared_schedules_are_expanded_once(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = to_datetime("2020-01-02 00:00:00")
+        jobs = get_job_occurrences(
+            [f"*/5 * * * * job_{i}" for i in range(100)], begin=begin, end=end
+        )
+
+        with mock.patch(
+            "crony.analyser._get_occurrences", wraps=crony.analyser._get_occurrences
+        ) as get_occurrences:
+            for job in jobs:
+                self.assertEqual(289, len(list(job.occurrences.epochs())))
+
+        get_occurrences.assert_called_once()
+        # The occurrences are let go once the last job has iterated over them.
+        self.assertIsNone(jobs[0].occurrences._expansion._epochs)
+        self.assertEqual(
+            crony.analyser._MAX_SHARED_OCCURRENCES,
+            jobs[0].occurrences._expansion.budget.remaining,
+        )
+
+    def test_shared_schedules_over_budget(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = to_datetime("2020-01-02 00:00:00")
+
+        for engine in crony.analyser.Engine:
+            with self.subTest(engine=engine), mock.patch(
+                "crony.analyser._MAX_SHARED_OCCURRENCES", 100
+            ):
+                jobs = get_job_occurrences(
+                    ["*/5 * * * * a", "*/5 * * * * b", "0 * * * * c", "0 * * * * d"],
+                    begin=begin,
+                    end=end,
+                    engine=engine,
+                )
+
+                # The hourly schedule fits in the budget, but the five minutely one is streamed.
+                counts = [len(list(job.occurrences.epochs())) for job in jobs]
+                self.assertListEqual([289, 289, 25, 25], counts)
+
+    @parameterized.expand(
+        [
+            param("within a month", "2020-01-10 12:00:00", "2020-01-20 00:00:00", 1),
+            param("across months", "2020-01-10 12:00:00", "2020-03-05 00:00:00", 3),
+            # The begin minute's adjustment takes it back a second into January, which has no
+            # shard of its own, and the end's minute is April's.
+            param(
+                "from a month's start", "2020-02-01 00:00:00", "2020-04-01 00:00:00", 3
+            ),
+            param("across years", "2019-11-30 23:59:00", "2021-02-01 00:00:30", 16),
+        ]
+    )
+    def test_month_shards(self, _, begin, end, expected):
+        begin = crony.analyser.exclusive_begin(to_datetime(begin))
+        end = to_datetime(end)
+        shards = crony.analyser._month_shards(begin, end)
+
+        self.assertEqual(expected, len(shards))
+        self.assertEqual(begin, shards[0][0])
+        self.assertEqual(end, shards[-1][1])
+        for (_, shard_end), (shard_begin, _) in zip(shards, shards[1:]):
+            # Each ends a second before a month does, where the next begins.
+            self.assertEqual(shard_end, shard_begin)
+            self.assertEqual(
+                (1, 23, 59, 59),
+                (
+                    (shard_end + timedelta(seconds=1)).day,
+                    shard_end.hour,
+                    shard_end.minute,
+                    shard_end.second,
+                ),
+            )
+
+    def test_sharded_occurrences(self):
+        from concurrent.futures import ProcessPoolExecutor
+
+        executor = ProcessPoolExecutor(max_workers=2)
+        self.addCleanup(executor.shutdown)
+        begin = crony.analyser.exclusive_begin(to_datetime("2019-12-31 23:59:00"))
+        end = to_datetime("2021-03-01 00:00:00")
+
+        for engine in crony.analyser.Engine:
+            for line in [
+                "*/7 9-17 * * 1-5 work",
+                "0 0 29 2 * leap",
+                "59 23 31 * * month end",
+                "0 0 1 * * month start",
+            ]:
+                with self.subTest(engine=engine, line=line):
+                    (job,) = CronTab(tab=line)
+                    schedule = crony.analyser.compile_schedule(job, engine)
+
+                    self.assertListEqual(
+                        list(
+                            crony.analyser._get_occurrences(job, schedule, begin, end)
+                        ),
+                        list(
+                            crony.analyser._sharded_occurrences(
+                                job, schedule, begin, end, executor, ahead=3
+                            )
+                        ),
+                    )
+
+    def test_long_periods_are_expanded_in_parallel(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        pool = crony.analyser.Pool(ThreadPoolExecutor(max_workers=2))
+        self.addCleanup(pool.close)
+
+        def expand(**kwargs):
+            jobs = get_job_occurrences(
+                ["0 */6 * * * a", "30 12 * * 1 b"],
+                begin=to_datetime("2020-01-01 00:00:00"),
+                **kwargs,
+            )
+            return [list(job.occurrences.epochs()) for job in jobs]
+
+        with mock.patch.object(
+            crony.analyser.os, "cpu_count", return_value=2
+        ), mock.patch.object(
+            crony.analyser,
+            "_expand_shard",
+            side_effect=crony.analyser._expand_shard,
+        ) as expand_shard:
+            for end, sharded in [
+                ("2020-06-01 00:00:00", False),
+                ("2022-01-01 00:00:00", True),
+            ]:
+                with self.subTest(end=end):
+                    expand_shard.reset_mock()
+                    self.assertListEqual(
+                        expand(end=to_datetime(end)),
+                        expand(end=to_datetime(end), pool=pool),
+                    )
+                    self.assertEqual(sharded, expand_shard.called)
+
+    def test_pool_is_only_started_when_needed(self):
+        with crony.analyser.Pool() as pool:
+            jobs = get_job_occurrences(
+                ["0 */6 * * * a"],
+                begin=to_datetime("2020-01-01 00:00:00"),
+                end=to_datetime("2020-06-01 00:00:00"),
+                pool=pool,
+            )
+            for job in jobs:
+                list(job.occurrences.epochs())
+            self.assertIsNone(pool._executor)
+
+        executor = mock.Mock()
+        with crony.analyser.Pool(executor):
+            pass
+        executor.shutdown.assert_called_once()
@@ -1,10 +1,21 @@
 import argparse
+import re
 import unittest
 import datetime
 
 from parameterized import parameterized, param
 
-from crony import args
+from crony import analyser, args, core, histogram, output
+from tests.util import write_temp_crontab
+
+_WINDOWS_PATH = write_temp_crontab(
+    [
+        "# Outages",
+        "2020-01-02 01:00:00 -> 2020-01-02 03:00:00",
+        "",
+        "2020-01-05 00:00:00,2020-01-05 00:30:00",
+    ]
+)
 
 
 class ArgsTest(unittest.TestCase):
@@ -26,6 +37,18 @@ class ArgsTest(unittest.TestCase):
                 ['-b"2020-01-02 01:23:45"'],
                 {"begin": datetime.datetime(2020, 1, 2, 1, 23, 45, 0)},
             ),
+            param(
+                "relative",
+                ["--begin=1 january 2020 at noon"],
+                {"begin": datetime.datetime(2020, 1, 1, 12, 0, 0, 0)},
+            ),
+            param(
+                "timestamp",
+                [
+                    f"--begin={int(datetime.datetime(2020, 1, 2, 1, 23, 45).timestamp())}"
+                ],
+                {"begin": datetime.datetime(2020, 1, 2, 1, 23, 45, 0)},
+            ),
             param(
                 "end",
                 ['--end="2019-02-03 02:34:56"'],
@@ -36,15 +59,69 @@ class ArgsTest(unittest.TestCase):
                 ['-e"2019-02-03 02:34:56"'],
                 {"end": datetime.datetime(2019, 2, 3, 2, 34, 56, 0)},
             ),
-            param("file", ["--file=/usr/dog/crontab"], {"file": "/usr/dog/crontab"}),
-            param("f", ["-f/usr/dog/crontab"], {"file": "/usr/dog/crontab"}),
+            param("file", ["--file=/usr/dog/crontab"], {"files": ["/usr/dog/crontab"]}),
+            param("f", ["-f/usr/dog/crontab"], {"files": ["/usr/dog/crontab"]}),
+            param(
+                "many files",
+                ["-f/usr/dog/crontab", "-f/etc/cron.d/*"],
+                {"files": ["/usr/dog/crontab", "/etc/cron.d/*"]},
+            ),
             param("user", ["--user=dog"], {"user": "dog"}),
+            param("system", ["--system"], {"system": "/"}),
+            param("system root", ["--system=/mnt/host"], {"system": "/mnt/host"}),
             param("u", ["-udog"], {"user": "dog"}),
             param(
                 "include-disabled", ["--include-disabled"], {"include_disabled": True}
             ),
             param("exclude-header", ["--exclude-header"], {"exclude_header": True}),
             param("only-command", ["--only-command"], {"only_command": True}),
+            param("timeline", ["-t"], {"timeline": True}),
+            param("watch", ["-w"], {"watch": True}),
+            param("profile", ["--profile"], {"profile": True}),
+            param(
+                "profile json",
+                ["--profile-json=/tmp/profile.json"],
+                {"profile": True, "profile_json": "/tmp/profile.json"},
+            ),
+            param(
+                "engine", ["--engine=croniter"], {"engine": analyser.Engine.CRONITER}
+            ),
+            param("format", ["--format=jsonl"], {"format": output.Format.JSONL}),
+            param(
+                "overlaps",
+                [
+                    "--overlaps",
+                    "--durations=/tmp/durations",
+                    "--default-duration=1h30m",
+                    "--concurrency-limit=4",
+                ],
+                {
+                    "overlaps": True,
+                    "durations": "/tmp/durations",
+                    "default_duration": 5400,
+                    "concurrency_limit": 4,
+                },
+            ),
+            param(
+                "histogram",
+                ["--histogram=day", "--top=3"],
+                {"histogram": histogram.Bucket.DAY, "top": 3},
+            ),
+            param(
+                "quiet",
+                [
+                    "--quiet",
+                    "--top=3",
+                    "--min-quiet=30m",
+                    "--quiet-jobs=backup|vacuum",
+                ],
+                {
+                    "quiet": True,
+                    "top": 3,
+                    "min_quiet": 1800,
+                    "quiet_jobs": re.compile("backup|vacuum"),
+                },
+            ),
             param(
                 "all flags",
                 ["-ixc"],
@@ -54,6 +131,127 @@ class ArgsTest(unittest.TestCase):
                     "only_command": True,
                 },
             ),
+            param(
+                "serve",
+                ["serve", "--socket=/run/crony.sock", "--vv"],
+                {
+                    "serve": True,
+                    "socket": "/run/crony.sock",
+                    "port": None,
+                    "log_level": "INFO",
+                },
+            ),
+            param(
+                "serve on a port",
+                ["serve", "--port=8080"],
+                {"serve": True, "socket": None, "port": 8080, "host": "127.0.0.1"},
+            ),
+            param(
+                "serve on a loopback address",
+                ["serve", "--port=8080", "--host=::1"],
+                {"host": "::1"},
+            ),
+            param(
+                "index", ["--index=/tmp/crontab.index"], {"index": "/tmp/crontab.index"}
+            ),
+            param(
+                "index build",
+                [
+                    "index",
+                    "build",
+                    "-f/tmp/crontab",
+                    "-b2020-01-01 00:00:00",
+                    "-e2020-07-01 00:00:00",
+                ],
+                {
+                    "index_command": "build",
+                    "file": "/tmp/crontab",
+                    "begin": datetime.datetime(2020, 1, 1),
+                    "end": datetime.datetime(2020, 7, 1),
+                    "output": "/tmp/crontab.index",
+                },
+            ),
+            param(
+                "index build horizon",
+                [
+                    "index",
+                    "build",
+                    "-f/tmp/crontab",
+                    "-b2020-01-01 00:00:00",
+                    "-o/tmp/i",
+                ],
+                {
+                    "begin": datetime.datetime(2020, 1, 1),
+                    "end": datetime.datetime(2021, 1, 1),
+                    "output": "/tmp/i",
+                },
+            ),
+            param(
+                "windows",
+                [
+                    "-b2020-01-01 00:00:00",
+                    "-e2020-01-01 01:00:00",
+                    "-b2020-01-03 00:00:00",
+                    "-e2020-01-03 02:00:00",
+                ],
+                {
+                    "windows": [
+                        (
+                            datetime.datetime(2020, 1, 1, 0, 0),
+                            datetime.datetime(2020, 1, 1, 1, 0),
+                        ),
+                        (
+                            datetime.datetime(2020, 1, 3, 0, 0),
+                            datetime.datetime(2020, 1, 3, 2, 0),
+                        ),
+                    ]
+                },
+            ),
+            param(
+                "windows file",
+                [f"--windows={_WINDOWS_PATH}"],
+                {
+                    "windows": [
+                        (
+                            datetime.datetime(2020, 1, 2, 1, 0),
+                            datetime.datetime(2020, 1, 2, 3, 0),
+                        ),
+                        (
+                            datetime.datetime(2020, 1, 5, 0, 0),
+                            datetime.datetime(2020, 1, 5, 0, 30),
+                        ),
+                    ]
+                },
+            ),
+            param(
+                "at",
+                ["--at=2020-01-01 03:00:00", "--at=2020-01-02 04:00:00"],
+                {
+                    "at": [
+                        datetime.datetime(2020, 1, 1, 3, 0),
+                        datetime.datetime(2020, 1, 2, 4, 0),
+                    ],
+                    "detail_level": core.DetailLevel.FULL,
+                },
+            ),
+            param(
+                "at one time",
+                ["--at=2020-01-01 03:00:00"],
+                {
+                    "at": [datetime.datetime(2020, 1, 1, 3, 0)],
+                    "detail_level": core.DetailLevel.NONE,
+                },
+            ),
+            param(
+                "next",
+                ["--next=5"],
+                {"next": 5, "previous": None, "detail_level": core.DetailLevel.FULL},
+            ),
+            param(
+                "previous",
+                ["--previous=1", "--timeline"],
+                {"next": None, "previous": 1, "timeline": True},
+            ),
             param(
                 "defaults",
                 ["--vvv"],
@@ -64,6 +262,17 @@ class ArgsTest(unittest.TestCase):
                     "begin": args._NOW,
                     "end": args._NOW,
                     "detail_level": args._DEFAULT_DETAIL_LEVEL,
+                    "engine": analyser.Engine.NATIVE,
+                    "format": output.Format.TEXT,
+                    "histogram": None,
+                    "profile": False,
+                    "watch": False,
+                    "windows": None,
+                    "at": None,
+                    "quiet": False,
+                    "quiet_jobs": None,
+                    "next": None,
+                    "previous": None,
                 },
             ),
         ]
@@ -95,3 +304,42 @@ class ArgsTest(unittest.TestCase):
     def test_invalid_datetime(self, _, datetime_str):
         with self.assertRaises(argparse.ArgumentTypeError):
             args._valid_datetime(datetime_str)
+
+    def test_non_loopback_host(self):
+        with self.assertRaises(argparse.ArgumentTypeError):
+            args._valid_host("0.0.0.0")
+
+    def test_parse_query(self):
+        parsed = args.parse_query(["--file=/etc/crontab", "--dd"], tab="* * * * * woof")
+
+        self.assertEqual(["/etc/crontab"], parsed["files"])
+        self.assertEqual(core.DetailLevel.FULL, parsed["detail_level"])
+        self.assertEqual("* * * * * woof", parsed["tab"])
+        # The datetimes default to the time of the query, not when crony started.
+        self.assertGreater(parsed["begin"], args._NOW)
+        self.assertEqual(parsed["begin"], parsed["end"])
+
+    @parameterized.expand(
+        [
+            param("unrecognised", ["--bogus"]),
+            param("invalid datetime", ["--begin=asdfasf"]),
+            param("help", ["--help"]),
+            param("unpaired windows", ["-b2020-01-01", "-b2020-01-02", "-e2020-01-03"]),
+            param("missing windows", ["--windows=/missing"]),
+            param("invalid quiet jobs", ["--quiet", "--quiet-jobs=backup("]),
+            param("next and previous", ["--next=1", "--previous=1"]),
+            param("no runs", ["--previous=0"]),
+            param("next in many windows", ["--next=1", f"--windows={_WINDOWS_PATH}"]),
+            param("next quiet periods", ["--next=1", "--quiet"]),
+            param(
+                "at in many windows",
+                ["--at=2020-01-01", f"--windows={_WINDOWS_PATH}"],
+            ),
+            param("at histogram", ["--at=2020-01-01", "--histogram=hour"]),
+            param("at overlaps", ["--at=2020-01-01", "--overlaps"]),
+            param("at quiet periods", ["--at=2020-01-01", "--quiet"]),
+        ]
+    )
+    def test_parse_invalid_query(self, _, args_):
+        with self.assertRaises(ValueError):
+            args.parse_query(args_)
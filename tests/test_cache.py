@@ -0,0 +1,186 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from crontab import CronTab
+
+from crony import cache, core
+from tests.util import write_temp_crontab, to_datetime
+
+_LINES = [
+    "*/5 * * * * every five # with a comment",
+    "#0 * * * * disabled",
+    "@daily daily",
+]
+
+
+def _run(opts):
+    stream = io.StringIO()
+    core.run(stream=stream, **opts)
+    return stream.getvalue()
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_home = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.cache_home.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.cache_home.cleanup)
+
+    def _snapshots(self):
+        directory = os.path.join(self.cache_home.name, "crony")
+        return sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+
+    def test_miss_then_hit(self):
+        content = "\n".join(_LINES).encode()
+        self.assertIsNone(cache.load(content))
+
+        crontab = CronTab(tab=content.decode())
+        cache.store(content, crontab)
+        jobs = cache.load(content)
+
+        self.assertEqual(len(list(crontab)), len(jobs))
+        for expected, actual in zip(crontab, jobs):
+            self.assertEqual(expected.command, actual.command)
+            self.assertEqual(expected.render(), actual.render())
+            self.assertEqual(expected.is_enabled(), actual.is_enabled())
+            self.assertIsNotNone(actual.compiled)
+
+    def test_changed_content_misses(self):
+        content = "\n".join(_LINES).encode()
+        cache.store(content, CronTab(tab=content.decode()))
+
+        self.assertIsNone(cache.load(content + b"\n* * * * * another"))
+
+    def test_unreadable_snapshot_misses(self):
+        content = "\n".join(_LINES).encode()
+        cache.store(content, CronTab(tab=content.decode()))
+
+        (snapshot,) = self._snapshots()
+        with open(os.path.join(self.cache_home.name, "crony", snapshot), "wb") as f:
+            f.write(b"nonsense")
+
+        self.assertIsNone(cache.load(content))
+
+    def test_eviction(self):
+        contents = [f"* * * * * job{i}".encode() for i in range(3)]
+        for content in contents:
+            cache.store(content, CronTab(tab=content.decode()))
+            # Ensure the modification times differ
+            time.sleep(0.01)
+
+        size = os.path.getsize(
+            os.path.join(self.cache_home.name, "crony", self._snapshots()[0])
+        )
+
+        # Using the first snapshot makes the second the least recently used
+        cache.load(contents[0])
+        cache.store(
+            b"0 * * * * job3", CronTab(tab="0 * * * * job3"), max_bytes=3 * size
+        )
+
+        self.assertEqual(3, len(self._snapshots()))
+        self.assertIsNotNone(cache.load(contents[0]))
+        self.assertIsNone(cache.load(contents[1]))
+
+    def test_run_output_unchanged(self):
+        opts = {
+            "file": write_temp_crontab(_LINES),
+            "begin": to_datetime("2020-01-31 00:00:00"),
+            "end": to_datetime("2020-02-01 00:30:00"),
+            "detail_level": core.DetailLevel.FULL,
+            "include_disabled": True,
+            "exclude_header": False,
+            "only_command": False,
+        }
+
+        expected = _run(opts)
+        cold = _run({**opts, "cache": True})
+        self.assertEqual(1, len(self._snapshots()))
+
+        # A warm cache mustn't parse the crontab at all
+        with mock.patch("crontab.CronTab", side_effect=AssertionError("parsed")):
+            warm = _run({**opts, "cache": True})
+
+        self.assertEqual(expected, cold)
+        self.assertEqual(expected, warm)
+
+
+class ResidentTest(unittest.TestCase):
+    def setUp(self):
+        self.parses = []
+        self.path = write_temp_crontab(_LINES)
+        self.addCleanup(os.remove, self.path)
+
+    def _parse(self, source):
+        self.parses.append(source)
+        if isinstance(source, bytes):
+            return cache.to_records(CronTab(tab=source.decode()))
+        return cache.to_records(CronTab(tabfile=source))
+
+    def _rewrite(self, lines, mtime_offset=1):
+        with open(self.path, "w") as f:
+            f.write("\n".join(lines))
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset))
+
+    def test_file_is_parsed_once(self):
+        resident = cache.Resident()
+        first = resident.file(self.path, self._parse)
+        second = resident.file(self.path, self._parse)
+
+        self.assertIs(first, second)
+        self.assertEqual(1, len(self.parses))
+        self.assertListEqual(
+            ["*/5 * * * *", "0 * * * *", "0 0 * * *"],
+            [job.expression for job in first],
+        )
+
+    def test_touched_file_isnt_parsed_again(self):
+        resident = cache.Resident()
+        first = resident.file(self.path, self._parse)
+        self._rewrite(_LINES)
+
+        self.assertIs(first, resident.file(self.path, self._parse))
+        self.assertEqual(1, len(self.parses))
+
+    def test_changed_file_is_parsed_again(self):
+        resident = cache.Resident()
+        resident.file(self.path, self._parse)
+        self._rewrite(_LINES + ["* * * * * another"])
+
+        jobs = resident.file(self.path, self._parse)
+        self.assertEqual(2, len(self.parses))
+        self.assertEqual("another", jobs[-1].command)
+
+    def test_tabs_are_evicted(self):
+        resident = cache.Resident(max_tabs=2)
+        contents = [f"* * * * * job{i}".encode() for i in range(3)]
+        for content in contents:
+            resident.tab(content, self._parse)
+
+        # Using the second makes the third the most recently used but one.
+        resident.tab(contents[1], self._parse)
+        resident.tab(contents[0], self._parse)
+        self.assertListEqual(contents + [contents[0]], self.parses)
+
+    def test_run_output_unchanged(self):
+        opts = {
+            "file": self.path,
+            "begin": to_datetime("2020-01-31 00:00:00"),
+            "end": to_datetime("2020-02-01 00:30:00"),
+            "detail_level": core.DetailLevel.FULL,
+            "include_disabled": True,
+            "exclude_header": False,
+            "only_command": False,
+        }
+        resident = cache.Resident()
+
+        expected = _run(opts)
+        self.assertEqual(expected, _run({**opts, "resident": resident}))
+        with mock.patch("crontab.CronTab", side_effect=AssertionError("parsed")):
+            self.assertEqual(expected, _run({**opts, "resident": resident}))
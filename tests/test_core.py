@@ -3,10 +3,13 @@ import unittest
 import shlex
 import itertools
 import io
+import os
+import tempfile
+from unittest import mock
 
 from parameterized import parameterized, param
 
-from crony import core
+from crony import core, profiling
 
 from tests.util import write_temp_crontab, to_datetime
 
@@ -111,3 +114,236 @@ class CoreTest(unittest.TestCase):
                 **_SIMPLE_ARGS,
             }
         )
+
+    def test_timeline(self):
+        output = _run(
+            {
+                "tab": "\n".join(["*/2 * * * * even", "*/3 * * * * third"]),
+                "begin": to_datetime("2020-01-01 00:00:00"),
+                "end": to_datetime("2020-01-01 00:04:00"),
+                "detail_level": core.DetailLevel.NONE,
+                "include_disabled": False,
+                "exclude_header": True,
+                "only_command": True,
+                "timeline": True,
+            }
+        )
+
+        self.assertListEqual(
+            [
+                "2020-01-01 00:00:00\teven",
+                "2020-01-01 00:00:00\tthird",
+                "2020-01-01 00:02:00\teven",
+                "2020-01-01 00:03:00\tthird",
+                "2020-01-01 00:04:00\teven",
+            ],
+            output.splitlines(),
+        )
+
+    def test_many_files(self):
+        files = [write_temp_crontab([f"*/{i} * * * * every_{i}"]) for i in range(1, 5)]
+        opts = {
+            "begin": to_datetime("2020-01-01 00:00:00"),
+            "end": to_datetime("2020-01-01 00:10:00"),
+            "detail_level": core.DetailLevel.FULL,
+            "include_disabled": False,
+            "exclude_header": False,
+            "only_command": False,
+        }
+
+        # The reports are in the order the files were given, whichever completes first.
+        expected = "".join(_run({**opts, "file": f}) for f in reversed(files))
+        self.assertEqual(expected, _run({**opts, "files": list(reversed(files))}))
+
+    @parameterized.expand(
+        [
+            param("names", {}),
+            param("occurrences", {"detail_level": core.DetailLevel.FULL}),
+            param("timeline", {"timeline": True}),
+        ]
+    )
+    def test_windows(self, _, kwargs):
+        file = write_temp_crontab(["*/20 * * * * often", "0 3 * * * nightly"])
+        windows = [
+            (to_datetime("2020-01-01 02:30:00"), to_datetime("2020-01-01 03:10:00")),
+            (to_datetime("2020-01-01 00:00:00"), to_datetime("2020-01-01 00:30:00")),
+            # Overlapping the first.
+            (to_datetime("2020-01-01 02:50:00"), to_datetime("2020-01-01 04:00:00")),
+        ]
+        opts = {
+            "detail_level": core.DetailLevel.COUNT,
+            "include_disabled": False,
+            "exclude_header": False,
+            "only_command": False,
+            "file": file,
+            **kwargs,
+        }
+
+        # Each window is reported on in turn, as if on its own.
+        expected = "".join(
+            _run({**opts, "begin": begin, "end": end}) for begin, end in windows
+        )
+        self.assertEqual(expected, _run({**opts, "windows": windows}))
+
+    def test_at(self):
+        output = _run(
+            {
+                "tab": "\n".join(["*/2 * * * * even", "*/3 * * * * third"]),
+                "at": [
+                    to_datetime("2020-01-01 00:03:00"),
+                    to_datetime("2020-01-01 00:00:30"),
+                    to_datetime("2020-01-01 00:01:00"),
+                ],
+                "detail_level": core.DetailLevel.NONE,
+                "include_disabled": False,
+                "exclude_header": False,
+                "only_command": True,
+                "timeline": True,
+            }
+        )
+
+        self.assertListEqual(
+            [
+                "For -: 2020-01-01 00:00:30 -> 2020-01-01 00:03:00 (0:02:30)",
+                "",
+                "2020-01-01 00:00:00\teven",
+                "2020-01-01 00:00:00\tthird",
+                "2020-01-01 00:03:00\tthird",
+            ],
+            output.splitlines(),
+        )
+
+    @parameterized.expand(
+        [
+            param(
+                "next",
+                {"next": 2, "begin": to_datetime("2020-01-01 00:00:30")},
+                [
+                    "For -: 2020-01-01 00:00:30 -> 2020-01-01 00:03:00 (0:02:30)",
+                    "",
+                    "even",
+                    "\tOccurrences: 2",
+                    "\t\t2020-01-01 00:00:00",
+                    "\t\t2020-01-01 00:02:00",
+                    "third",
+                    "\tOccurrences: 2",
+                    "\t\t2020-01-01 00:00:00",
+                    "\t\t2020-01-01 00:03:00",
+                ],
+            ),
+            param(
+                "previous across every job",
+                {
+                    "previous": 3,
+                    "end": to_datetime("2020-01-01 00:06:00"),
+                    "timeline": True,
+                },
+                [
+                    "For -: 2020-01-01 00:04:00 -> 2020-01-01 00:06:00 (0:02:00)",
+                    "",
+                    "2020-01-01 00:04:00\teven",
+                    "2020-01-01 00:06:00\teven",
+                    "2020-01-01 00:06:00\tthird",
+                ],
+            ),
+        ]
+    )
+    def test_runs(self, _, opts, expected):
+        output = _run(
+            {
+                "tab": "\n".join(["*/2 * * * * even", "*/3 * * * * third"]),
+                "detail_level": core.DetailLevel.FULL,
+                "include_disabled": False,
+                "exclude_header": False,
+                "only_command": True,
+                **opts,
+            }
+        )
+
+        self.assertListEqual(expected, output.splitlines())
+
+    def test_many_files_profiled(self):
+        files = [write_temp_crontab(["* * * * * woof"]) for _ in range(2)]
+        profiler = profiling.Profiler()
+        stream = io.StringIO()
+        core.run(
+            stream=stream,
+            profiler=profiler,
+            files=files,
+            **{**_SIMPLE_ARGS, "file": None},
+            detail_level=core.DetailLevel.COUNT,
+            include_disabled=False,
+            exclude_header=False,
+            only_command=False,
+        )
+
+        self.assertEqual(2, stream.getvalue().count("Occurrences: 24"))
+        self.assertEqual(2, len(profiler.jobs))
+
+    def test_many_files_streamed(self):
+        files = [write_temp_crontab(["*/10 * * * * woof"]) for _ in range(2)]
+        stream = io.StringIO()
+        with mock.patch("crony.core._process_map") as process_map:
+            core.run(
+                stream=stream,
+                files=files,
+                **{**_SIMPLE_ARGS, "file": None},
+                detail_level=core.DetailLevel.FULL,
+                include_disabled=False,
+                exclude_header=True,
+                only_command=True,
+            )
+
+        # Reports of every occurrence aren't held in memory, but streamed a file at a time.
+        process_map.assert_not_called()
+        self.assertEqual(2 * 3, stream.getvalue().count("\t\t2020-01-01"))
+
+    def test_empty_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesRegex(FileNotFoundError, "No crontabs found"):
+                core.run(
+                    stream=io.StringIO(),
+                    files=[directory],
+                    **{**_SIMPLE_ARGS, "file": None},
+                    detail_level=core.DetailLevel.NONE,
+                    include_disabled=False,
+                    exclude_header=False,
+                    only_command=False,
+                )
+
+    def test_system(self):
+        with tempfile.TemporaryDirectory() as root:
+            for parts, lines in [
+                (["etc", "crontab"], ["SHELL=/bin/sh", "17 * * * * root hourly"]),
+                (["etc", "cron.d", "php"], ["*/30 * * * * www-data php"]),
+                (["var", "spool", "cron", "crontabs", "alice"], ["0 */6 * * * backup"]),
+            ]:
+                path = os.path.join(root, *parts)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "w") as f:
+                    f.write("\n".join(lines))
+
+            output = _run(
+                {
+                    "system": root,
+                    "begin": to_datetime("2020-01-01 00:00:00"),
+                    "end": to_datetime("2020-01-01 01:00:00"),
+                    "detail_level": core.DetailLevel.NONE,
+                    "include_disabled": False,
+                    "exclude_header": True,
+                    "only_command": False,
+                    "timeline": True,
+                }
+            )
+
+        # Every crontab is analysed together, with each job attributed to its user.
+        self.assertListEqual(
+            [
+                "2020-01-01 00:00:00\t*/30 * * * * www-data php",
+                "2020-01-01 00:00:00\t0 */6 * * * alice backup",
+                "2020-01-01 00:17:00\t17 * * * * root hourly",
+                "2020-01-01 00:30:00\t*/30 * * * * www-data php",
+                "2020-01-01 01:00:00\t*/30 * * * * www-data php",
+            ],
+            output.splitlines(),
+        )
@@ -0,0 +1,110 @@
+import collections
+import unittest
+
+from parameterized import parameterized
+
+from crony import analyser, histogram
+from crony.schedule import to_epoch
+
+from tests.util import USE_NUMPY, get_jobs, to_datetime
+
+_LINES = [
+    "*/5 * * * * every_five",
+    "*/15 9-17 * * 1-5 office",
+    "0 * * * * hourly",
+    "*/5 * * * * also_every_five",
+    "30 2 * * * nightly",
+    "0 9 * * 1 monday",
+]
+
+_BEGIN = to_datetime("2020-01-01 00:00:00")
+_END = to_datetime("2020-01-14 23:59:00")
+
+
+def _jobs(engine=analyser.Engine.NATIVE):
+    return get_jobs(_LINES, _BEGIN, _END, engine=engine)
+
+
+def _expected(bucket):
+    # Bucket every occurrence of every job the slow way.
+    counts = collections.Counter()
+    contributors = collections.defaultdict(collections.Counter)
+    for job in _jobs():
+        for epoch in job.occurrences.epochs():
+            start = epoch // bucket.value * bucket.value
+            counts[start] += 1
+            contributors[start][job.command] += 1
+    return counts, contributors
+
+
+class HistogramTest(unittest.TestCase):
+    @parameterized.expand(USE_NUMPY)
+    def test_counts(self, _, use_numpy):
+        for bucket in histogram.Bucket:
+            with self.subTest(bucket=bucket):
+                h = histogram.Histogram(_BEGIN, _END, bucket, use_numpy=use_numpy)
+                for job in _jobs():
+                    h.add(job.occurrences.epochs())
+
+                expected, _ = _expected(bucket)
+                actual = {
+                    h.bucket_range(i)[0]: count
+                    for i, count in enumerate(h.counts)
+                    if count
+                }
+                self.assertDictEqual(dict(expected), actual)
+
+    @parameterized.expand(USE_NUMPY)
+    def test_weighted_counts(self, _, use_numpy):
+        h = histogram.Histogram(_BEGIN, _END, histogram.Bucket.DAY, use_numpy=use_numpy)
+        h.add([to_epoch(_BEGIN), to_epoch(_END)], weight=3)
+        self.assertListEqual([3] + [0] * 12 + [3], [int(c) for c in h.counts])
+
+    @parameterized.expand(USE_NUMPY)
+    def test_top(self, _, use_numpy):
+        h = histogram.Histogram(_BEGIN, _END, histogram.Bucket.DAY, use_numpy=use_numpy)
+        for day, count in [(0, 1), (1, 5), (2, 3), (3, 5), (5, 2)]:
+            h.add([h.bucket_range(day)[0]] * count)
+
+        # The busiest first, then the earliest, and never an empty bucket.
+        self.assertListEqual([(1, 5), (3, 5), (2, 3)], h.top(3))
+        self.assertListEqual([(1, 5), (3, 5), (2, 3), (5, 2), (0, 1)], h.top(100))
+        self.assertListEqual([], h.top(0))
+
+    def test_build(self):
+        for engine in analyser.Engine:
+            with self.subTest(engine=engine):
+                busiest = histogram.build(
+                    _jobs(engine),
+                    _BEGIN,
+                    _END,
+                    histogram.Bucket.HOUR,
+                    top=5,
+                )
+
+                expected, contributors = _expected(histogram.Bucket.HOUR)
+                self.assertListEqual(
+                    sorted(expected.items(), key=lambda b: (-b[1], b[0]))[:5],
+                    [(start, count) for start, count, _ in busiest],
+                )
+                for start, _, jobs in busiest:
+                    self.assertDictEqual(
+                        dict(contributors[start]),
+                        {job.command: count for job, count in jobs},
+                    )
+                    self.assertListEqual(
+                        sorted((c for _, c in jobs), reverse=True), [c for _, c in jobs]
+                    )
+
+    def test_build_lets_go_of_occurrences(self):
+        jobs = _jobs()
+        histogram.build(jobs, _BEGIN, _END, histogram.Bucket.DAY)
+
+        # Every job sharing a schedule is accumulated from the one stream, so nothing is left
+        # held on to for the jobs which never iterated over it.
+        for job in jobs:
+            self.assertIsNone(job.occurrences._expansion._epochs)
+        self.assertEqual(
+            analyser._MAX_SHARED_OCCURRENCES,
+            jobs[0].occurrences._expansion.budget.remaining,
+        )
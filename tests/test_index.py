@@ -0,0 +1,168 @@
+import io
+import os
+import tempfile
+import unittest
+
+from parameterized import parameterized, param
+
+from crony import analyser, core, index
+from tests.util import to_datetime
+
+_LINES = [
+    "*/5 * * * * woof",
+    "0 3 * * * bark",
+    "#*/10 * * * * disabled",
+    "0,30 * * * * half",
+    "*/30 * * * * half again",
+    "15 4 * * 1 weekly",
+]
+
+_BEGIN = to_datetime("2020-01-01 00:00:00")
+_END = to_datetime("2020-03-01 00:00:00")
+
+
+def _run(**kwargs):
+    stream = io.StringIO()
+    core.run(
+        stream=stream,
+        **{
+            "include_disabled": False,
+            "exclude_header": False,
+            "only_command": False,
+            "detail_level": core.DetailLevel.NONE,
+            **kwargs,
+        },
+    )
+    return stream.getvalue()
+
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.file = os.path.join(self._dir.name, "crontab")
+        with open(self.file, "w") as f:
+            f.write("\n".join(_LINES))
+        self.path = os.path.join(self._dir.name, "crontab.index")
+        self.index = index.build(
+            output=self.path,
+            begin=_BEGIN,
+            end=_END,
+            file=self.file,
+            stream=io.StringIO(),
+        )
+
+    def test_jobs(self):
+        self.assertListEqual(
+            [
+                "woof",
+                "bark",
+                "disabled",
+                "half",
+                "half again",
+                "weekly",
+            ],
+            [job.command for job in self.index.jobs],
+        )
+        self.assertEqual(f"file:{self.file}", self.index.source)
+
+    @parameterized.expand(
+        [
+            param("start", "2020-01-01 00:00:00", "2020-01-01 01:00:00"),
+            param("middle", "2020-02-03 04:05:06", "2020-02-04 03:02:01"),
+            param("end", "2020-02-29 23:59:30", "2020-03-01 00:00:00"),
+            param("everything", "2020-01-01 00:00:00", "2020-03-01 00:00:00"),
+            param("nothing", "2020-01-01 00:01:00", "2020-01-01 00:02:00"),
+        ]
+    )
+    def test_matches_expanding(self, _, begin, end):
+        begin, end = (to_datetime(begin), to_datetime(end))
+        expected = list(
+            analyser.get_job_occurrences(
+                self.index.jobs, begin, end, include_disabled=True
+            )
+        )
+        actual = list(self.index.get_job_occurrences(begin, end))
+
+        self.assertListEqual(
+            [(job.count, list(job.occurrences.epochs())) for job in expected],
+            [(job.count, list(job.occurrences.epochs())) for job in actual],
+        )
+        self.assertListEqual(
+            [job.occurs for job in expected], [job.occurs for job in actual]
+        )
+
+    def test_count(self):
+        begin = analyser.exclusive_begin(to_datetime("2020-01-01 00:00:00"))
+        end = to_datetime("2020-01-01 01:00:00")
+
+        self.assertListEqual(
+            [13, 0, 7, 3, 3, 0],
+            [self.index.count(i, begin, end) for i in range(len(_LINES))],
+        )
+
+    def test_schedules_are_stored_once(self):
+        begin = analyser.exclusive_begin(_BEGIN)
+        offsets = self.index._offsets
+
+        # '0,30' and '*/30' are the same schedule.
+        self.assertEqual(offsets[6:8], offsets[8:10])
+        self.assertEqual(
+            sum(len(self.index.epochs(i, begin, _END)) for i in (0, 1, 2, 3, 5)),
+            len(self.index._occurrences),
+        )
+
+    def test_beyond_horizon_is_expanded(self):
+        begin, end = (
+            to_datetime("2020-02-29 23:00:00"),
+            to_datetime("2020-03-01 01:00:00"),
+        )
+        self.assertFalse(self.index.covers(analyser.exclusive_begin(begin), end))
+
+        expected = analyser.get_job_occurrences(self.index.jobs, begin, end)
+        actual = self.index.get_job_occurrences(begin, end)
+        self.assertListEqual(
+            [job.count for job in expected], [job.count for job in actual]
+        )
+
+    @parameterized.expand(
+        [
+            param("names", {}),
+            param("counts", {"detail_level": core.DetailLevel.COUNT}),
+            param(
+                "occurrences",
+                {"detail_level": core.DetailLevel.FULL, "include_disabled": True},
+            ),
+            param("timeline", {"timeline": True}),
+        ]
+    )
+    def test_run(self, _, kwargs):
+        kwargs = {
+            "begin": to_datetime("2020-01-06 03:00:00"),
+            "end": to_datetime("2020-01-06 05:00:00"),
+            **kwargs,
+        }
+        self.assertEqual(
+            _run(files=[self.file], **kwargs), _run(index=self.path, **kwargs)
+        )
+
+    def test_changed_crontab_is_warned_about(self):
+        with open(self.file, "a") as f:
+            f.write("\n* * * * * new")
+
+        with self.assertLogs("crony.index", "WARNING") as logs:
+            index.Index(self.path)
+        self.assertIn("has changed", logs.output[0])
+
+    @parameterized.expand(
+        [
+            param("empty", b""),
+            param("not an index", b"* * * * * woof\n" * 10),
+        ]
+    )
+    def test_invalid(self, _, content):
+        with open(self.path, "wb") as f:
+            f.write(content)
+
+        with self.assertRaises(ValueError):
+            index.Index(self.path)
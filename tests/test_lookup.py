@@ -0,0 +1,134 @@
+import random
+import unittest
+from unittest import mock
+from datetime import timedelta
+
+from crontab import CronTab
+from parameterized import parameterized
+
+from crony import analyser, lookup
+from crony.schedule import to_epoch
+from tests.util import USE_NUMPY, get_jobs, to_datetime
+
+_LINES = [
+    "*/20 * * * * often",
+    "0 3 * * * nightly",
+    "30 12 13 * 5 thirteenth or friday",
+    "30 12 * * 5 friday",
+    "0 0 29 2 * leap day",
+    "#0 * * * * disabled",
+    "@hourly hourly",
+]
+
+
+def _expanded(lines, at, **kwargs):
+    # The jobs running at each minute, the slow way.
+    matches = {}
+    for minute in sorted({dt.replace(second=0) for dt in at}):
+        for job in get_jobs(lines, minute, minute, **kwargs):
+            if job.occurs:
+                matches.setdefault(job.command, []).append(to_epoch(minute))
+    return matches
+
+
+def _looked_up(lines, at, **kwargs):
+    jobs = lookup.Lookup(CronTab(tab="\n".join(lines)), **kwargs).get_job_occurrences(
+        at
+    )
+    return {job.command: list(job.occurrences.epochs()) for job in jobs}
+
+
+class LookupTest(unittest.TestCase):
+    @parameterized.expand(USE_NUMPY)
+    def test_matches_expanding(self, _, use_numpy):
+        at = [
+            to_datetime("2020-03-13 12:30:45"),
+            to_datetime("2020-03-06 12:30:00"),
+            to_datetime("2020-02-13 12:30:00"),
+            to_datetime("2020-02-29 00:00:00"),
+            to_datetime("2020-01-01 03:00:00"),
+            to_datetime("2020-01-01 03:20:00"),
+            to_datetime("2020-01-01 03:21:00"),
+        ]
+
+        self.assertDictEqual(
+            _expanded(_LINES, at, include_disabled=False),
+            _looked_up(_LINES, at, include_disabled=False, use_numpy=use_numpy),
+        )
+
+    @parameterized.expand(USE_NUMPY)
+    def test_random_schedules_match_expanding(self, _, use_numpy):
+        rng = random.Random(0)
+        fields = ["*", "*/7", "1-4", "2,5", "1-6/2", "3", "5-6"]
+        lines = [
+            " ".join(rng.choice(fields) for _ in range(5)) + f" job_{i}"
+            for i in range(100)
+        ]
+        begin = to_datetime("2020-01-01 00:00:00")
+        at = [
+            begin + timedelta(minutes=rng.randrange(366 * 24 * 60)) for _ in range(50)
+        ]
+        # Make sure some are found.
+        at += [to_datetime("2020-02-05 03:05:00"), to_datetime("2020-06-02 02:01:00")]
+
+        self.assertDictEqual(
+            _expanded(lines, at), _looked_up(lines, at, use_numpy=use_numpy)
+        )
+
+    def test_unindexed_schedules_are_checked(self):
+        at = [to_datetime("2020-03-13 12:30:00"), to_datetime("2020-01-01 03:00:00")]
+        engine = analyser.Engine.CRONITER
+
+        self.assertDictEqual(
+            _expanded(_LINES, at, engine=engine),
+            _looked_up(_LINES, at, engine=engine),
+        )
+
+    def test_unindexed_schedules_which_never_run(self):
+        at = [to_datetime("2020-02-29 00:00:00"), to_datetime("2020-03-31 00:00:00")]
+        lines = ["0 0 31 2 * never", "0 0 29,31 * * end of month"]
+
+        for engine in analyser.Engine:
+            with self.subTest(engine=engine):
+                self.assertDictEqual(
+                    {"end of month": [to_epoch(dt) for dt in at]},
+                    _looked_up(lines, at, engine=engine),
+                )
+
+    def test_unindexed_schedules_are_only_checked_where_they_may_run(self):
+        at = [to_datetime("2020-01-01 03:00:00"), to_datetime("2020-01-01 04:00:00")]
+
+        with mock.patch("crony.analyser.occurs", wraps=analyser.occurs) as occurs:
+            self.assertDictEqual(
+                {"nightly": [to_epoch(at[0])]},
+                _looked_up(["0 3 * * * nightly"], at, engine=analyser.Engine.CRONITER),
+            )
+
+        occurs.assert_called_once()
+
+    def test_job_occurrences(self):
+        at = [
+            to_datetime("2020-01-01 04:00:00"),
+            to_datetime("2020-01-01 03:00:59"),
+            to_datetime("2020-01-01 03:00:00"),
+        ]
+        jobs = lookup.Lookup(CronTab(tab="\n".join(_LINES))).get_job_occurrences(at)
+
+        # In crontab order, with each job's runs among the minutes looked up.
+        self.assertListEqual(
+            [
+                ("often", 2, ["2020-01-01 03:00:00", "2020-01-01 04:00:00"]),
+                ("nightly", 1, ["2020-01-01 03:00:00"]),
+                ("disabled", 2, ["2020-01-01 03:00:00", "2020-01-01 04:00:00"]),
+                ("hourly", 2, ["2020-01-01 03:00:00", "2020-01-01 04:00:00"]),
+            ],
+            [
+                (job.command, job.count, [str(dt) for dt in job.occurrences])
+                for job in jobs
+            ],
+        )
+
+    def test_nothing_to_look_up(self):
+        self.assertListEqual(
+            [], lookup.Lookup(CronTab(tab="\n".join(_LINES))).get_job_occurrences([])
+        )
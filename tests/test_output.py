@@ -0,0 +1,519 @@
+import csv
+import io
+import json
+import struct
+import types
+import unittest
+
+from parameterized import parameterized, param
+
+from crony import core, histogram, output
+from crony.schedule import to_epoch
+
+from tests.util import to_datetime
+
+_TAB = "\n".join(["*/2 * * * * even", "*/3 * * * * third", "0 0 2 2 * rarely"])
+
+_ARGS = {
+    "tab": _TAB,
+    "begin": to_datetime("2020-01-01 00:00:00"),
+    "end": to_datetime("2020-01-01 00:04:00"),
+    "include_disabled": False,
+    "exclude_header": False,
+    "only_command": True,
+}
+
+
+class _BinaryStream(io.StringIO):
+    """A text stream with an underlying binary one, like sys.stdout"""
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = io.BytesIO()
+
+
+def _run(**kwargs):
+    stream = io.StringIO()
+    core.run(stream=stream, **{**_ARGS, **kwargs})
+    return stream.getvalue()
+
+
+def _run_binary(**kwargs):
+    stream = _BinaryStream()
+    core.run(stream=stream, format=output.Format.BINARY, **{**_ARGS, **kwargs})
+    return stream.buffer.getvalue()
+
+
+def _epoch(s):
+    return to_epoch(to_datetime(s))
+
+
+def _binary_header(report, detail_level, end="2020-01-01 00:04:00"):
+    return b"CRONY\x02" + struct.pack(
+        "<BBI1sqq",
+        report,
+        detail_level.value,
+        1,
+        b"-",
+        _epoch("2020-01-01 00:00:00"),
+        _epoch(end),
+    )
+
+
+def _read_binary_jobs(data, offset):
+    """Read a binary report grouped by job, as a reader without the options it was run with would
+
+    Returns:
+        tuple: The source, the window, the jobs as tuples of (label, occurrences), and the offset
+            the report ends at
+    """
+    _, detail_level, length = struct.unpack_from("<BBI", data, offset + 6)
+    offset += 12
+    source = data[offset : offset + length].decode()
+    offset += length
+    window = struct.unpack_from("<qq", data, offset)
+    offset += 16
+
+    jobs = []
+    while data[offset]:
+        (length,) = struct.unpack_from("<I", data, offset + 1)
+        offset += 5
+        label = data[offset : offset + length].decode()
+        offset += length
+        (count,) = struct.unpack_from("<q", data, offset)
+        offset += 8
+        occurrences = None
+        if detail_level == core.DetailLevel.FULL.value:
+            occurrences = list(struct.unpack_from(f"<{count}q", data, offset))
+            offset += 8 * count
+        jobs.append((label, occurrences))
+    return (source, window, jobs, offset + 1)
+
+
+class OutputTest(unittest.TestCase):
+    @parameterized.expand(
+        [
+            param("epoch", "1970-01-01 00:00:00"),
+            param("leap day", "2020-02-29 23:59:00"),
+            param("seconds", "2021-06-30 12:34:56"),
+            param("before the epoch", "1969-12-31 23:59:00"),
+        ]
+    )
+    def test_epoch_formatter(self, _, s):
+        self.assertEqual(s, output.EpochFormatter()(_epoch(s)))
+
+    def test_epoch_formatter_across_days(self):
+        formatter = output.EpochFormatter()
+        for s in ["2020-01-01 23:59:00", "2020-01-02 00:00:00", "2020-01-01 12:00:00"]:
+            self.assertEqual(s, formatter(_epoch(s)))
+
+    def test_renderers_render_every_report(self):
+        # Any report a renderer can't render is caught when it's created, not when it's reported.
+        with self.assertRaises(TypeError):
+            output.Renderer(io.StringIO())
+
+        for format in output.Format:
+            with self.subTest(format=format):
+                output.get_renderer(_BinaryStream(), format)
+
+    def test_text_is_the_default(self):
+        self.assertEqual(
+            _run(detail_level=core.DetailLevel.FULL),
+            _run(detail_level=core.DetailLevel.FULL, format=output.Format.TEXT),
+        )
+
+    def test_text_is_written_in_bulk(self):
+        stream = io.StringIO()
+        writes = []
+        stream.write = writes.append
+        core.run(stream=stream, detail_level=core.DetailLevel.FULL, **_ARGS)
+
+        self.assertEqual(1, len(writes))
+
+    @parameterized.expand(
+        [
+            param("none", core.DetailLevel.NONE, [{"job": "even"}, {"job": "third"}]),
+            param(
+                "count",
+                core.DetailLevel.COUNT,
+                [{"job": "even", "occurrences": 3}, {"job": "third", "occurrences": 2}],
+            ),
+            param(
+                "full",
+                core.DetailLevel.FULL,
+                [
+                    {"job": "even", "occurrences": 3},
+                    {"job": "even", "time": "2020-01-01 00:00:00"},
+                    {"job": "even", "time": "2020-01-01 00:02:00"},
+                    {"job": "even", "time": "2020-01-01 00:04:00"},
+                    {"job": "third", "occurrences": 2},
+                    {"job": "third", "time": "2020-01-01 00:00:00"},
+                    {"job": "third", "time": "2020-01-01 00:03:00"},
+                ],
+            ),
+        ]
+    )
+    def test_jsonl(self, _, detail_level, expected):
+        lines = _run(detail_level=detail_level, format=output.Format.JSONL)
+        header, *records = [json.loads(line) for line in lines.splitlines()]
+
+        self.assertDictEqual(
+            {
+                "source": "-",
+                "begin": "2020-01-01 00:00:00",
+                "end": "2020-01-01 00:04:00",
+            },
+            header,
+        )
+        self.assertListEqual(expected, records)
+
+    def test_jsonl_timeline(self):
+        lines = _run(
+            detail_level=core.DetailLevel.NONE,
+            format=output.Format.JSONL,
+            exclude_header=True,
+            timeline=True,
+        )
+
+        self.assertListEqual(
+            [
+                {"time": "2020-01-01 00:00:00", "job": "even"},
+                {"time": "2020-01-01 00:00:00", "job": "third"},
+                {"time": "2020-01-01 00:02:00", "job": "even"},
+                {"time": "2020-01-01 00:03:00", "job": "third"},
+                {"time": "2020-01-01 00:04:00", "job": "even"},
+            ],
+            [json.loads(line) for line in lines.splitlines()],
+        )
+
+    @parameterized.expand(
+        [
+            param("none", core.DetailLevel.NONE, False, [["job"], ["even"], ["third"]]),
+            param(
+                "count",
+                core.DetailLevel.COUNT,
+                False,
+                [["job", "occurrences"], ["even", "3"], ["third", "2"]],
+            ),
+            param(
+                "full",
+                core.DetailLevel.FULL,
+                False,
+                [
+                    ["job", "time"],
+                    ["even", "2020-01-01 00:00:00"],
+                    ["even", "2020-01-01 00:02:00"],
+                    ["even", "2020-01-01 00:04:00"],
+                    ["third", "2020-01-01 00:00:00"],
+                    ["third", "2020-01-01 00:03:00"],
+                ],
+            ),
+            param(
+                "timeline",
+                core.DetailLevel.NONE,
+                True,
+                [
+                    ["time", "job"],
+                    ["2020-01-01 00:00:00", "even"],
+                    ["2020-01-01 00:00:00", "third"],
+                    ["2020-01-01 00:02:00", "even"],
+                    ["2020-01-01 00:03:00", "third"],
+                    ["2020-01-01 00:04:00", "even"],
+                ],
+            ),
+        ]
+    )
+    def test_csv(self, _, detail_level, timeline, expected):
+        rows = _run(
+            detail_level=detail_level, format=output.Format.CSV, timeline=timeline
+        )
+        self.assertListEqual(expected, list(csv.reader(io.StringIO(rows))))
+
+    def test_csv_quotes_labels(self):
+        rows = _run(
+            tab='* * * * * echo "a, b"',
+            detail_level=core.DetailLevel.FULL,
+            format=output.Format.CSV,
+            only_command=False,
+        )
+
+        self.assertListEqual(
+            ['* * * * * echo "a, b"', "2020-01-01 00:01:00"],
+            list(csv.reader(io.StringIO(rows)))[2],
+        )
+
+    def test_csv_quotes_labels_over_many_lines(self):
+        stream = io.StringIO()
+        renderer = output.get_renderer(
+            stream, output.Format.CSV, detail_level=core.DetailLevel.COUNT
+        )
+        job = types.SimpleNamespace(line="SHELL=/bin/sh\n17 * * * * root hourly")
+        renderer.header()
+        renderer.job(job, 24)
+        renderer.close()
+
+        self.assertListEqual(
+            [["job", "occurrences"], ["SHELL=/bin/sh\n17 * * * * root hourly", "24"]],
+            list(csv.reader(io.StringIO(stream.getvalue()))),
+        )
+
+    def test_binary(self):
+        data = _run_binary(detail_level=core.DetailLevel.FULL)
+
+        self.assertEqual(b"CRONY\x02\x00\x02", data[:8])
+        source, window, jobs, offset = _read_binary_jobs(data, 0)
+        self.assertEqual("-", source)
+        self.assertTupleEqual(
+            (_epoch("2020-01-01 00:00:00"), _epoch("2020-01-01 00:04:00")), window
+        )
+        self.assertEqual(len(data), offset)
+        self.assertListEqual(
+            [
+                (
+                    "even",
+                    [
+                        _epoch("2020-01-01 00:00:00"),
+                        _epoch("2020-01-01 00:02:00"),
+                        _epoch("2020-01-01 00:04:00"),
+                    ],
+                ),
+                (
+                    "third",
+                    [_epoch("2020-01-01 00:00:00"), _epoch("2020-01-01 00:03:00")],
+                ),
+            ],
+            jobs,
+        )
+
+    @parameterized.expand(
+        [
+            param("uncounted", core.DetailLevel.NONE, -1),
+            param("counted", core.DetailLevel.COUNT, 3),
+        ]
+    )
+    def test_binary_without_occurrences(self, _, detail_level, count):
+        data = _run_binary(detail_level=detail_level)
+        self.assertEqual(
+            _binary_header(0, detail_level)
+            + struct.pack("<BI4sq", 1, 4, b"even", count)
+            + struct.pack("<BI5sq", 1, 5, b"third", 2 if count > 0 else count)
+            + b"\x00",
+            data,
+        )
+
+    def test_binary_windows(self):
+        # Each window's report is a stream of its own, which can be told apart from the next.
+        windows = [
+            (to_datetime("2020-01-01 00:00:00"), to_datetime("2020-01-01 00:01:00")),
+            (to_datetime("2020-01-01 00:03:00"), to_datetime("2020-01-01 00:04:00")),
+        ]
+        data = _run_binary(detail_level=core.DetailLevel.FULL, windows=windows)
+
+        reports = []
+        offset = 0
+        while offset < len(data):
+            _, window, jobs, offset = _read_binary_jobs(data, offset)
+            reports.append((window, jobs))
+
+        self.assertListEqual(
+            [
+                (
+                    (_epoch("2020-01-01 00:00:00"), _epoch("2020-01-01 00:01:00")),
+                    [
+                        ("even", [_epoch("2020-01-01 00:00:00")]),
+                        ("third", [_epoch("2020-01-01 00:00:00")]),
+                    ],
+                ),
+                (
+                    (_epoch("2020-01-01 00:03:00"), _epoch("2020-01-01 00:04:00")),
+                    [
+                        ("even", [_epoch("2020-01-01 00:04:00")]),
+                        ("third", [_epoch("2020-01-01 00:03:00")]),
+                    ],
+                ),
+            ],
+            reports,
+        )
+
+    def test_binary_timeline(self):
+        data = _run_binary(detail_level=core.DetailLevel.NONE, timeline=True)
+
+        header = _binary_header(1, core.DetailLevel.NONE) + struct.pack(
+            "<II4sI5sI6s", 3, 4, b"even", 5, b"third", 6, b"rarely"
+        )
+        self.assertEqual(header, data[: len(header)])
+        self.assertEqual(struct.pack("<qI", -1, 0xFFFFFFFF), data[-12:])
+        self.assertListEqual(
+            [
+                (_epoch("2020-01-01 00:00:00"), 0),
+                (_epoch("2020-01-01 00:00:00"), 1),
+                (_epoch("2020-01-01 00:02:00"), 0),
+                (_epoch("2020-01-01 00:03:00"), 1),
+                (_epoch("2020-01-01 00:04:00"), 0),
+            ],
+            list(struct.iter_unpack("<qI", data[len(header) : -12])),
+        )
+
+    def test_histogram(self):
+        opts = {
+            "detail_level": core.DetailLevel.NONE,
+            "exclude_header": True,
+            "histogram": histogram.Bucket.MINUTE,
+            "top": 2,
+        }
+
+        self.assertListEqual(
+            [
+                "Busiest minutes:",
+                "2020-01-01 00:00:00\t2",
+                "\t1\teven",
+                "\t1\tthird",
+                "2020-01-01 00:02:00\t1",
+                "\t1\teven",
+            ],
+            _run(**opts).splitlines(),
+        )
+        self.assertListEqual(
+            [
+                {
+                    "bucket": "2020-01-01 00:00:00",
+                    "starts": 2,
+                    "jobs": [
+                        {"job": "even", "starts": 1},
+                        {"job": "third", "starts": 1},
+                    ],
+                },
+                {
+                    "bucket": "2020-01-01 00:02:00",
+                    "starts": 1,
+                    "jobs": [{"job": "even", "starts": 1}],
+                },
+            ],
+            [
+                json.loads(l)
+                for l in _run(format=output.Format.JSONL, **opts).splitlines()
+            ],
+        )
+        self.assertListEqual(
+            [
+                ["2020-01-01 00:00:00", "2", "even", "1"],
+                ["2020-01-01 00:00:00", "2", "third", "1"],
+                ["2020-01-01 00:02:00", "1", "even", "1"],
+            ],
+            list(csv.reader(io.StringIO(_run(format=output.Format.CSV, **opts)))),
+        )
+        self.assertEqual(
+            _binary_header(2, core.DetailLevel.NONE)
+            + struct.pack("<I", 2)
+            + struct.pack("<qqI", _epoch("2020-01-01 00:00:00"), 2, 2)
+            + struct.pack("<I4sq", 4, b"even", 1)
+            + struct.pack("<I5sq", 5, b"third", 1)
+            + struct.pack("<qqI", _epoch("2020-01-01 00:02:00"), 1, 1)
+            + struct.pack("<I4sq", 4, b"even", 1),
+            _run_binary(**opts),
+        )
+
+    def test_overlaps(self):
+        opts = {
+            "tab": "\n".join(
+                ["*/2 * * * * even # duration=3m", "*/3 * * * * third # duration=1m"]
+            ),
+            "detail_level": core.DetailLevel.NONE,
+            "exclude_header": True,
+            "overlaps": True,
+            "concurrency_limit": 1,
+        }
+
+        self.assertListEqual(
+            [
+                "Maximum concurrency: 2, first at 2020-01-01 00:00:00",
+                "Overlapping jobs:",
+                "\t2 overlaps, first at 2020-01-01 00:02:00",
+                "\t\teven (with itself)",
+                "\t2 overlaps, first at 2020-01-01 00:00:00",
+                "\t\teven",
+                "\t\tthird",
+                "Over the concurrency limit of 1:",
+                "\t2020-01-01 00:00:00 -> 2020-01-01 00:01:00 (2 at most)",
+                "\t2020-01-01 00:02:00 -> 2020-01-01 00:05:00 (2 at most)",
+            ],
+            _run(**opts).splitlines(),
+        )
+        self.assertDictEqual(
+            {
+                "jobs": ["even", "third"],
+                "overlaps": 2,
+                "first": "2020-01-01 00:00:00",
+            },
+            json.loads(_run(format=output.Format.JSONL, **opts).splitlines()[2]),
+        )
+        self.assertListEqual(
+            ["even", "third", "2", "2020-01-01 00:00:00"],
+            list(csv.reader(io.StringIO(_run(format=output.Format.CSV, **opts))))[1],
+        )
+
+    def test_quiet(self):
+        opts = {
+            "tab": "\n".join(["3,7 * * * * twice", "1 * * * * once"]),
+            "detail_level": core.DetailLevel.NONE,
+            "exclude_header": True,
+            "quiet": True,
+            "top": 2,
+            "end": to_datetime("2020-01-01 00:10:00"),
+        }
+
+        self.assertListEqual(
+            [
+                "Longest quiet periods:",
+                "\t2020-01-01 00:04:00 -> 2020-01-01 00:07:00 (0:03:00)",
+                "\t2020-01-01 00:08:00 -> 2020-01-01 00:10:00 (0:02:00)",
+            ],
+            _run(**opts).splitlines(),
+        )
+        self.assertListEqual(
+            [
+                {
+                    "from": "2020-01-01 00:04:00",
+                    "to": "2020-01-01 00:07:00",
+                    "seconds": 180,
+                },
+                {
+                    "from": "2020-01-01 00:08:00",
+                    "to": "2020-01-01 00:10:00",
+                    "seconds": 120,
+                },
+            ],
+            [
+                json.loads(l)
+                for l in _run(format=output.Format.JSONL, **opts).splitlines()
+            ],
+        )
+        self.assertListEqual(
+            [
+                ["from", "to", "seconds"],
+                ["2020-01-01 00:04:00", "2020-01-01 00:07:00", "180"],
+                ["2020-01-01 00:08:00", "2020-01-01 00:10:00", "120"],
+            ],
+            list(
+                csv.reader(
+                    io.StringIO(
+                        _run(
+                            format=output.Format.CSV,
+                            **{**opts, "exclude_header": False},
+                        )
+                    )
+                )
+            ),
+        )
+        self.assertEqual(
+            _binary_header(4, core.DetailLevel.NONE, end="2020-01-01 00:10:00")
+            + struct.pack(
+                "<Iqqqq",
+                2,
+                _epoch("2020-01-01 00:04:00"),
+                _epoch("2020-01-01 00:07:00"),
+                _epoch("2020-01-01 00:08:00"),
+                _epoch("2020-01-01 00:10:00"),
+            ),
+            _run_binary(**opts),
+        )
@@ -0,0 +1,200 @@
+import os
+import random
+import tempfile
+import unittest
+
+from crontab import CronTab
+from parameterized import parameterized, param
+
+from crony import analyser, overlaps
+from crony.schedule import to_epoch
+
+from tests.util import to_datetime
+
+_BEGIN = to_datetime("2020-01-01 00:00:00")
+_END = to_datetime("2020-01-01 06:00:00")
+
+
+def _jobs(lines):
+    return list(
+        analyser.get_job_occurrences(
+            CronTab(tab="\n".join(lines)), begin=_BEGIN, end=_END
+        )
+    )
+
+
+def _epoch(s):
+    return to_epoch(to_datetime(s))
+
+
+def _runs(jobs, durations):
+    return [
+        (start, start + durations[i], i)
+        for i, job in enumerate(jobs)
+        for start in job.occurrences.epochs()
+    ]
+
+
+class OverlapsTest(unittest.TestCase):
+    @parameterized.expand(
+        [
+            param("seconds", "90s", 90),
+            param("minutes", "15m", 900),
+            param("combined", "1h30m", 5400),
+            param("days", "1d", 86400),
+            param("upper case", "2H", 7200),
+        ]
+    )
+    def test_parse_duration(self, _, s, expected):
+        self.assertEqual(expected, overlaps.parse_duration(s))
+
+    @parameterized.expand(
+        [param("empty", ""), param("no unit", "15"), param("junk", "15m junk")]
+    )
+    def test_parse_invalid_duration(self, _, s):
+        with self.assertRaises(ValueError):
+            overlaps.parse_duration(s)
+
+    @parameterized.expand(
+        [
+            param("equals", "duration=15m", 900),
+            param("colon", "nightly backup, duration: 1h30m", 5400),
+            param("trailing punctuation", "duration=15m; owner=ops", 900),
+            param("none", "nightly backup", None),
+            param("invalid", "duration=soon", None),
+            param("empty", "", None),
+        ]
+    )
+    def test_duration_hint(self, _, comment, expected):
+        self.assertEqual(expected, overlaps.duration_hint(comment))
+
+    def test_load_durations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "durations")
+            with open(path, "w") as f:
+                f.write("# By command\n\n15m /usr/bin/backup.sh --all\n1h report.sh\n")
+
+            self.assertDictEqual(
+                {"/usr/bin/backup.sh --all": 900, "report.sh": 3600},
+                overlaps.load_durations(path),
+            )
+
+    def test_durations(self):
+        jobs = _jobs(
+            [
+                "0 * * * * hinted # duration=5m",
+                "0 * * * * mapped",
+                "0 * * * * hinted_and_mapped # duration=10m",
+                "0 * * * * unknown",
+            ]
+        )
+        durations = {"mapped": 60, "hinted_and_mapped": 120}
+
+        self.assertListEqual(
+            [300, 60, 600, None],
+            [overlaps._duration(job, durations, None) for job in jobs],
+        )
+        self.assertEqual(30, overlaps._duration(jobs[3], durations, 30))
+
+    def test_find(self):
+        jobs = _jobs(
+            [
+                "*/5 * * * * a # duration=12m",
+                "0 * * * * b # duration=45m",
+                "*/30 * * * * c # duration=20m",
+                "15 */2 * * * d # duration=1m",
+                "0 0 2 1 * never # duration=1m",
+                "* * * * * unknown",
+            ]
+        )
+        report = overlaps.find(jobs, limit=4)
+        durations = [720, 2700, 1200, 60]
+        runs = _runs(jobs[:4], durations)
+
+        # Compare with checking every pair of runs.
+        expected = {}
+        for x, (start, end, i) in enumerate(runs):
+            for other_start, other_end, j in runs[x + 1 :]:
+                if start < other_end and other_start < end:
+                    pair = tuple(sorted((i, j)))
+                    count, first = expected.get(pair, (0, None))
+                    later = max(start, other_start)
+                    expected[pair] = (
+                        count + 1,
+                        later if first is None else min(first, later),
+                    )
+
+        self.assertDictEqual(
+            expected,
+            {
+                (jobs.index(job), jobs.index(other)): (count, first)
+                for job, other, count, first in report.pairs
+            },
+        )
+        self.assertListEqual(
+            sorted(c for c, _ in expected.values())[::-1],
+            [count for _, _, count, _ in report.pairs],
+        )
+
+        # And with counting the runs in progress at every second.
+        running = {}
+        for start, end, _ in runs:
+            for t in range(start, end):
+                running[t] = running.get(t, 0) + 1
+        self.assertEqual(max(running.values()), report.max_concurrency)
+        self.assertEqual(
+            min(t for t, n in running.items() if n == report.max_concurrency),
+            report.max_concurrency_at,
+        )
+
+        over = sorted(t for t, n in running.items() if n > 4)
+        periods = []
+        for t in over:
+            if periods and periods[-1][1] == t:
+                periods[-1][1] = t + 1
+                periods[-1][2] = max(periods[-1][2], running[t])
+            else:
+                periods.append([t, t + 1, running[t]])
+        self.assertListEqual([tuple(p) for p in periods], report.over_limit)
+
+    def test_find_random(self):
+        rng = random.Random(0)
+        lines = [
+            f"{rng.randrange(60)} */{rng.randint(1, 3)} * * * job{i} # duration={rng.randint(1, 120)}m"
+            for i in range(15)
+        ]
+        jobs = _jobs(lines)
+        durations = [overlaps.duration_hint(job.job.comment) for job in jobs]
+        runs = _runs(jobs, durations)
+
+        count = sum(
+            1
+            for x, (start, end, _) in enumerate(runs)
+            for other_start, other_end, _ in runs[x + 1 :]
+            if start < other_end and other_start < end
+        )
+        report = overlaps.find(jobs)
+        self.assertEqual(count, sum(c for _, _, c, _ in report.pairs))
+
+    def test_find_period_continues_across_handover(self):
+        # A run ending as another starts doesn't split the period over the limit.
+        report = overlaps.find(
+            _jobs(
+                ["*/2 * * * * even # duration=3m", "*/3 * * * * third # duration=1m"]
+            ),
+            limit=1,
+        )
+        self.assertListEqual(
+            [
+                (_epoch("2020-01-01 00:00:00"), _epoch("2020-01-01 00:01:00"), 2),
+                (_epoch("2020-01-01 00:02:00"), _epoch("2020-01-01 00:05:00"), 2),
+            ],
+            report.over_limit[:2],
+        )
+
+    def test_find_nothing(self):
+        report = overlaps.find(_jobs(["* * * * * unknown"]), limit=1)
+        self.assertEqual(0, report.max_concurrency)
+        self.assertIsNone(report.max_concurrency_at)
+        self.assertListEqual([], report.pairs)
+        self.assertListEqual([], report.over_limit)
@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import pstats
+import tempfile
+import unittest
+
+from parameterized import parameterized, param
+
+from crony import cli, core, profiling
+from tests.util import write_temp_crontab, to_datetime
+
+_SIMPLE_FILEPATH = write_temp_crontab(["* * * * * woof", "@hourly hourly"])
+
+_SIMPLE_ARGS = {
+    "file": _SIMPLE_FILEPATH,
+    "begin": to_datetime("2020-01-01 00:00:00"),
+    "end": to_datetime("2020-01-01 02:00:00"),
+    "include_disabled": False,
+    "exclude_header": False,
+    "only_command": False,
+}
+
+
+class ProfilingTest(unittest.TestCase):
+    @parameterized.expand(
+        [
+            param("none", core.DetailLevel.NONE, [None, None]),
+            param("count", core.DetailLevel.COUNT, [121, 3]),
+            param("full", core.DetailLevel.FULL, [121, 3]),
+            param("timeline", core.DetailLevel.NONE, [121, 3], timeline=True),
+        ]
+    )
+    def test_report(self, _, detail_level, expected_occurrences, timeline=False):
+        profiler = profiling.Profiler()
+        profiler.start()
+        core.run(
+            stream=io.StringIO(),
+            profiler=profiler,
+            detail_level=detail_level,
+            timeline=timeline,
+            **_SIMPLE_ARGS,
+        )
+        profiler.stop()
+
+        report = profiler.report()
+        self.assertListEqual(["parse", "expand", "output"], list(report["phases"]))
+        self.assertGreater(report["peak_memory_bytes"], 0)
+
+        # Slowest first
+        seconds = [job["seconds"] for job in report["jobs"]]
+        self.assertListEqual(sorted(seconds, reverse=True), seconds)
+
+        occurrences = {job["job"]: job["occurrences"] for job in report["jobs"]}
+        self.assertDictEqual(
+            dict(zip(["* * * * * woof", "@hourly hourly"], expected_occurrences)),
+            occurrences,
+        )
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = os.path.join(directory, "profile.json")
+            stats_path = os.path.join(directory, "profile.pstats")
+
+            cli.main(
+                [
+                    f"--file={_SIMPLE_FILEPATH}",
+                    "--begin=2020-01-01 00:00:00",
+                    "--end=2020-01-01 02:00:00",
+                    "--dd",
+                    f"--profile-json={json_path}",
+                    f"--profile-stats={stats_path}",
+                ]
+            )
+
+            with open(json_path) as f:
+                report = json.load(f)
+            self.assertListEqual(
+                ["args", "parse", "expand", "output"], list(report["phases"])
+            )
+            self.assertEqual(2, len(report["jobs"]))
+
+            # The stats can be loaded by pstats
+            pstats.Stats(stats_path)
+
+    def test_text_report(self):
+        profiler = profiling.Profiler()
+        profiler.record("args", 0.001)
+        stream = io.StringIO()
+        profiler.write(stream=stream)
+
+        self.assertIn("args", stream.getvalue())
+        self.assertIn("Slowest jobs (0 of 0):", stream.getvalue())
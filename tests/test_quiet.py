@@ -0,0 +1,126 @@
+import random
+import re
+import unittest
+
+from parameterized import parameterized
+
+from crony import analyser, quiet
+from crony.schedule import to_epoch
+
+from tests.util import USE_NUMPY, get_jobs, to_datetime
+
+_LINES = [
+    "*/20 * * * * often",
+    "0 3 * * * nightly",
+    "*/20 * * * * also_often",
+    "45 9-17 * * 1-5 office",
+    "30 2 * * 0 weekly",
+]
+
+_BEGIN = to_datetime("2020-01-01 00:00:00")
+_END = to_datetime("2020-01-14 23:59:00")
+
+
+def _jobs(lines=_LINES, begin=_BEGIN, end=_END):
+    return get_jobs(lines, begin, end)
+
+
+def _expected(jobs, begin, end):
+    # Walk every minute of the period the slow way.
+    busy = {epoch for job in jobs for epoch in job.occurrences.epochs()}
+    gaps = []
+    for minute in range(to_epoch(begin) // 60 * 60, to_epoch(end) + 1, 60):
+        if minute in busy:
+            continue
+        from_, to = (max(minute, to_epoch(begin)), min(minute + 60, to_epoch(end)))
+        if gaps and gaps[-1][1] == minute:
+            gaps[-1] = (gaps[-1][0], to)
+        elif to > from_:
+            gaps.append((from_, to))
+    return sorted(gaps, key=lambda gap: (gap[0] - gap[1], gap[0]))
+
+
+class QuietTest(unittest.TestCase):
+    @parameterized.expand(USE_NUMPY)
+    def test_gaps(self, _, use_numpy):
+        bitmap = quiet.Bitmap(_BEGIN, _END, use_numpy=use_numpy)
+        for job in _jobs():
+            bitmap.add(job.occurrences.epochs())
+
+        # Two weeks is just over 20,000 minutes, a bit each.
+        self.assertEqual(2520, len(bitmap.bits))
+        self.assertListEqual(
+            _expected(_jobs(), _BEGIN, _END), bitmap.gaps(len(bitmap.bits) * 8)
+        )
+
+    @parameterized.expand(USE_NUMPY)
+    def test_random_crontabs(self, _, use_numpy):
+        rng = random.Random(0)
+        fields = ["*", "*/7", "1-4", "2,5", "1-6/2", "3", "5-6", "0,30"]
+        for _ in range(20):
+            lines = [
+                " ".join(rng.choice(fields) for _ in range(5)) + f" job_{i}"
+                for i in range(rng.randrange(1, 5))
+            ]
+            begin = to_datetime("2020-01-01 00:00:00").replace(
+                minute=rng.randrange(60), second=rng.randrange(60)
+            )
+            end = to_datetime("2020-01-08 00:00:00").replace(
+                minute=rng.randrange(60), second=rng.randrange(60)
+            )
+            with self.subTest(lines=lines, begin=begin, end=end):
+                jobs = _jobs(lines, begin, end)
+                bitmap = quiet.Bitmap(begin, end, use_numpy=use_numpy)
+                for job in jobs:
+                    bitmap.add(job.occurrences.epochs())
+
+                self.assertListEqual(_expected(jobs, begin, end)[:5], bitmap.gaps(5))
+
+    @parameterized.expand(USE_NUMPY)
+    def test_top(self, _, use_numpy):
+        bitmap = quiet.Bitmap(_BEGIN, _END, use_numpy=use_numpy)
+        bitmap.add([to_epoch(_BEGIN) + 60 * m for m in (5, 15, 30)])
+
+        # The longest first, then the earliest, and never one shorter than the minimum.
+        start = to_epoch(_BEGIN)
+        self.assertListEqual(
+            [(start + 31 * 60, to_epoch(_END)), (start + 16 * 60, start + 30 * 60)],
+            bitmap.gaps(2),
+        )
+        self.assertListEqual(
+            [
+                (start + 31 * 60, to_epoch(_END)),
+                (start + 16 * 60, start + 30 * 60),
+                (start + 6 * 60, start + 15 * 60),
+            ],
+            bitmap.gaps(10, min_length=6 * 60),
+        )
+        self.assertListEqual([], bitmap.gaps(0))
+
+    @parameterized.expand(USE_NUMPY)
+    def test_nothing_quiet(self, _, use_numpy):
+        bitmap = quiet.Bitmap(_BEGIN, _BEGIN, use_numpy=use_numpy)
+        bitmap.add([to_epoch(_BEGIN)])
+        self.assertListEqual([], bitmap.gaps(10))
+
+    def test_find(self):
+        gaps = quiet.find(_jobs(), _BEGIN, _END, top=3, min_length=60)
+        self.assertListEqual(_expected(_jobs(), _BEGIN, _END)[:3], gaps)
+
+    def test_find_matching(self):
+        matched = [job for job in _jobs() if job.command in ("nightly", "weekly")]
+        gaps = quiet.find(
+            _jobs(), _BEGIN, _END, top=3, match=re.compile(r"nightly|weekly")
+        )
+        self.assertListEqual(_expected(matched, _BEGIN, _END)[:3], gaps)
+
+    def test_find_lets_go_of_occurrences(self):
+        jobs = _jobs()
+        quiet.find(jobs, _BEGIN, _END)
+
+        for job in jobs:
+            self.assertIsNone(job.occurrences._expansion._epochs)
+        self.assertEqual(
+            analyser._MAX_SHARED_OCCURRENCES,
+            jobs[0].occurrences._expansion.budget.remaining,
+        )
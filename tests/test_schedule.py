@@ -0,0 +1,271 @@
+from datetime import datetime, timedelta
+import random
+import unittest
+
+from croniter import croniter
+from parameterized import parameterized, param
+
+from tests.util import to_datetime
+from crony.schedule import (
+    Schedule,
+    can_run_within,
+    expression_masks,
+    from_epoch,
+    to_epoch,
+    window_masks,
+)
+
+
+def _croniter_between(expression, begin, end):
+    schedule = croniter(expression, begin, ret_type=datetime)
+    occurrences = []
+    while True:
+        occurrence = schedule.get_next()
+        if occurrence > end:
+            return occurrences
+        occurrences.append(occurrence)
+
+
+class ScheduleTest(unittest.TestCase):
+    @parameterized.expand(
+        [
+            param("every minute", "* * * * *"),
+            param("hourly", "0 * * * *"),
+            param("steps", "*/7 */5 * * *"),
+            param("lists and ranges", "1,2,30-35 3-4 * * *"),
+            param("day of month", "15 10 1,15,31 * *"),
+            param("day of week", "0 12 * * 1-5"),
+            param("sunday as 7", "0 12 * * 7"),
+            param("day of month or week", "0 0 13 * 5"),
+            param("day of month step or week", "30 6 */10 * 0"),
+            param("sparse months", "0 0 29 2 *"),
+            param("named", "0 9 * jan,jul mon"),
+        ]
+    )
+    def test_matches_croniter(self, _, expression):
+        # Cover a leap year and month/year boundaries
+        begin = to_datetime("2019-12-30 23:17:41")
+        end = to_datetime("2020-03-02 05:00:00")
+
+        compiled = Schedule.compile(expression)
+        self.assertIsNotNone(compiled)
+
+        expected = _croniter_between(expression, begin, end)
+        self.assertListEqual(expected, list(compiled.between(begin, end)))
+        self.assertEqual(len(expected), compiled.count(begin, end))
+        self.assertEqual(
+            to_epoch(expected[0]) if expected else None, compiled.first(begin, end)
+        )
+
+    @parameterized.expand(
+        [
+            param("last day of month", "0 0 L * *"),
+            param("nth weekday of month", "0 0 * * 5#2"),
+            param("nonsense", "not a schedule"),
+        ]
+    )
+    def test_uncompilable(self, _, expression):
+        self.assertIsNone(Schedule.compile(expression))
+
+    def test_begin_is_exclusive(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = begin + timedelta(minutes=2)
+
+        self.assertListEqual(
+            [begin + timedelta(minutes=1), end],
+            list(Schedule.compile("* * * * *").between(begin, end)),
+        )
+
+    def test_impossible_day(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = to_datetime("2030-01-01 00:00:00")
+
+        self.assertListEqual(
+            [], list(Schedule.compile("0 0 31 2 *").between(begin, end))
+        )
+
+    def test_reversed_epochs(self):
+        begin = to_datetime("2019-12-30 23:17:41")
+        end = to_datetime("2020-03-02 05:00:00")
+
+        for expression in ["*/7 */5 * * *", "0 0 13 * 5", "0 0 29 2 *", "0 0 31 2 *"]:
+            with self.subTest(expression=expression):
+                compiled = Schedule.compile(expression)
+                self.assertListEqual(
+                    list(compiled.epochs(begin, end))[::-1],
+                    list(compiled.reversed_epochs(begin, end)),
+                )
+
+    def test_reversed_end_is_inclusive(self):
+        begin = to_datetime("2020-01-01 00:00:00")
+        end = begin + timedelta(minutes=2, seconds=30)
+
+        self.assertListEqual(
+            [to_epoch(begin + timedelta(minutes=m)) for m in (2, 1)],
+            list(Schedule.compile("* * * * *").reversed_epochs(begin, end)),
+        )
+
+    @parameterized.expand(
+        [
+            param("same day", "2020-01-01 00:00:30", "2020-01-01 00:10:00", 10),
+            param("same minute", "2020-01-01 00:00:10", "2020-01-01 00:00:50", 0),
+            param("end before begin", "2020-01-01 00:10:00", "2020-01-01 00:00:00", 0),
+            param("next day", "2020-01-01 23:59:00", "2020-01-02 00:00:59", 1),
+            param("ten years", "2020-01-01 00:00:00", "2030-01-01 00:00:00", 5260320),
+        ]
+    )
+    def test_count(self, _, begin, end, expected):
+        self.assertEqual(
+            expected,
+            Schedule.compile("* * * * *").count(to_datetime(begin), to_datetime(end)),
+        )
+
+    @parameterized.expand(
+        [
+            param("epoch", "1970-01-01 00:00:00", 0),
+            param("leap day", "2020-02-29 12:34:56", 1582979696),
+            param("before the epoch", "1969-12-31 23:59:00", -60),
+        ]
+    )
+    def test_epoch(self, _, dt, expected):
+        self.assertEqual(expected, to_epoch(to_datetime(dt)))
+        self.assertEqual(to_datetime(dt), from_epoch(expected))
+
+    @parameterized.expand(
+        [
+            param("every minute", "* * * * *"),
+            param("steps", "*/7 */5 * * *"),
+            param("lists and ranges", "1,2,30-35 3-4 * * *"),
+            param("stepped range", "10-50/20 9-17/4 * * *"),
+            param("day of month or week", "0 0 13 * 5"),
+            param("sunday as 7", "0 12 * * 5-7"),
+        ]
+    )
+    def test_expression_masks(self, _, expression):
+        self.assertEqual(
+            Schedule.compile(expression).to_masks(), expression_masks(expression)
+        )
+
+    @parameterized.expand(
+        [
+            param("named", "0 9 * jan,jul mon"),
+            param("last day of month", "0 0 L * *"),
+            param("single value range", "0 5-5 * * *"),
+            param("step from a value", "5/10 * * * *"),
+            param("out of range", "60 * * * *"),
+            param("macro", "@hourly"),
+        ]
+    )
+    def test_expression_masks_left_to_compiling(self, _, expression):
+        self.assertIsNone(expression_masks(expression))
+
+    @parameterized.expand(
+        [
+            param(
+                "in the hour",
+                "30 10 * * *",
+                "2020-06-10 10:00:00",
+                "2020-06-10 11:00:00",
+                True,
+            ),
+            param(
+                "another hour",
+                "30 3 * * *",
+                "2020-06-10 10:00:00",
+                "2020-06-10 11:00:00",
+                False,
+            ),
+            param(
+                "another minute",
+                "45 * * * *",
+                "2020-06-10 10:00:00",
+                "2020-06-10 10:30:00",
+                False,
+            ),
+            param(
+                "before the period",
+                "59 9 * * *",
+                "2020-06-10 10:00:00",
+                "2020-06-10 10:30:00",
+                False,
+            ),
+            param(
+                "across midnight",
+                "15 0 * * *",
+                "2020-06-10 23:00:00",
+                "2020-06-11 01:00:00",
+                True,
+            ),
+            param(
+                "another month",
+                "0 * * 7 *",
+                "2020-06-10 00:00:00",
+                "2020-06-20 00:00:00",
+                False,
+            ),
+            param(
+                "day of month or week",
+                "0 * 13 * 3",
+                "2020-06-10 00:00:00",
+                "2020-06-11 00:00:00",
+                True,
+            ),
+            param(
+                "day of month and week",
+                "0 * * * 4",
+                "2020-06-10 00:00:00",
+                "2020-06-10 23:59:00",
+                False,
+            ),
+            param(
+                "a year",
+                "0 0 29 2 *",
+                "2020-06-10 00:00:00",
+                "2021-06-10 00:00:00",
+                True,
+            ),
+            param(
+                "nothing",
+                "* * * * *",
+                "2020-06-10 00:00:10",
+                "2020-06-10 00:00:50",
+                False,
+            ),
+        ]
+    )
+    def test_can_run_within(self, _, expression, begin, end, expected):
+        begin, end = (to_datetime(begin) - timedelta(seconds=1), to_datetime(end))
+        window = window_masks(begin, end)
+
+        self.assertEqual(expected, Schedule.compile(expression).can_run_within(window))
+        self.assertEqual(expected, can_run_within(expression_masks(expression), window))
+
+    def test_can_run_within_never_rules_out_occurrences(self):
+        rng = random.Random(0)
+        fields = [
+            "*",
+            "*/3",
+            "1-4",
+            "2,5,9",
+            "0-6/2",
+            "7",
+            "3-20",
+        ]
+        lengths = [0, 1, 59, 60, 61, 1439, 1440, 3000, 50000]
+
+        for _ in range(500):
+            expression = " ".join(rng.choice(fields) for _ in range(5))
+            begin = to_datetime("2020-01-01 00:00:00") + timedelta(
+                seconds=rng.randrange(400 * 24 * 60 * 60)
+            )
+            end = begin + timedelta(minutes=rng.choice(lengths))
+            schedule = Schedule.compile(expression)
+            if not schedule:
+                continue
+
+            with self.subTest(expression=expression, begin=begin, end=end):
+                window = window_masks(begin, end)
+                if not can_run_within(expression_masks(expression), window):
+                    self.assertEqual(0, schedule.count(begin, end))
+                if not schedule.can_run_within(window):
+                    self.assertEqual(0, schedule.count(begin, end))
@@ -0,0 +1,205 @@
+import asyncio
+import io
+import os
+import stat
+import tempfile
+import unittest
+
+from parameterized import parameterized, param
+
+from crony import args, core, output, serve
+from tests.util import write_temp_crontab
+
+_PATH = write_temp_crontab(["*/5 * * * * woof", "0 * * * * bark # duration=10m"])
+
+_QUERY = "begin=2020-01-01+00:00:00&end=2020-01-01+01:00:00"
+
+
+def _run(**kwargs):
+    stream = io.StringIO()
+    core.run(
+        stream=stream,
+        **{
+            **args.parse_query(["-b2020-01-01 00:00:00", "-e2020-01-01 01:00:00"]),
+            **kwargs,
+        },
+    )
+    return stream.getvalue().encode()
+
+
+class ServeTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.socket = os.path.join(self._dir.name, "crony.sock")
+
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.server = serve.Server()
+        listening = self.loop.run_until_complete(
+            serve.start(self.server, socket=self.socket)
+        )
+        self.addCleanup(lambda: self.loop.run_until_complete(listening.wait_closed()))
+        self.addCleanup(listening.close)
+
+    def _request(self, target, body=None):
+        async def request():
+            reader, writer = await asyncio.open_unix_connection(self.socket)
+            method = "POST" if body is not None else "GET"
+            writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\n".encode())
+            if body is not None:
+                writer.write(f"Content-Length: {len(body)}\r\n".encode())
+            writer.write(b"\r\n" + (body or b""))
+            response = await reader.read()
+            writer.close()
+            return response
+
+        head, _, content = self.loop.run_until_complete(request()).partition(
+            b"\r\n\r\n"
+        )
+        status_line, *headers = head.decode().split("\r\n")
+        return (
+            int(status_line.split()[1]),
+            dict(header.split(": ", 1) for header in headers),
+            content,
+        )
+
+    @parameterized.expand(
+        [
+            param("empty", "", []),
+            param("option", "file=/etc/crontab", ["--file=/etc/crontab"]),
+            param("flag", "dd", ["--dd"]),
+            param(
+                "many",
+                "file=a&file=b&begin=2020-01-01+00:00:00&exclude-header",
+                [
+                    "--file=a",
+                    "--file=b",
+                    "--begin=2020-01-01 00:00:00",
+                    "--exclude-header",
+                ],
+            ),
+        ]
+    )
+    def test_to_args(self, _, query, expected):
+        self.assertListEqual(expected, serve.to_args(query))
+
+    @parameterized.expand(
+        [
+            param("names", "", {}),
+            param("counts", "&d", {"detail_level": core.DetailLevel.COUNT}),
+            param("timeline", "&timeline", {"timeline": True}),
+            param("overlaps", "&overlaps", {"overlaps": True}),
+        ]
+    )
+    def test_file(self, _, query, kwargs):
+        status, headers, content = self._request(f"/?file={_PATH}&{_QUERY}{query}")
+
+        self.assertEqual(200, status)
+        self.assertEqual("text/plain; charset=utf-8", headers["Content-Type"])
+        self.assertEqual(_run(file=_PATH, **kwargs), content)
+
+    def test_file_is_kept_parsed(self):
+        self._request(f"/?file={_PATH}&{_QUERY}")
+        (jobs,) = [jobs for _, _, jobs in self.server.resident._files.values()]
+
+        self._request(f"/?file={_PATH}&{_QUERY}")
+        self.assertIs(jobs, self.server.resident.file(_PATH, None))
+
+    def test_posted_tab(self):
+        status, _, content = self._request(
+            f"/?{_QUERY}&format=jsonl", b"*/30 * * * * woof"
+        )
+
+        self.assertEqual(200, status)
+        self.assertEqual(
+            _run(tab="*/30 * * * * woof", format=output.Format.JSONL),
+            content,
+        )
+
+    def test_concurrent_clients(self):
+        async def requests():
+            return await asyncio.gather(
+                *(
+                    self.loop.run_in_executor(
+                        None,
+                        serve.answer,
+                        self.server.resident,
+                        f"file={_PATH}&{_QUERY}&dd",
+                    )
+                    for _ in range(8)
+                )
+            )
+
+        reports = self.loop.run_until_complete(requests())
+        self.assertEqual(1, len(set(reports)))
+
+    @parameterized.expand(
+        [
+            param("invalid option", "/?bogus", 400, "unrecognized arguments: --bogus"),
+            param("invalid datetime", "/?begin=never", 400, "Invalid datetime"),
+            param("watch", "/?watch", 400, "--watch can't be used"),
+            param("missing file", "/?file=/missing", 404, "No crontabs found"),
+            param("elsewhere", "/elsewhere", 404, "There's nothing at /elsewhere"),
+        ]
+    )
+    def test_errors(self, _, target, expected_status, expected_message):
+        status, _, content = self._request(target)
+
+        self.assertEqual(expected_status, status)
+        self.assertIn(expected_message, content.decode())
+
+    def test_malformed_request(self):
+        async def request():
+            reader, writer = await asyncio.open_unix_connection(self.socket)
+            writer.write(b"nonsense\r\n\r\n")
+            response = await reader.read()
+            writer.close()
+            return response
+
+        self.assertTrue(
+            self.loop.run_until_complete(request()).startswith(
+                b"HTTP/1.1 400 Bad Request"
+            )
+        )
+
+    def test_socket_is_only_for_this_user(self):
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.socket).st_mode))
+
+    def test_socket_left_behind_is_replaced(self):
+        listening = self.loop.run_until_complete(
+            serve.start(self.server, socket=self.socket)
+        )
+        listening.close()
+        self.loop.run_until_complete(listening.wait_closed())
+
+        self.assertTrue(stat.S_ISSOCK(os.lstat(self.socket).st_mode))
+
+    def test_anything_else_is_left_alone(self):
+        path = os.path.join(self._dir.name, "precious")
+        with open(path, "w") as f:
+            f.write("keep me")
+
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(serve.start(self.server, socket=path))
+        with open(path) as f:
+            self.assertEqual("keep me", f.read())
+
+    @parameterized.expand(
+        [
+            param("any address", "0.0.0.0", False),
+            param("public address", "192.0.2.1", False),
+            param("hostname", "example.com", False),
+            param("ipv4 loopback", "127.0.0.1", True),
+            param("ipv6 loopback", "::1", True),
+            param("localhost", "localhost", True),
+        ]
+    )
+    def test_is_loopback(self, _, host, expected):
+        self.assertEqual(expected, serve.is_loopback(host))
+
+    def test_only_loopback_is_listened_on(self):
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(
+                serve.start(self.server, host="0.0.0.0", port=0)
+            )
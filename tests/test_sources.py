@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from crony import sources
+
+
+class SourcesTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.root = self._dir.name
+        for name in ["b", "a", ".hidden", "sub/c"]:
+            path = os.path.join(self.root, "hosts", name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("* * * * * woof")
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _path(self, *parts):
+        return os.path.join(self.root, "hosts", *parts)
+
+    def test_file(self):
+        self.assertListEqual([self._path("b")], sources.expand([self._path("b")]))
+
+    def test_directory(self):
+        # Hidden files and subdirectories are skipped, and the rest are sorted.
+        self.assertListEqual(
+            [self._path("a"), self._path("b")], sources.expand([self._path()])
+        )
+
+    def test_glob(self):
+        self.assertListEqual(
+            [self._path("a"), self._path("b"), self._path("sub", "c")],
+            sources.expand([self._path("**", "[a-z]")]),
+        )
+
+    def test_order_is_kept_without_duplicates(self):
+        self.assertListEqual(
+            [self._path("b"), self._path("sub", "c"), self._path("a")],
+            sources.expand(
+                [self._path("b"), self._path("sub"), self._path(), self._path("b")]
+            ),
+        )
+
+    def test_nothing_found(self):
+        os.makedirs(self._path("empty"))
+        os.makedirs(self._path("only_hidden"))
+        with open(self._path("only_hidden", ".woof"), "w") as f:
+            f.write("* * * * * woof")
+
+        for pattern in [
+            self._path("missing"),
+            self._path("missing*"),
+            self._path("empty"),
+            self._path("only_hidden"),
+            self._path("empty*"),
+        ]:
+            with self.subTest(pattern=pattern):
+                with self.assertRaises(FileNotFoundError):
+                    sources.expand([pattern])
+
+
+class DiscoverTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.root = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _write(self, *parts):
+        path = os.path.join(self.root, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write("* * * * * root woof")
+        return path
+
+    def test_discover(self):
+        system = self._write("etc", "crontab")
+        cron_d = [self._write("etc", "cron.d", name) for name in ["php", "backup"]]
+        self._write("etc", "cron.d", ".placeholder")
+        debian = self._write("var", "spool", "cron", "crontabs", "alice")
+        red_hat = self._write("var", "spool", "cron", "bob")
+
+        self.assertListEqual(
+            [
+                (system, None),
+                (cron_d[1], None),
+                (cron_d[0], None),
+                (debian, "alice"),
+                (red_hat, "bob"),
+            ],
+            sources.discover(self.root),
+        )
+
+    def test_discover_nothing(self):
+        self.assertListEqual([], sources.discover(self.root))
@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from parameterized import parameterized, param
+
+# crony is run from monitoring scripts thousands of times a day, so its startup time matters.
+# dateparser alone takes a few hundred milliseconds to import, so this catches it (or another
+# heavy import) creeping back in.
+_IMPORT_BUDGET_MICROSECONDS = 50000
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _python(*args, env=None):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=_ROOT,
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+
+
+def _imported_modules(code):
+    result = _python("-c", f"{code}\nimport sys\nprint(' '.join(sys.modules))")
+    return result.stdout.split()
+
+
+class StartupTest(unittest.TestCase):
+    def test_import_time(self):
+        # Installed, crony's bytecode is compiled ahead of time, so it's measured compiled -
+        # rather than measuring the compiler, where writing bytecode is turned off.
+        prefix = tempfile.TemporaryDirectory()
+        self.addCleanup(prefix.cleanup)
+        env = {**os.environ, "PYTHONPYCACHEPREFIX": prefix.name}
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        _python("-c", "import crony.cli", env=env)
+
+        def measure():
+            # Each line of -X importtime output is: 'import time: self | cumulative | name'
+            result = _python("-X", "importtime", "-c", "import crony.cli", env=env)
+            for line in result.stderr.splitlines():
+                _, cumulative, name = line.split("|")
+                if name.strip() == "crony.cli":
+                    return int(cumulative)
+            self.fail("crony.cli wasn't imported")
+
+        # Take the best of a few attempts to smooth out noise from the machine.
+        self.assertLess(min(measure() for _ in range(3)), _IMPORT_BUDGET_MICROSECONDS)
+
+    @parameterized.expand(
+        [
+            param("import", "import crony.cli"),
+            param(
+                "preferred format",
+                "import crony.args; crony.args._valid_datetime('2020-01-01 00:00:00')",
+            ),
+            param(
+                "timestamp",
+                "import crony.args; crony.args._valid_datetime('1577836800')",
+            ),
+        ]
+    )
+    def test_no_heavy_imports(self, _, code):
+        modules = _imported_modules(code)
+        for heavy in ["dateparser", "crontab", "croniter"]:
+            self.assertNotIn(heavy, modules)
+
+    def test_dateparser_fallback(self):
+        modules = _imported_modules(
+            "import crony.args; crony.args._valid_datetime('3 days ago')"
+        )
+        self.assertIn("dateparser", modules)
@@ -0,0 +1,248 @@
+import io
+import os
+import random
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from crontab import CronTab
+from parameterized import parameterized, param
+
+from crony import analyser, cache, core, schedule, watch
+from tests.util import to_datetime
+
+_LINES = [
+    "MAILTO=ops@example.com",
+    "# Nightly",
+    "0 2 * * * backup",
+    "*/15 * * * * poll # duration=5m",
+    "",
+    "#0 * * * * disabled",
+    "# A note",
+    "",
+    "@hourly report",
+    "not a job",
+]
+
+_ARGS = {
+    "begin": to_datetime("2020-01-01 00:00:00"),
+    "end": to_datetime("2020-01-01 03:00:00"),
+    "include_disabled": False,
+    "exclude_header": False,
+    "only_command": False,
+    "detail_level": core.DetailLevel.COUNT,
+}
+
+
+def _records(content):
+    return cache.to_records(CronTab(tab=content))
+
+
+def _parsed_records(parser, content):
+    return [
+        (
+            job.command,
+            job.render(),
+            job.is_enabled(),
+            job.expression,
+            job.compiled.to_masks() if job.compiled else None,
+            job.comment,
+        )
+        for job in parser.parse(content)
+    ]
+
+
+class IncrementalParserTest(unittest.TestCase):
+    def test_matches_parsing_everything(self):
+        content = "\n".join(_LINES)
+        parser = watch.IncrementalParser()
+
+        self.assertListEqual(_records(content), _parsed_records(parser, content))
+        # Blank lines are only parsed once.
+        self.assertEqual(len(set(_LINES)), parser.parsed)
+
+    def test_random_edits_match_parsing_everything(self):
+        rng = random.Random(0)
+        choices = _LINES + [
+            "# duration=1h",
+            "30 4 * * 1 weekly",
+            "#",
+            "MAILTO=dev@example.com",
+            'SHELL="/bin/bash"',
+        ]
+        lines = list(_LINES)
+        parser = watch.IncrementalParser()
+
+        for _ in range(200):
+            i = rng.randrange(len(lines) + 1)
+            edit = rng.choice(["insert", "delete", "replace"])
+            if edit == "insert" or not lines:
+                lines.insert(i, rng.choice(choices))
+            elif edit == "delete":
+                del lines[min(i, len(lines) - 1)]
+            else:
+                lines[min(i, len(lines) - 1)] = rng.choice(choices)
+
+            content = "\n".join(lines)
+            with self.subTest(content=content):
+                self.assertListEqual(
+                    _records(content), _parsed_records(parser, content)
+                )
+
+    @parameterized.expand(
+        [
+            param("unchanged", lambda lines: lines, 0),
+            param(
+                "command changed",
+                lambda lines: lines[:2] + ["0 2 * * * backup --all"] + lines[3:],
+                1,
+            ),
+            # The job below a comment takes it as its comment, so it's parsed again too.
+            param(
+                "comment changed", lambda lines: lines[:1] + ["# Weekly"] + lines[2:], 2
+            ),
+            # Only the first job sets it, and the rest don't render it.
+            param(
+                "variable changed",
+                lambda lines: ["MAILTO=dev@example.com"] + lines[1:],
+                2,
+            ),
+            param(
+                "variable set later",
+                lambda lines: lines[:3] + ["MAILTO=dev@example.com"] + lines[3:],
+                2,
+            ),
+            param("line added", lambda lines: lines + ["* * * * * new"], 1),
+            param("line removed", lambda lines: lines[:-1], 0),
+        ]
+    )
+    def test_only_changed_lines_are_parsed(self, _, edit, expected):
+        parser = watch.IncrementalParser()
+        parser.parse("\n".join(_LINES))
+        parser.parse("\n".join(edit(list(_LINES))))
+
+        self.assertEqual(expected, parser.parsed)
+
+
+class RetainedTest(unittest.TestCase):
+    def _analyse(self, lines, retained, begin=_ARGS["begin"]):
+        jobs = list(
+            analyser.get_job_occurrences(
+                CronTab(tab="\n".join(lines)),
+                begin=begin,
+                end=_ARGS["end"],
+                retained=retained,
+            )
+        )
+        return {job.command: list(job.occurrences.epochs()) for job in jobs}
+
+    def test_only_new_schedules_are_expanded(self):
+        retained = analyser.Retained()
+        first = self._analyse(["*/15 * * * * a", "0 * * * * b"], retained)
+
+        with mock.patch.object(
+            schedule.Schedule,
+            "epochs",
+            autospec=True,
+            side_effect=schedule.Schedule.epochs,
+        ) as epochs:
+            second = self._analyse(
+                ["*/15 * * * * a", "0 * * * * renamed", "30 * * * * c"], retained
+            )
+
+        # Only '30 * * * *' is new.
+        self.assertEqual(1, epochs.call_count)
+        self.assertEqual(first["a"], second["a"])
+        self.assertEqual(first["b"], second["renamed"])
+        self.assertEqual(3, len(second["c"]))
+        self.assertEqual(3, len(retained.expansions))
+
+    def test_changed_period_expands_again(self):
+        retained = analyser.Retained()
+        self._analyse(["0 * * * * a"], retained)
+        occurrences = self._analyse(
+            ["0 * * * * a"], retained, begin=to_datetime("2020-01-01 01:30:00")
+        )
+
+        self.assertEqual(2, len(occurrences["a"]))
+
+    def test_budget_is_released(self):
+        retained = analyser.Retained()
+        remaining = retained.budget.remaining
+        self._analyse(["* * * * * a"], retained)
+        self.assertEqual(remaining - 181, retained.budget.remaining)
+
+        self._analyse(["0 * * * * b"], retained)
+        self.assertEqual(remaining - 4, retained.budget.remaining)
+
+
+class WatchTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.path = os.path.join(self._dir.name, "crontab")
+        self._write(["0 * * * * hourly"])
+
+    def _write(self, lines):
+        # Replace the file, as editors often do.
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write("\n".join(lines))
+        os.replace(temp_path, self.path)
+
+    def _run(self, **kwargs):
+        stream = io.StringIO()
+        core.run(stream=stream, **{**_ARGS, **kwargs})
+        return stream.getvalue()
+
+    def test_reports_again_on_each_change(self):
+        before = self._run(files=[self.path])
+
+        def changes():
+            yield
+            # Touched, but unchanged.
+            os.utime(self.path)
+            yield
+            self._write(["0 * * * * hourly", "*/30 * * * * half-hourly"])
+            yield
+
+        reports = self._run(files=[self.path], watch=True, changes=changes())
+
+        self.assertEqual(before + self._run(files=[self.path]), reports)
+
+    def test_needs_a_single_file(self):
+        with self.assertRaises(ValueError):
+            self._run(tab="* * * * * woof", watch=True)
+        other = os.path.join(self._dir.name, "other")
+        open(other, "w").close()
+        with self.assertRaises(ValueError):
+            self._run(files=[self.path, other], watch=True)
+
+    def _assert_notified(self, changes):
+        notified = threading.Event()
+
+        def wait():
+            next(changes)
+            notified.set()
+
+        thread = threading.Thread(target=wait, daemon=True)
+        thread.start()
+        self._write(["* * * * * changed"])
+        self.assertTrue(notified.wait(5))
+
+    def test_inotify(self):
+        try:
+            inotify = watch._Inotify(self._dir.name)
+        except OSError:  # pragma: no cover
+            self.skipTest("inotify isn't available")
+
+        self._assert_notified(watch._notify(inotify, "crontab"))
+
+    def test_polling(self):
+        self._assert_notified(watch._poll(self.path, interval=0.01))
+
+    def test_polling_fallback(self):
+        with mock.patch.object(watch, "_Inotify", side_effect=OSError("unavailable")):
+            changes = watch._changes(self.path)
+        self.assertEqual("changes", changes.__name__)
@@ -1,6 +1,17 @@
 from datetime import datetime
+import importlib.util
 import os
 
+from crontab import CronTab
+from parameterized import param
+
+from crony import analyser
+
+# Parameters for tests of what can be done with NumPy or without, if it's installed.
+USE_NUMPY = [param("pure python", False)]
+if importlib.util.find_spec("numpy"):
+    USE_NUMPY.append(param("numpy", True))
+
 
 def write_temp_crontab(lines):
     filepath = "/tmp/test-crontab-" + str(datetime.timestamp(datetime.now()))
@@ -11,3 +22,11 @@ def write_temp_crontab(lines):
 
 def to_datetime(s, fmt=None):
     return datetime.strptime(s, fmt if fmt else "%Y-%m-%d %H:%M:%S")
+
+
+def get_jobs(lines, begin, end, **kwargs):
+    return list(
+        analyser.get_job_occurrences(
+            CronTab(tab="\n".join(lines)), begin=begin, end=end, **kwargs
+        )
+    )